@@ -2,18 +2,14 @@
 
 import discord
 import logging
+import os
 import sys
 
+from src import logs
 from src.bot import Bot
 
 
 LOG_FILE = "log.log"
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
 
 # Nice for local debugging
 # logging.basicConfig(
@@ -23,6 +19,15 @@ logging.basicConfig(
 
 
 def main():
+    # Set LOG_JSON=1 to write JSON lines instead of plain text.
+    listener = logs.setup(LOG_FILE, json_lines=os.environ.get("LOG_JSON") == "1")
+    try:
+        run()
+    finally:
+        listener.stop()
+
+
+def run():
     try:
         with open(".token", "r") as f:
             token = f.read().strip()
@@ -40,7 +45,18 @@ def main():
     intents = discord.Intents.default()
     intents.message_content = True
     intents.messages = True
-    bot = Bot(intents=intents)
+    # Set METRICS_PORT to serve Prometheus metrics on /metrics.
+    metrics_port = os.environ.get("METRICS_PORT")
+    # Set IN_MEMORY_CHECKPOINT to serve app.db from memory, written back every that many seconds.
+    checkpoint_interval = os.environ.get("IN_MEMORY_CHECKPOINT")
+    bot = Bot(
+        intents=intents,
+        metrics_host=os.environ.get("METRICS_HOST", "127.0.0.1"),
+        metrics_port=int(metrics_port) if metrics_port else None,
+        # Set RECORD_COMMANDS to a file to record commands for benchmarks/replay.py.
+        record_to=os.environ.get("RECORD_COMMANDS") or None,
+        checkpoint_interval=float(checkpoint_interval) if checkpoint_interval else None,
+    )
     try:
         bot.run(token)
     except Exception as e:
@@ -0,0 +1,109 @@
+"""Cold start: import time of src.bot and time until setup_hook has run.
+
+Every run starts a fresh interpreter, like a container restart does.
+`-X importtime` gives the cumulative import time of src.bot and the modules
+that cost the most. Time to setup_hook is wall time from launching the
+process until the cogs are added (Discord is not contacted).
+
+Exits with status 1 when a median is over its budget, so CI can catch
+startup regressions.
+
+Usage: python -m benchmarks.bench_coldstart [--runs 5] [--import-budget 1.5] [--setup-budget 2.5]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SETUP = """
+import asyncio, os, sys
+import discord
+from src.bot import Bot
+
+# The bot opens app.db in the working directory.
+os.chdir(sys.argv[1])
+
+async def main():
+    bot = Bot(discord.Intents.default())
+    await bot.setup_hook()
+    print("ready", flush=True)
+    os._exit(0)
+
+asyncio.run(main())
+"""
+
+
+def import_times() -> tuple[float, list[tuple[float, str]]]:
+    """Cumulative import time of src.bot and (self time, module) of every import, in seconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.bot"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        modules.append((int(own) / 1e6, name))
+        if name == "src.bot":
+            total = int(cumulative) / 1e6
+    return total, modules
+
+
+def time_to_setup_hook() -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-c", SETUP, tmp], cwd=ROOT, stdout=subprocess.PIPE, text=True
+        )
+        line = process.stdout.readline()
+        elapsed = time.perf_counter() - started
+        process.wait()
+    if line.strip() != "ready":
+        raise RuntimeError("The bot did not get through setup_hook")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--import-budget", type=float, default=1.5, help="Seconds allowed for importing src.bot")
+    parser.add_argument("--setup-budget", type=float, default=2.5, help="Seconds allowed until setup_hook has run")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    args = parser.parse_args()
+
+    imports, slowest = [], {}
+    for _ in range(args.runs):
+        total, modules = import_times()
+        imports.append(total)
+        for own, name in modules:
+            slowest.setdefault(name, []).append(own)
+    setups = [time_to_setup_hook() for _ in range(args.runs)]
+
+    print(f"Slowest modules by self time (median of {args.runs} runs):")
+    ranked = sorted(((statistics.median(t), name) for name, t in slowest.items()), reverse=True)
+    for own, name in ranked[: args.top]:
+        print(f"  {own * 1000:7.1f} ms  {name}")
+
+    failed = False
+    for name, samples, budget in [
+        ("import src.bot", imports, args.import_budget),
+        ("time to setup_hook", setups, args.setup_budget),
+    ]:
+        median = statistics.median(samples)
+        verdict = "ok" if median <= budget else "OVER BUDGET"
+        failed |= median > budget
+        print(f"{name:>18}: median {median:.3f}s, min {min(samples):.3f}s, budget {budget:.3f}s {verdict}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
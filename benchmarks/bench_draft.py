@@ -0,0 +1,108 @@
+"""Draft turn latency with the active games in memory, against loading them each turn.
+
+Seats --tables games of --players players on a copy of a generated dataset,
+starts them in PICKS_ONLY mode and plays every draft turn through the writer,
+the way !draft runs. Played twice: once with the registry of active games
+emptied before every turn, so each turn loads its game from SQLite like
+before the registry, and once served from memory. Prints the latency
+percentiles and the statements per turn of each.
+
+Usage: python -m benchmarks.bench_draft [--size small] [--tables 10] [--players 6]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select
+from typing import Dict, List
+
+from src import database as db
+from src.game import factions, gamelogic, model
+from src.perf import queries
+from src.perf.metrics import Histogram
+from . import suite
+from .replay import copy_database
+
+
+def play(source: str, tables: int, players: int, memory: bool) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        copy_database(source, path)
+        database = db.Database(create_engine(f"sqlite:///{path}", connect_args={"timeout": 15}))
+        try:
+            return draft(database, tables, players, memory)
+        finally:
+            database.close()
+
+
+def draft(database: db.Database, tables: int, players: int, memory: bool) -> Dict[str, float]:
+    logic = gamelogic.GameLogic(None, database.engine, database.read_engine)
+
+    def write(fn, *args):
+        return database.writer.submit(fn, *args).result()
+
+    with db.session(database.engine) as session:
+        ids = session.scalars(select(model.Player.player_id).order_by(model.Player.player_id)).all()
+        first = (session.scalar(select(model.Game.game_id).order_by(model.Game.game_id.desc())) or 0) + 1
+    games = list(range(first, first + tables))
+    for index, game_id in enumerate(games):
+        seated = [ids[(index * players + i) % len(ids)] for i in range(players)]
+        write(logic.lobby, game_id, seated[0], f"P{seated[0]}", f"Bench {game_id}")
+        for player_id in seated[1:]:
+            write(logic.join, game_id, player_id, f"P{player_id}")
+        write(logic.config, game_id, "drafting_mode", model.DraftingMode.PICKS_ONLY.value)
+        write(logic.start, factions.read_factions(), game_id)
+
+    latency = Histogram(tables * players)
+    reads: List[int] = []
+    statements: List[int] = []
+    # Turns of the tables interleaved, like games drafting at the same time.
+    for turn in range(players):
+        for game_id in games:
+            with db.session(database.read_engine) as session:
+                drafter = session.scalars(select(model.GamePlayer).filter_by(game_id=game_id, turn_order=turn)).one()
+                faction = drafter.factions[0]
+            if not memory:
+                logic.active.clear()
+            with queries.track() as log:
+                started = time.perf_counter()
+                result = write(logic.draft, drafter.player_id, game_id, faction)
+                latency.add(time.perf_counter() - started)
+            if not isinstance(result, gamelogic.Ok):
+                raise RuntimeError(f"Draft in game {game_id} failed: {result.msg}")
+            reads.append(sum(s.startswith("SELECT") for s in log.statements))
+            statements.append(log.count)
+
+    return {
+        **latency.summary(),
+        "reads": sum(reads) / len(reads),
+        "statements": sum(statements) / len(statements),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="small", choices=sorted(suite.SIZES), help="Generated dataset to start from")
+    parser.add_argument("--tables", type=int, default=10, help="Games drafting at the same time")
+    parser.add_argument("--players", type=int, default=6, help="Players per game")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's logs")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+
+    source = str(suite.dataset(args.size))
+    results = {
+        "loaded": play(source, args.tables, args.players, memory=False),
+        "memory": play(source, args.tables, args.players, memory=True),
+    }
+
+    print(f"{args.size} dataset, {args.tables} tables x {args.players} players, {args.tables * args.players} draft turns")
+    print(f"{'games':>7} {'p50 ms':>7} {'p95 ms':>7} {'reads':>6} {'stmts':>6}")
+    for name, result in results.items():
+        print(f"{name:>7} {result['p50']:7.2f} {result['p95']:7.2f} {result['reads']:6.1f} {result['statements']:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
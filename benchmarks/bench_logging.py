@@ -0,0 +1,91 @@
+"""Cost of a logging call on the calling thread, before and after the queue pipeline.
+
+"basicConfig" is the old setup, where every call writes to log.log on the
+calling thread (in the bot, the event loop). "queue" and "queue json" use
+src.logs.setup, where the call only enqueues the record and a background
+thread formats and writes it.
+
+Calls are paced by --pause, since the bot logs a few lines per command rather
+than in a tight loop. Without a pause the listener thread is always busy and
+the calling thread waits on the GIL instead.
+
+Usage: python -m benchmarks.bench_logging [--calls 20000] [--pause 0.0002] [--dir PATH]
+"""
+import argparse
+import logging
+import tempfile
+import time
+
+from pathlib import Path
+
+from src import logs
+
+
+def reset() -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def basic_config(path: Path):
+    logging.basicConfig(filename=path, level=logging.INFO, format=logs.FORMAT, datefmt=logs.DATEFMT)
+    return None
+
+
+def queue(path: Path):
+    return logs.setup(str(path))
+
+
+def queue_json(path: Path):
+    return logs.setup(str(path), json_lines=True)
+
+
+def measure(calls: int, pause: float) -> tuple[float, float, float]:
+    durations = []
+    for i in range(calls):
+        started = time.perf_counter()
+        logging.info("Player %s drafted %s", i, "The Arborec")
+        durations.append(time.perf_counter() - started)
+        time.sleep(pause)
+    durations.sort()
+    info = sum(durations) / calls
+    worst = durations[int(calls * 0.999)]
+
+    exception_calls = max(calls // 10, 1)
+    exception = 0.0
+    for i in range(exception_calls):
+        started = time.perf_counter()
+        try:
+            raise ValueError(i)
+        except ValueError:
+            logging.exception("Something went wrong")
+        exception += time.perf_counter() - started
+        time.sleep(pause)
+    exception /= exception_calls
+    return info, worst, exception
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000, help="logging.info calls per setup")
+    parser.add_argument("--pause", type=float, default=0.0002, help="Seconds between calls")
+    parser.add_argument("--dir", type=Path, default=None, help="Directory for the log files, to benchmark a specific disk")
+    args = parser.parse_args()
+
+    for name, setup in [("basicConfig", basic_config), ("queue", queue), ("queue json", queue_json)]:
+        with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+            reset()
+            listener = setup(Path(tmp) / "log.log")
+            info, worst, exception = measure(args.calls, args.pause)
+            if listener is not None:
+                listener.stop()
+            reset()
+        print(
+            f"{name:>12}: info {info * 1e6:.1f} us/call (p99.9 {worst * 1e6:.1f} us), "
+            f"exception {exception * 1e6:.1f} us/call"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Fuzzy matching against the full faction and command lists.
+
+"levenshtein scan" is the old `max(candidates, key=Levenshtein.ratio)` that
+every call site used to repeat. "matcher" scores all candidates in one
+RapidFuzz call against names normalized once, and "matcher cached" repeats
+the same queries so they come from the cache of recent queries.
+
+Usage: python -m benchmarks.bench_matching [--queries 2000]
+"""
+import argparse
+import random
+import time
+
+import Levenshtein
+
+from src.achievements.commands import Achievements
+from src.betting.commands import Betting
+from src.game import factions
+from src.game.commands import Game
+from src.matching import Matcher
+from src.misc.commands import Misc
+from src.perf.commands import Perf
+from src.rating.commands import Rating
+
+
+def levenshtein_scan(query: str, candidates: list[str]) -> str:
+    return max(candidates, key=lambda c: Levenshtein.ratio(query, c))
+
+
+def typo(rng: random.Random, s: str) -> str:
+    i = rng.randrange(len(s))
+    return s[:i] + s[i + 1:]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=2000, help="Distinct misspelled queries per list")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lists = {
+        "factions": [f.name for f in factions.read_factions().factions],
+        "commands": [c.name for cog in (Game, Misc, Betting, Rating, Achievements, Perf) for c in cog.__cog_commands__],
+    }
+    for name, candidates in lists.items():
+        queries = [typo(rng, rng.choice(candidates)) for _ in range(args.queries)]
+
+        started = time.perf_counter()
+        for q in queries:
+            levenshtein_scan(q, candidates)
+        scan = time.perf_counter() - started
+
+        matcher = Matcher(candidates, cache_size=args.queries)
+        started = time.perf_counter()
+        for q in queries:
+            matcher.match(q)
+        cold = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for q in queries:
+            matcher.match(q)
+        cached = time.perf_counter() - started
+
+        print(f"{name} ({len(candidates)} candidates, {len(queries)} queries):")
+        for label, elapsed in [("levenshtein scan", scan), ("matcher", cold), ("matcher cached", cached)]:
+            print(f"  {label:>16}: {elapsed / len(queries) * 1e6:7.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Command latency with app.db served from memory, against the file.
+
+Runs the game night load test of benchmarks.load_lobbies twice on copies of
+the same generated database: once on the file, once with the bot serving it
+from memory and checkpointing it back (src.database.MemoryStore). Prints the
+latency percentiles of each command side by side, and how long writing the
+whole database back takes, which is what every checkpoint costs.
+
+Usage: python -m benchmarks.bench_memory [--size small] [--lobbies 10] [--players 6] [--interval 60]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from contextlib import closing
+from typing import Optional
+
+from src.database import MemoryStore
+from . import load_lobbies, suite
+from .replay import copy_database
+
+
+def play(source: str, lobbies: int, players: int, interval: Optional[float]) -> load_lobbies.Report:
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_database(source, os.path.join(tmp, "app.db"))
+        # The bot opens app.db in the working directory.
+        os.chdir(tmp)
+        try:
+            return asyncio.run(load_lobbies.run(lobbies, players, interval))
+        finally:
+            os.chdir(cwd)
+
+
+def checkpoint_ms(source: str) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "app.db")
+        copy_database(source, path)
+        store = MemoryStore(path, interval=3600)
+        try:
+            started = time.perf_counter()
+            with closing(sqlite3.connect(path)) as disk:
+                disk.execute("PRAGMA synchronous=FULL")
+                store.connection.backup(disk)
+            return (time.perf_counter() - started) * 1000
+        finally:
+            store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="small", choices=sorted(suite.SIZES), help="Generated dataset to start from")
+    parser.add_argument("--lobbies", type=int, default=10, help="Lobbies playing at the same time")
+    parser.add_argument("--players", type=int, default=6, help="Players per lobby")
+    parser.add_argument("--interval", type=float, default=60.0, help="Checkpoint interval in memory, in seconds")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's logs")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+
+    source = str(suite.dataset(args.size))
+    size_mb = os.path.getsize(source) / 2**20
+    reports = {
+        "file": play(source, args.lobbies, args.players, None),
+        "memory": play(source, args.lobbies, args.players, args.interval),
+    }
+
+    print(f"{args.size} dataset ({size_mb:.1f} MiB), {args.lobbies} lobbies x {args.players} players")
+    print(f"{'command':>15} {'file p50':>9} {'file p95':>9} {'mem p50':>9} {'mem p95':>9}")
+    file, memory = reports["file"].latency, reports["memory"].latency
+    for name in load_lobbies.COMMANDS:
+        if name in file and name in memory:
+            print(
+                f"{name:>15} {file[name]['p50']:9.1f} {file[name]['p95']:9.1f} "
+                f"{memory[name]['p50']:9.1f} {memory[name]['p95']:9.1f}"
+            )
+    for mode, report in reports.items():
+        print(f"{mode}: {report.throughput:.0f} commands/s, {len(report.problems)} problems, "
+              f"{report.command_errors} command errors, {report.lock_errors} lock errors")
+    print(f"one checkpoint: {checkpoint_ms(source):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Read throughput of the query commands while writes are running.
+
+Compares reads sharing the engine with direct-committing writers (the setup
+before the read-only pool) against reads on `Database.read_engine` while the
+same write load goes through the single writer.
+
+Usage: python -m benchmarks.bench_reads [--readers 4] [--seconds 5] [--games 500]
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+
+from pathlib import Path
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from src import database, migrations, models
+from src.game import gamelogic, model
+from src.rating import ratinglogic
+
+
+def seed(engine, players: int, games: int) -> None:
+    rng = random.Random(0)
+    with Session(engine) as session:
+        session.execute(insert(model.Player), [{"player_id": p, "name": f"Player{p}"} for p in range(1, players + 1)])
+        session.execute(insert(model.Game), [
+            {"game_id": g, "name": f"Game{g}", "game_state": model.GameState.FINISHED}
+            for g in range(1, games + 1)
+        ])
+        rows = []
+        for g in range(1, games + 1):
+            for p in rng.sample(range(1, players + 1), 6):
+                rows.append({"game_id": g, "player_id": p, "faction": "The Yssaril Tribes", "points": rng.randint(2, 10)})
+        session.execute(insert(model.GamePlayer), rows)
+        while migrations.store_results(session.connection(), 1000):
+            pass
+        session.add(model.Game(game_id=games + 1, name="Live", game_state=model.GameState.DRAFT))
+        session.commit()
+
+
+def next_turn(engine, game_id: int) -> None:
+    with database.session(engine) as session:
+        game = session.get(model.Game, game_id)
+        game.turn += 1
+        session.commit()
+
+
+def run(engine, read_engine, write, readers: int, seconds: float, live_game: int) -> int:
+    ratings = ratinglogic.RatingLogic(engine, read_engine)
+    games = gamelogic.GameLogic(None, engine, read_engine)
+    queries = [ratings.ratings, ratings.wins, lambda: ratings.stats(1), games.games, games.lobbies]
+
+    stop = threading.Event()
+    reads = [0] * readers
+
+    def reader(i: int) -> None:
+        while not stop.is_set():
+            queries[reads[i] % len(queries)]()
+            reads[i] += 1
+
+    def writer() -> None:
+        while not stop.is_set():
+            write(live_game)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(2)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(reads)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4, help="Concurrent reader threads")
+    parser.add_argument("--seconds", type=float, default=5, help="Duration of each run")
+    parser.add_argument("--players", type=int, default=30)
+    parser.add_argument("--games", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", connect_args={"timeout": 15})
+        models.Base.metadata.create_all(engine)
+        seed(engine, args.players, args.games)
+        live_game = args.games + 1
+
+        shared = run(engine, engine, lambda g: next_turn(engine, g), args.readers, args.seconds, live_game)
+
+        db = database.Database(engine, workers=args.readers)
+        separate = run(
+            engine,
+            db.read_engine,
+            lambda g: db.writer.submit(next_turn, engine, g).result(),
+            args.readers,
+            args.seconds,
+            live_game,
+        )
+        db.close()
+
+    print(f"  shared engine: {shared / args.seconds:.0f} reads/s")
+    print(f"read-only pool: {separate / args.seconds:.0f} reads/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Time to first response after starting the bot.
+
+"eager" waits for every startup job before the first command, which is how
+the bot behaved when the ratings replay and achievement checks ran in the
+cog constructors. "deferred" answers as soon as the cogs are added, while
+the jobs run in the background; commands that need a job reply "warming up"
+until it is done.
+
+Runs against a seeded database in a temporary directory, with Discord faked
+by dpytest.
+
+Usage: python -m benchmarks.bench_startup [--players 60] [--games 100]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import discord
+import discord.ext.test as dpytest
+from sqlalchemy import create_engine
+
+from src import models
+from src.bot import Bot
+from src.startup import WarmingUp
+from .bench_reads import seed
+
+
+async def start(wait_for_jobs: bool) -> tuple[float, float, dict]:
+    started = time.perf_counter()
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+    bot = Bot(intents)
+    await bot.setup_hook()
+    await bot._async_setup_hook()
+    dpytest.configure(bot)
+    if wait_for_jobs:
+        await bot.startup.wait()
+
+    await dpytest.message("!hello")
+    first = time.perf_counter() - started
+
+    while True:
+        try:
+            await dpytest.message("!leaderboard")
+            break
+        except WarmingUp:
+            # dpytest re-raises command errors after the bot has replied.
+            await asyncio.sleep(0.01)
+    ratings = time.perf_counter() - started
+
+    await bot.startup.wait()
+    bot.watchdog.stop()
+    await asyncio.to_thread(bot.database.close)
+    return first, ratings, bot.startup.timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=60, help="Players in the seeded database")
+    parser.add_argument("--games", type=int, default=100, help="Finished games in the seeded database")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    for name, wait_for_jobs in [("eager", True), ("deferred", False)]:
+        with tempfile.TemporaryDirectory() as tmp:
+            # The bot opens app.db in the working directory.
+            os.chdir(tmp)
+            try:
+                engine = create_engine("sqlite:///app.db")
+                models.Base.metadata.create_all(engine)
+                seed(engine, args.players, args.games)
+                engine.dispose()
+                first, ratings, timings = asyncio.run(start(wait_for_jobs))
+            finally:
+                os.chdir(cwd)
+
+        jobs = ", ".join(f"{job} {seconds:.2f}s" for job, seconds in timings.items())
+        print(f"{name:>8}: first response {first:.2f}s, leaderboard ready {ratings:.2f}s ({jobs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare direct per-command commits against the group-committing writer.
+
+Every write is a read-modify-write of one game row, the same shape as a draft
+turn reading and bumping `game.turn`. Direct commits run one session per
+write from many threads, like the cogs did before the writer existed.
+
+Usage: python -m benchmarks.bench_writer [--writers 8] [--writes 200] [--dir PATH]
+"""
+import argparse
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from src import database, models
+from src.game import model
+
+
+def next_turn(engine) -> None:
+    with database.session(engine) as session:
+        game = session.get(model.Game, 1)
+        game.turn += 1
+        session.commit()
+
+
+def direct(engine, writers: int, writes: int) -> int:
+    def work(_) -> int:
+        failed = 0
+        for _ in range(writes):
+            try:
+                next_turn(engine)
+            except OperationalError:
+                failed += 1
+        return failed
+
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        return sum(pool.map(work, range(writers)))
+
+
+def grouped(engine, writers: int, writes: int) -> int:
+    writer = database.Writer(engine)
+
+    def work(_) -> int:
+        failed = 0
+        for _ in range(writes):
+            try:
+                writer.submit(next_turn, engine).result()
+            except OperationalError:
+                failed += 1
+        return failed
+
+    try:
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            return sum(pool.map(work, range(writers)))
+    finally:
+        writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8, help="Concurrent writer threads")
+    parser.add_argument("--writes", type=int, default=200, help="Writes per writer thread")
+    parser.add_argument("--dir", type=Path, default=None, help="Directory for the database file, to benchmark a specific disk")
+    args = parser.parse_args()
+
+    total = args.writers * args.writes
+    for name, bench in [("direct commits", direct), ("group commit", grouped)]:
+        with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+            engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", connect_args={"timeout": 15})
+            models.Base.metadata.create_all(engine)
+            with Session(engine) as session:
+                session.add(model.Game(game_id=1, name="Bench", game_state=model.GameState.DRAFT))
+                session.commit()
+
+            started = time.perf_counter()
+            failed = bench(engine, args.writers, args.writes)
+            elapsed = time.perf_counter() - started
+
+            with Session(engine) as session:
+                turn = session.get(model.Game, 1).turn
+            engine.dispose()
+
+        done = total - failed
+        print(
+            f"{name:>15}: {done}/{total} writes in {elapsed:.2f}s "
+            f"({done / elapsed:.0f} writes/s), {failed} lock errors, final turn {turn}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Game night load test: many lobbies playing a full game at the same time.
+
+Every lobby goes through !lobby, !join for each player, !config, !start, !ban
+and !draft in turn order, !finish, !update_ratings and !stats. All lobbies run
+concurrently against one bot on an on-disk SQLite file, with Discord faked by
+dpytest. Players look up whose turn it is in the database, as they would read
+it from the bot's last message.
+
+Reports throughput, latency percentiles per command from the bot's own
+metrics, "database is locked" errors and whether every game ended up
+consistent. With --in-memory the bot serves the file from memory instead.
+
+Usage: python -m benchmarks.load_lobbies [--lobbies 30] [--players 6] [--in-memory 60]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import discord
+import discord.ext.test as dpytest
+from dataclasses import dataclass, field
+from sqlalchemy import select
+from typing import Dict, List, Optional, Tuple
+
+from src import database as db
+from src.bot import Bot
+from src.game import model
+from src.typing import Ok
+
+COMMANDS = ("lobby", "join", "config", "start", "ban", "draft", "finish", "update_ratings", "stats")
+
+
+class LockErrors(logging.Handler):
+    """Counts log records caused by SQLite lock timeouts."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        text = record.getMessage()
+        if record.exc_info and record.exc_info[1] is not None:
+            text += str(record.exc_info[1])
+        if "database is locked" in text:
+            self.count += 1
+
+
+@dataclass
+class Report:
+    lobbies: int
+    players: int
+    commands: int
+    seconds: float
+    # Command name to its latency summary in milliseconds.
+    latency: Dict[str, Dict[str, float]]
+    command_errors: int
+    lock_errors: int
+    problems: List[str] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        return self.commands / self.seconds if self.seconds else 0.0
+
+    def text(self) -> str:
+        lines = [
+            f"{self.lobbies} lobbies x {self.players} players: {self.commands} commands in "
+            f"{self.seconds:.2f}s ({self.throughput:.0f} commands/s)",
+            f"{'command':>15} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}",
+        ]
+        for name in COMMANDS:
+            if name in self.latency:
+                l = self.latency[name]
+                lines.append(f"{name:>15} {l['p50']:8.1f} {l['p95']:8.1f} {l['p99']:8.1f}")
+        lines.append(f"command errors: {self.command_errors}, lock errors: {self.lock_errors}")
+        lines.append("all games consistent" if not self.problems else "\n".join(self.problems))
+        return "\n".join(lines)
+
+
+class Harness:
+    """Plays lobbies through the bot as the configured dpytest members."""
+
+    def __init__(self, bot: Bot, admin: discord.Member) -> None:
+        config = dpytest.get_config()
+        self.bot = bot
+        self.guild = config.guilds[0]
+        self.hall = config.channels[0]
+        self.admin = admin
+        self.commands = 0
+        self.errors = 0
+
+    async def send(self, content: str, channel: discord.TextChannel, member: discord.Member) -> None:
+        self.commands += 1
+        try:
+            await dpytest.message(content, channel, member)
+        except Exception:
+            # dpytest re-raises command errors, possibly another lobby's.
+            self.errors += 1
+            logging.exception(f"{content} failed")
+
+    def draft_state(self, game_id: int) -> Tuple[List[int], List[str]]:
+        """Player ids in turn order and the shared faction pool."""
+        with db.session(self.bot.database.read_engine) as session:
+            players = session.scalars(
+                select(model.GamePlayer).filter_by(game_id=game_id).order_by(model.GamePlayer.turn_order)
+            ).all()
+            return [p.player_id for p in players], list(players[0].factions) if players else []
+
+    async def play(self, index: int, players: List[discord.Member]) -> int:
+        name = f"lobby-{index}"
+        host = players[0]
+        await self.send(f"!lobby {name}", self.hall, host)
+        channel = discord.utils.get(self.guild.text_channels, name=name)
+        assert channel is not None, f"{name} was not created"
+
+        for player in players[1:]:
+            await self.send("!join", channel, player)
+        await self.send("!config drafting_mode picks_and_bans", channel, host)
+        await self.send("!start", channel, host)
+
+        order, pool = await self.bot.database.run(self.draft_state, channel.id)
+        by_id = {player.id: player for player in players}
+        for i, player_id in enumerate(order):
+            await self.send(f"!ban {pool[i]}", channel, by_id[player_id])
+        for i, player_id in enumerate(order):
+            await self.send(f"!draft {pool[len(order) + i]}", channel, by_id[player_id])
+
+        points = " ".join(str(10 - i) for i in range(len(order)))
+        await self.send(f"!finish {points}", channel, host)
+        await self.send("!update_ratings", channel, self.admin)
+        for player in players:
+            await self.send("!stats", channel, player)
+        return channel.id
+
+    def check(self, game_ids: List[int], players: int) -> List[str]:
+        """Everything that is wrong with the finished games."""
+        problems = []
+        with db.session(self.bot.database.read_engine) as session:
+            for game_id in game_ids:
+                game = session.get(model.Game, game_id)
+                if game is None:
+                    problems.append(f"Game {game_id} is missing")
+                    continue
+                if game.game_state != model.GameState.FINISHED:
+                    problems.append(f"{game.name} is {game.game_state.value}, not finished")
+                factions = [gp.faction for gp in game.game_players]
+                bans = [ban for gp in game.game_players for ban in gp.bans or []]
+                if len(factions) != players:
+                    problems.append(f"{game.name} has {len(factions)} players, not {players}")
+                if None in factions or len(set(factions)) != len(factions):
+                    problems.append(f"{game.name} has missing or duplicate factions: {factions}")
+                if len(set(bans)) != players or set(bans) & set(factions):
+                    problems.append(f"{game.name} has wrong bans {bans} for factions {factions}")
+                if sorted(gp.points for gp in game.game_players) != sorted(10 - i for i in range(players)):
+                    problems.append(f"{game.name} has wrong points")
+
+        rating = self.bot.get_cog("Rating").logic
+        unrated = rating.unrated_games()
+        if unrated:
+            problems.append(f"{len(unrated)} games were not rated")
+        for player_id in {gp for game_id in game_ids for gp in self.__players(game_id)}:
+            match rating.stats(player_id):
+                case Ok(profile) if profile.games == 1:
+                    pass
+                case result:
+                    problems.append(f"Wrong stats for player {player_id}: {result}")
+        return problems
+
+    def __players(self, game_id: int) -> List[int]:
+        with db.session(self.bot.database.read_engine) as session:
+            return list(session.scalars(select(model.GamePlayer.player_id).filter_by(game_id=game_id)))
+
+
+async def run(lobbies: int, players: int, checkpoint_interval: Optional[float] = None) -> Report:
+    """Play the lobbies against a bot using app.db in the working directory.
+
+    With checkpoint_interval the bot serves app.db from memory.
+    """
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+    bot = Bot(intents, checkpoint_interval=checkpoint_interval)
+    await bot.setup_hook()
+    await bot._async_setup_hook()
+    dpytest.configure(bot, members=lobbies * players + 1)
+    await bot.startup.wait()
+
+    members = dpytest.get_config().members
+    admin = members[0]
+    role = dpytest.backend.make_role("Admin", admin.guild, permissions=discord.Permissions(administrator=True).value)
+    await dpytest.add_role(admin, role)
+
+    harness = Harness(bot, admin)
+    lock_errors = LockErrors()
+    logging.getLogger().addHandler(lock_errors)
+    try:
+        started = time.perf_counter()
+        game_ids = await asyncio.gather(*(
+            harness.play(i, members[1 + i * players: 1 + (i + 1) * players]) for i in range(lobbies)
+        ))
+        seconds = time.perf_counter() - started
+        await dpytest.empty_queue()
+
+        problems = await bot.database.run(harness.check, game_ids, players)
+        latency = {
+            name: summary["total"]
+            for name, summary in bot.metrics.dump()["commands"].items()
+            if name in COMMANDS
+        }
+        return Report(
+            lobbies=lobbies,
+            players=players,
+            commands=harness.commands,
+            seconds=seconds,
+            latency=latency,
+            command_errors=harness.errors,
+            lock_errors=lock_errors.count,
+            problems=problems,
+        )
+    finally:
+        logging.getLogger().removeHandler(lock_errors)
+        bot.watchdog.stop()
+        await asyncio.to_thread(bot.database.close)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lobbies", type=int, default=30, help="Lobbies playing at the same time")
+    parser.add_argument("--players", type=int, default=6, help="Players per lobby")
+    parser.add_argument("--in-memory", type=float, metavar="SECONDS", help="Serve app.db from memory, checkpointed this often")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # The bot opens app.db in the working directory.
+        os.chdir(tmp)
+        try:
+            report = asyncio.run(run(args.lobbies, args.players, args.in_memory))
+        finally:
+            os.chdir(cwd)
+
+    print(report.text())
+    if report.problems or report.command_errors or report.lock_errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
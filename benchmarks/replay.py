@@ -0,0 +1,219 @@
+"""Replay recorded commands against a copy of a database.
+
+Drives a fresh bot, with Discord faked by dpytest, through a recording made
+with RECORD_COMMANDS=recording.jsonl.gz. The database is copied first with
+SQLite's backup API, so the original is never touched. Reports the replayed
+timing of every command next to the recorded timing, and the commands whose
+replies differ from the recorded ones.
+
+By default commands are replayed one after another, as fast as possible.
+With --speed they keep the recorded pace (1 is real time, 10 is ten times
+faster) and may overlap like they did live. Each command seeds `random`
+with its position in the recording, so fast replays are deterministic.
+Replies that depend on randomness, like !factions or the turn order from
+!start, still differ from the live run.
+
+Usage: python -m benchmarks.replay recording.jsonl.gz [--db app.db] [--speed 1] [--out replayed.jsonl]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import discord
+import discord.ext.test as dpytest
+from collections import defaultdict, deque
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from src.bot import Bot
+from src.perf import recorder
+from src.perf.metrics import Histogram
+from src.perf.recorder import Record
+
+
+@dataclass
+class Report:
+    commands: int
+    seconds: float
+    # Command name to (recorded, replayed) latencies.
+    timings: Dict[str, Tuple[Histogram, Histogram]]
+    # Recorded commands whose replayed replies differ, with the replayed record if any.
+    differences: List[Tuple[Record, Optional[Record]]] = field(default_factory=list)
+
+    def text(self, show: int = 10) -> str:
+        lines = [
+            f"Replayed {self.commands} commands in {self.seconds:.2f}s",
+            f"{'command':>15} {'count':>6} {'rec p50':>8} {'rec p95':>8} {'p50 ms':>8} {'p95 ms':>8} {'diff':>5}",
+        ]
+        different = defaultdict(int)
+        for record, _ in self.differences:
+            different[record.command] += 1
+        for name, (recorded, replayed) in sorted(self.timings.items()):
+            r, p = recorded.summary(), replayed.summary()
+            lines.append(
+                f"{name:>15} {len(replayed.samples):6} {r['p50']:8.1f} {r['p95']:8.1f} "
+                f"{p['p50']:8.1f} {p['p95']:8.1f} {different[name]:5}"
+            )
+        for record, replayed in self.differences[:show]:
+            lines.append(f"\n{record.content!r} by {record.author_name} differs:")
+            lines.append(f"  recorded: {record.replies!r}")
+            lines.append(f"  replayed: {replayed.replies if replayed else 'nothing'!r}")
+        if len(self.differences) > show:
+            lines.append(f"\n... and {len(self.differences) - show} more")
+        return "\n".join(lines)
+
+
+def copy_database(source: str, target: str) -> None:
+    """Consistent copy of a live SQLite database, WAL included."""
+    with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+        src.backup(dst)
+
+
+class Replayer:
+    """Recreates the recorded members and channels in dpytest and sends the commands."""
+
+    def __init__(self, bot: Bot) -> None:
+        self.bot = bot
+        self.guild = dpytest.get_config().guilds[0]
+        self.admin = dpytest.backend.make_role(
+            "Admin", self.guild, permissions=discord.Permissions(administrator=True).value
+        )
+        self.members: Dict[int, discord.Member] = {}
+        self.channels: Dict[int, discord.TextChannel] = {}
+        # Channels made by commands, paired in order with those made during the recording.
+        self.recorded_created: Deque[int] = deque()
+        self.replay_created: Deque[discord.TextChannel] = deque()
+        self.made: set = set()
+        bot.add_listener(self.on_guild_channel_create)
+
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel) -> None:
+        if channel.id not in self.made and isinstance(channel, discord.TextChannel):
+            self.replay_created.append(channel)
+            self.__pair()
+
+    def __pair(self) -> None:
+        while self.recorded_created and self.replay_created:
+            self.channels[self.recorded_created.popleft()] = self.replay_created.popleft()
+
+    def channel(self, channel_id: int) -> discord.TextChannel:
+        self.__pair()
+        if channel_id not in self.channels:
+            # A channel from before the recording, e.g. a running game.
+            self.made.add(channel_id)
+            self.channels[channel_id] = dpytest.backend.make_text_channel(
+                f"channel-{channel_id}", self.guild, id_num=channel_id
+            )
+        return self.channels[channel_id]
+
+    def member(self, record: Record) -> discord.Member:
+        if record.author_id not in self.members:
+            user = dpytest.backend.make_user(record.author_name, 1, id_num=record.author_id)
+            roles = [self.admin] if record.admin else []
+            self.members[record.author_id] = dpytest.backend.make_member(user, self.guild, roles=roles)
+        return self.members[record.author_id]
+
+    async def send(self, index: int, record: Record) -> None:
+        if record.kind == "channel":
+            self.recorded_created.append(record.channel_id)
+            self.__pair()
+            return
+        channel, member = self.channel(record.channel_id), self.member(record)
+        random.seed(index)
+        # Reuse the recorded message id to match the replies up afterwards.
+        dpytest.backend.make_message(record.content, member, channel, id_num=record.message_id)
+        # Also drops the command errors dpytest collects.
+        await dpytest.empty_queue()
+
+
+async def replay(records: List[Record], out: str, speed: Optional[float] = None) -> Report:
+    """Replay records against a bot using app.db in the working directory."""
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+    bot = Bot(intents, record_to=out)
+    await bot.setup_hook()
+    await bot._async_setup_hook()
+    dpytest.configure(bot)
+    await bot.startup.wait()
+
+    replayer = Replayer(bot)
+    try:
+        started = time.perf_counter()
+        if speed is None:
+            for index, record in enumerate(records):
+                await replayer.send(index, record)
+        else:
+            first = records[0].time if records else 0.0
+
+            async def at_recorded_time(index: int, record: Record) -> None:
+                await asyncio.sleep(max((record.time - first) / speed - (time.perf_counter() - started), 0))
+                await replayer.send(index, record)
+
+            await asyncio.gather(*(at_recorded_time(i, r) for i, r in enumerate(records)))
+        await dpytest.empty_queue()
+        seconds = time.perf_counter() - started
+    finally:
+        bot.watchdog.stop()
+        await asyncio.to_thread(bot.database.close)
+        bot.recorder.close()
+
+    replayed = {r.message_id: r for r in recorder.read(out) if r.kind == "command"}
+    # Channels made during the replay have new ids, mention them by the recorded ones.
+    renamed = {str(channel.id): str(channel_id) for channel_id, channel in replayer.channels.items()}
+
+    def same_replies(record: Record, result: Record) -> bool:
+        replies = result.replies
+        for new, old in renamed.items():
+            replies = [reply.replace(new, old) for reply in replies]
+        return replies == record.replies
+
+    timings: Dict[str, Tuple[Histogram, Histogram]] = {}
+    report = Report(commands=0, seconds=seconds, timings=timings)
+    for record in records:
+        if record.kind != "command":
+            continue
+        report.commands += 1
+        recorded_times, replayed_times = timings.setdefault(
+            record.command, (Histogram(len(records)), Histogram(len(records)))
+        )
+        recorded_times.add(record.seconds)
+        result = replayed.get(record.message_id)
+        if result is not None:
+            replayed_times.add(result.seconds)
+        if result is None or not same_replies(record, result):
+            report.differences.append((record, result))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="File written with RECORD_COMMANDS")
+    parser.add_argument("--db", help="Database to replay against, copied first. Empty if not given")
+    parser.add_argument("--speed", type=float, help="Keep the recorded pace, sped up this many times")
+    parser.add_argument("--out", help="Also write the replayed commands here, in the recording format")
+    parser.add_argument("--show", type=int, default=10, help="Differences to print")
+    args = parser.parse_args()
+
+    records = list(recorder.read(args.recording))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.abspath(args.out) if args.out else os.path.join(tmp, "replayed.jsonl")
+        if args.db:
+            copy_database(args.db, os.path.join(tmp, "app.db"))
+        # The bot opens app.db in the working directory.
+        os.chdir(tmp)
+        try:
+            report = asyncio.run(replay(records, out, args.speed))
+        finally:
+            os.chdir(cwd)
+
+    print(report.text(args.show))
+
+
+if __name__ == "__main__":
+    main()
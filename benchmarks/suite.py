@@ -0,0 +1,358 @@
+"""Hot path benchmarks against generated datasets, compared to stored baselines.
+
+For each dataset size a database is generated with src.game.util.generate_db
+(cached in benchmarks/datasets) and copied, then the logic classes are driven
+directly, without Discord:
+
+- games played through lobby, start, ban, bet and draft in every drafting
+  mode with bans or picks, then finish, the ratings refresh and payout
+- stats, ratings and achievements for random players
+- load_achievements and reconcile
+
+Each case records its latency and the SQL statements per call. Results are
+compared to benchmarks/baselines/<size>.json: a case regresses when its
+median is slower than the baseline by more than the threshold, or when it
+runs more statements. --save writes the results as the new baselines.
+
+Timings only compare between runs on the same quiet machine. With
+--statements-only the timings are reported but only the statement counts
+gate the run, and baselines saved that way are always compared like that.
+
+Usage: python -m benchmarks.suite [--sizes small,medium] [--threshold 0.25] [--case finish=0.5]
+                                  [--statements-only] [--save]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from sqlalchemy import create_engine, select
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src import database as db
+from src.achievements import listener
+from src.achievements.achievementslogic import AchievementsLogic
+from src.betting import model as betting_model
+from src.betting.bettinglogic import BettingLogic
+from src.game import factions, gamelogic, model
+from src.game.util import generate_db
+from src.perf import queries
+from src.perf.metrics import Histogram
+from src.rating.ratinglogic import RatingLogic
+from .replay import copy_database
+
+HERE = Path(__file__).parent
+BASELINES = HERE / "baselines"
+DATASETS = HERE / "datasets"
+
+# Size name to (players, games).
+SIZES = {"small": (30, 1_000), "medium": (100, 10_000), "large": (200, 100_000)}
+MODES = (model.DraftingMode.EXCLUSIVE_POOL, model.DraftingMode.PICKS_ONLY, model.DraftingMode.PICKS_AND_BANS)
+# Changes smaller than this are noise, however large relative to the baseline.
+NOISE_MS = 0.5
+
+
+class Timings:
+    """Latency and statement count per call of each case."""
+
+    def __init__(self) -> None:
+        self.latency: Dict[str, Histogram] = {}
+        self.statements: Dict[str, List[int]] = {}
+
+    @contextmanager
+    def timed(self, case: str) -> Iterator[None]:
+        with queries.track() as log:
+            started = time.perf_counter()
+            yield
+            elapsed = time.perf_counter() - started
+        self.latency.setdefault(case, Histogram(100_000)).add(elapsed)
+        self.statements.setdefault(case, []).append(log.count)
+
+    def results(self) -> Dict[str, Dict[str, float]]:
+        results = {}
+        for case, histogram in sorted(self.latency.items()):
+            summary = histogram.summary()
+            statements = self.statements[case]
+            results[case] = {
+                "calls": len(statements),
+                "mean": round(summary["mean"], 3),
+                "p50": round(summary["p50"], 3),
+                "p95": round(summary["p95"], 3),
+                "statements": round(sum(statements) / len(statements), 2),
+            }
+        return results
+
+
+def dataset(size: str, directory: Path = DATASETS) -> Path:
+    """The generated database for size, generated on first use."""
+    players, games = SIZES[size]
+    path = directory / f"{size}-{players}-{games}.db"
+    if not path.exists():
+        directory.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".partial")
+        for stale in partial.parent.glob(partial.name + "*"):
+            stale.unlink()
+        generate_db.generate(str(partial), players, games, seed=0)
+        os.replace(partial, path)
+    return path
+
+
+class Suite:
+    def __init__(self, path: str, seed: int = 0) -> None:
+        self.engine = create_engine(f"sqlite:///{path}")
+        self.games = gamelogic.GameLogic(None, self.engine)
+        self.ratings = RatingLogic(self.engine)
+        self.achievements = AchievementsLogic(self.engine)
+        self.betting = BettingLogic(self.engine)
+        self.factions = factions.read_factions()
+        self.timings = Timings()
+        self.rng = random.Random(seed)
+        # The drafting modes deal factions with the random module.
+        random.seed(seed)
+
+        with db.session(self.engine) as session:
+            self.players = dict(session.execute(select(model.Player.player_id, model.Player.name)).all())
+            self.bettors = list(session.scalars(select(betting_model.Bettor.player_id)))
+            self.next_game = (session.scalar(select(model.Game.game_id).order_by(model.Game.game_id.desc())) or 0) + 1
+
+    def __turn_order(self, game_id: int) -> List[model.GamePlayer]:
+        with db.session(self.engine) as session:
+            players = session.scalars(
+                select(model.GamePlayer).filter_by(game_id=game_id).order_by(model.GamePlayer.turn_order)
+            ).all()
+            session.expunge_all()
+            return list(players)
+
+    def play(self, mode: model.DraftingMode) -> None:
+        """One game from lobby to payout, timing every step after the lobby is filled."""
+        game_id = self.next_game
+        self.next_game += 1
+        seated = self.rng.sample(sorted(self.players), 6)
+        self.games.lobby(game_id, seated[0], self.players[seated[0]], f"Bench {game_id}")
+        for player_id in seated[1:]:
+            self.games.join(game_id, player_id, self.players[player_id])
+        self.games.config(game_id, "drafting_mode", mode.value)
+
+        with self.timings.timed(f"start[{mode.name.lower()}]"):
+            self.games.start(self.factions, game_id)
+
+        if mode == model.DraftingMode.PICKS_AND_BANS:
+            for player in self.__turn_order(game_id):
+                # Everyone shares the pool, ban from the end and draft from the start.
+                faction = self.__turn_order(game_id)[0].factions[-1]
+                with self.timings.timed("ban"):
+                    self.games.ban(player.player_id, game_id, faction)
+
+        outside = [b for b in self.bettors if b not in seated]
+        for bettor in self.rng.sample(outside, min(2, len(outside))):
+            winner = self.players[self.rng.choice(seated)]
+            with self.timings.timed("bet"):
+                self.betting.bet(game_id, 10, winner, bettor, self.players[bettor])
+
+        for player in self.__turn_order(game_id):
+            faction = next(p for p in self.__turn_order(game_id) if p.player_id == player.player_id).factions[0]
+            with self.timings.timed(f"draft[{mode.name.lower()}]"):
+                self.games.draft(player.player_id, game_id, faction)
+
+        points = " ".join(str(p) for p in self.rng.sample(range(11), 6))
+        with self.timings.timed("finish"):
+            self.games.finish(True, game_id, points)
+        # What the ratings startup job does for each game it finds unrated.
+        with self.timings.timed("refresh_ratings"):
+            for unrated in self.ratings.unrated_games():
+                self.ratings.update_rating(None, unrated)
+        with self.timings.timed("payout"):
+            self.betting.payout(game_id)
+
+        with db.session(self.engine) as session:
+            if session.get(model.Game, game_id).game_state != model.GameState.FINISHED:
+                raise RuntimeError(f"Bench {game_id} did not play through in {mode.name}")
+
+    def read(self, calls: int) -> None:
+        ids = sorted(self.players)
+        for _ in range(calls):
+            player_id = self.rng.choice(ids)
+            with self.timings.timed("stats"):
+                self.ratings.stats(player_id)
+            with self.timings.timed("ratings"):
+                self.ratings.ratings()
+            with self.timings.timed("achievements"):
+                self.achievements.achievements(player_id, self.players[player_id])
+
+    def maintain(self, calls: int) -> None:
+        for _ in range(calls):
+            with self.timings.timed("load_achievements"):
+                listener.load_achievements(self.engine)
+            with self.timings.timed("reconcile"):
+                listener.reconcile(self.engine)
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+def run(size: str, games: int = 3, reads: int = 10, maintenance: int = 3, datasets: Path = DATASETS) -> Dict[str, Dict[str, float]]:
+    """Run every case on a copy of the dataset for size."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        copy_database(str(dataset(size, datasets)), path)
+        suite = Suite(path)
+        try:
+            for _ in range(games):
+                for mode in MODES:
+                    suite.play(mode)
+            suite.read(reads)
+            suite.maintain(maintenance)
+            return suite.timings.results()
+        finally:
+            suite.close()
+
+
+@dataclass
+class Comparison:
+    case: str
+    baseline: Optional[Dict[str, float]]
+    current: Optional[Dict[str, float]]
+    threshold: float
+    timings: bool = True
+
+    @property
+    def change(self) -> Optional[float]:
+        if not self.baseline or not self.current or not self.baseline["p50"]:
+            return None
+        return self.current["p50"] / self.baseline["p50"] - 1
+
+    @property
+    def status(self) -> str:
+        if self.current is None:
+            return "missing"
+        if self.baseline is None:
+            return "new"
+        if self.current["statements"] > self.baseline["statements"]:
+            return "more queries"
+        difference = self.current["p50"] - self.baseline["p50"]
+        if not self.timings or abs(difference) < NOISE_MS:
+            return "ok"
+        if self.change > self.threshold:
+            return "slower"
+        if self.change < -self.threshold:
+            return "faster"
+        return "ok"
+
+    @property
+    def regressed(self) -> bool:
+        return self.status in ("slower", "more queries")
+
+
+def compare(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    threshold: float = 0.25,
+    thresholds: Optional[Dict[str, float]] = None,
+    timings: bool = True,
+) -> List[Comparison]:
+    thresholds = thresholds or {}
+    return [
+        Comparison(case, baseline.get(case), current.get(case), thresholds.get(case, threshold), timings)
+        for case in sorted(baseline.keys() | current.keys())
+    ]
+
+
+def report(size: str, comparisons: List[Comparison]) -> str:
+    timed = all(c.timings for c in comparisons)
+    lines = [
+        f"{size}:" if timed else f"{size} (statement counts only):",
+        f"{'case':>28} {'base p50':>9} {'p50 ms':>9} {'p95 ms':>9} {'change':>8} {'stmts':>7}  status",
+    ]
+    for c in comparisons:
+        base = f"{c.baseline['p50']:9.2f}" if c.baseline else f"{'-':>9}"
+        p50, p95 = (f"{c.current['p50']:9.2f}", f"{c.current['p95']:9.2f}") if c.current else (f"{'-':>9}",) * 2
+        change = f"{c.change:+8.0%}" if c.change is not None else f"{'-':>8}"
+        statements = f"{c.current['statements']:7.1f}" if c.current else f"{'-':>7}"
+        lines.append(f"{c.case:>28} {base} {p50} {p95} {change} {statements}  {c.status}")
+    regressions = [c.case for c in comparisons if c.regressed]
+    lines.append(f"{len(regressions)} regressions" + (f": {', '.join(regressions)}" if regressions else ""))
+    return "\n".join(lines)
+
+
+def _baseline(size: str, directory: Path) -> dict:
+    path = directory / f"{size}.json"
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def load_baseline(size: str, directory: Path = BASELINES) -> Dict[str, Dict[str, float]]:
+    return _baseline(size, directory).get("cases", {})
+
+
+def timed_baseline(size: str, directory: Path = BASELINES) -> bool:
+    """Whether the timings of the baseline for size gate the run, False when saved with --statements-only."""
+    return _baseline(size, directory).get("timings", True)
+
+
+def save_baseline(
+    size: str, results: Dict[str, Dict[str, float]], directory: Path = BASELINES, timings: bool = True
+) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    players, games = SIZES[size]
+    path = directory / f"{size}.json"
+    path.write_text(json.dumps({
+        "size": size,
+        "players": players,
+        "games": games,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timings": timings,
+        "cases": results,
+    }, indent=2) + "\n")
+    return path
+
+
+def _case_threshold(value: str) -> Tuple[str, float]:
+    case, _, threshold = value.partition("=")
+    return case, float(threshold)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="small,medium", help=f"Comma separated, of {', '.join(SIZES)}")
+    parser.add_argument("--games", type=int, default=3, help="Games played per drafting mode")
+    parser.add_argument("--reads", type=int, default=10, help="Calls of each read path")
+    parser.add_argument("--maintenance", type=int, default=3, help="Calls of load_achievements and reconcile")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown of the median")
+    parser.add_argument("--case", type=_case_threshold, action="append", default=[], metavar="CASE=THRESHOLD",
+                        help="Threshold for one case, e.g. finish=0.5")
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    parser.add_argument("--datasets", type=Path, default=DATASETS)
+    parser.add_argument("--statements-only", action="store_true",
+                        help="Gate on statement counts only, for machines with noisy timings")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baselines")
+    parser.add_argument("--verbose", action="store_true", help="Show the log, e.g. slow statements")
+    args = parser.parse_args()
+    if not args.verbose:
+        # Slow statements, and checks of achievements about players the datasets don't have.
+        logging.disable(logging.ERROR)
+
+    regressed = False
+    for size in args.sizes.split(","):
+        results = run(size, args.games, args.reads, args.maintenance, args.datasets)
+        timings = not args.statements_only and timed_baseline(size, args.baselines)
+        comparisons = compare(load_baseline(size, args.baselines), results, args.threshold, dict(args.case), timings)
+        print(report(size, comparisons))
+        regressed |= any(c.regressed for c in comparisons)
+        if args.save:
+            print(f"Saved {save_baseline(size, results, args.baselines, not args.statements_only)}")
+    if regressed and not args.save:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,24 @@ import logging
 import discord
 
 
+from blinker import signal
 from itertools import batched
-from reactionmenu import ViewMenu, ViewButton
 from sqlalchemy import Engine, select
-from sqlalchemy.orm import Session
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 
 from . import model
+from .. import database
 from ..game import model as game_model
 from .checker import AchievementChecker
 
-from typing import Sequence, List, Optional
+from typing import TYPE_CHECKING, Sequence, List, Optional, Tuple
 from .achievementtype import *
 from ..typing import *
 
+if TYPE_CHECKING:
+    from reactionmenu import ViewMenu
+
 @dataclass
 class Achievement:
     name: str
@@ -32,8 +35,12 @@ class PlayerAchievements:
     name: str
     locked: List[Achievement]
     unlocked: List[Achievement]
+    # Ids of achievements reached now that still have to be stored with `unlock`.
+    achieved: List[str] = field(default_factory=list)
+
+    def view_menu(self, ctx) -> "ViewMenu":
+        from reactionmenu import ViewMenu, ViewButton
 
-    def view_menu(self, ctx) -> ViewMenu:
         def method(achievements: List[Achievement]) -> discord.Embed:
             embed = discord.Embed(
                 title=f"Achievements for player {self.name}",
@@ -85,27 +92,24 @@ class PlayerAchievements:
 class AchievementsLogic:
     """Logic around achievements."""
 
-    def __init__(self, engine: Engine) -> None:
+    def __init__(self, engine: Engine, read_engine: Optional[Engine] = None) -> None:
         self.engine = engine
-        self.checker = AchievementChecker(engine)
-        with Session(engine) as session:
-            ps = session.scalars(select(game_model.Player))
-            for p in ps:
-                self.achievements(p.player_id, p.name)
+        self.read_engine = read_engine or engine
+        self.checker = AchievementChecker(self.read_engine)
 
+    def players(self) -> List[Tuple[int, str]]:
+        with database.session(self.read_engine) as session:
+            return [tuple(row) for row in session.execute(select(game_model.Player.player_id, game_model.Player.name))]
 
-    def update_achievements_and_obtain_locked(self, session: Session, all_ach: Sequence[model.Achievement], player_id: int) -> List[Achievement]:
+    def obtain_locked_and_achieved(self, all_ach: Sequence[model.Achievement], player_id: int) -> Tuple[List[Achievement], List[model.Achievement]]:
         locked = []
+        achieved = []
         for ach in all_ach:
             match(self.checker.check(ach, player_id)):
                 case str(s):
                     logging.error(f"Achievement check failed: {s}")
                 case Achieved():
-                    session.add(model.PlayerAchievement(
-                        achievement_id=ach.achievement_id,
-                        player_id=player_id,
-                        awarded_by="automation"
-                    ))
+                    achieved.append(ach)
                 case Unlocked():
                     logging.exception(f"Achievement already unlocked: {ach.name}")
                 case Locked(current, target):
@@ -117,16 +121,19 @@ class AchievementsLogic:
                             unlocked_count = len(ach.player_unlocks),
                             description = ach.description,
                         ))
-        session.flush()
-        return locked
+        return locked, achieved
                 
 
 
     # Remove this stringbuilder pattern. Return an object that creates the "string view".
     def achievements(self, player_id: int, player_name) -> Result[PlayerAchievements]:
-        """Return a human-readable list of unlocked and locked achievements for player_id."""
+        """Return the unlocked and locked achievements for player_id.
+
+        Only reads. Achievements reached for the first time are listed as unlocked
+        and returned in `achieved`, to be stored with `unlock`.
+        """
         try:
-            with Session(self.engine) as session:
+            with database.session(self.read_engine) as session:
                 sq = select(model.PlayerAchievement).filter_by(player_id=player_id)
                 subquery = sq.subquery()
                 locked_achievements = session.scalars(
@@ -139,7 +146,7 @@ class AchievementsLogic:
                     
                 ).all()
 
-                locked = self.update_achievements_and_obtain_locked(session, locked_achievements, player_id)
+                locked, achieved = self.obtain_locked_and_achieved(locked_achievements, player_id)
                 pa = session.scalars(
                     sq
                 ).all()
@@ -153,24 +160,44 @@ class AchievementsLogic:
                         unlocked_time=p.unlocked_at,
                         unlocked_count = len(ach.player_unlocks),
                     ))
+                now = datetime.now()
+                for ach in achieved:
+                    unlocked.append(Achievement(
+                        name = ach.name,
+                        points = ach.points,
+                        description = ach.description,
+                        unlocked_time=now,
+                        unlocked_count = len(ach.player_unlocks) + 1,
+                    ))
 
                 player = session.get(game_model.Player, player_id)
-                if not player:
-                    player = game_model.Player(player_id=player_id, name=player_name)
-                    session.add(player)
-                session.commit()
                 return Ok(PlayerAchievements(
-                    name=player.name,
+                    name=player.name if player else player_name,
                     unlocked=unlocked,
                     locked=locked,
+                    achieved=[ach.achievement_id for ach in achieved],
                 ))
                 
         except Exception as e:
             logging.exception("Something went wrong")
             return Err("Something went wrong.")
 
-    def player_id_from_name(self, name: str) -> Optional[int]:
-        with Session(self.engine) as session:
-            return session.scalar(
-                select(game_model.Player.player_id).filter_by(name=name)
-            )
\ No newline at end of file
+    def unlock(self, player_id: int, player_name: str, achievement_ids: List[str]) -> None:
+        """Store achievements reached by player_id."""
+        with database.session(self.engine) as session:
+            if not session.get(game_model.Player, player_id):
+                session.add(game_model.Player(player_id=player_id, name=player_name))
+            for achievement_id in achievement_ids:
+                if session.get(model.PlayerAchievement, (player_id, achievement_id)):
+                    continue
+                session.add(model.PlayerAchievement(
+                    achievement_id=achievement_id,
+                    player_id=player_id,
+                    awarded_by="automation"
+                ))
+            session.commit()
+        signal("achievement").send(None, player_id=player_id)
+
+    def player_id_from_name(self, name: str) -> Result[int]:
+        with database.session(self.read_engine) as session:
+            return game_model.Player.find(session, name)
\ No newline at end of file
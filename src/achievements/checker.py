@@ -7,6 +7,7 @@ from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
 from . import model as achievements_model
+from .. import database
 from ..rating import model as rating_model
 from ..game import model as game_model
 from ..typing import *
@@ -38,7 +39,7 @@ class AchievementChecker:
         """Evaluate whether `player_id` satisfies `achievement`'s rule_json.
         """
         try:
-            with Session(self.engine) as session:
+            with database.session(self.engine) as session:
                 if self._is_unlocked(session, achievement.achievement_id, player_id):
                     return Unlocked()
 
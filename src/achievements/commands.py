@@ -1,11 +1,14 @@
 import logging
-import asyncio
 
 from . import achievementslogic
 from . import listener as achievements_listener
 
 from discord.ext import commands
-from sqlalchemy import Engine
+
+from .. import cache
+from .. import migrations
+from ..database import Database
+from ..startup import Startup
 
 from typing import Optional
 from ..typing import *
@@ -14,38 +17,69 @@ from ..typing import *
 class Achievements(commands.Cog):
     """Cog containing achievement related commands."""
 
-    def __init__(self, engine: Engine) -> None:
-        self.engine = engine
-        self.logic = achievementslogic.AchievementsLogic(engine)
+    def __init__(self, database: Database, startup: Startup, response_cache: cache.ResponseCache) -> None:
+        self.database = database
+        self.startup = startup
+        self.cache = response_cache
+        self.engine = database.engine
+        self.logic = achievementslogic.AchievementsLogic(self.engine, database.read_engine)
         try:
-            achievements_listener.register(engine)
+            achievements_listener.register(self.engine)
         except Exception:
             logging.exception("Failed to register achievements listener")
 
+        # Load achievement definitions from JSON files, then reconcile counters,
+        # then unlock whatever players achieved while the bot was down. The
+        # rules read the game results the migrations store.
+        startup.add(
+            "achievement definitions",
+            lambda: database.write(achievements_listener.load_achievements, self.engine),
+            after=(migrations.JOB,),
+        )
+        startup.add(
+            "achievement counters",
+            lambda: database.write(achievements_listener.reconcile, self.engine),
+            after=("achievement definitions",),
+        )
+        startup.add("achievement unlocks", self.__unlock_pending, after=("achievement counters",))
+
+    async def __unlock_pending(self) -> None:
+        # Unlock achievements players earned while the bot was down, one player at a time.
+        for player_id, name in await self.database.run(self.logic.players):
+            match await self.database.run(self.logic.achievements, player_id, name):
+                case Ok(s) if s.achieved:
+                    await self.database.write(self.logic.unlock, player_id, name, s.achieved)
+
+    async def cog_check(self, ctx: commands.Context) -> bool:
+        return self.startup.require("achievement unlocks")
+
     @commands.Cog.listener()
     async def on_ready(self) -> None:
         logging.info("Achievements cog loaded")
-        # Load achievement definitions from JSON files and then reconcile counters
-        try:
-            asyncio.create_task(asyncio.to_thread(achievements_listener.load_achievements, self.engine))
-            asyncio.create_task(asyncio.to_thread(achievements_listener.reconcile, self.engine))
-        except Exception:
-            logging.exception("Failed to schedule achievements startup tasks")
-
 
     @commands.command()
     async def achievements(self, ctx: commands.Context, *, name_input: Optional[str]) -> None:
             """Type !achievements to view your achievements or !achievements {name} to view someone else's."""
             id, name = ctx.author.id, ctx.author.name
             if name_input:
-                id = self.logic.player_id_from_name(name_input)
-                if not id:
-                    await ctx.send("Could not find that player")
+                found = await self.database.run(self.logic.player_id_from_name, name_input)
+                if isinstance(found, Err):
+                    await ctx.send(found.msg)
                     return
+                id = found.value
                 
                 
-            match self.logic.achievements(id, name):
+            result = await self.cache.get(
+                ("achievements", id, name),
+                lambda: self.database.run(self.logic.achievements, id, name),
+                tags=(cache.FINISH, cache.ACHIEVEMENT),
+                # Achievements still to be unlocked are stored right below, which changes the result.
+                store=lambda r: isinstance(r, Ok) and not r.value.achieved,
+            )
+            match result:
                 case Ok(s):
+                    if s.achieved:
+                        await self.database.write(self.logic.unlock, id, name, s.achieved)
                     await s.view_menu(ctx).start()
                 case Err(s):
                     await ctx.send(s)
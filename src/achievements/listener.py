@@ -6,6 +6,7 @@ from pathlib import Path
 import json
 
 from . import model as achievements_model
+from .. import database
 from ..game import controller as game_controller
 from ..game import model as game_model
 
@@ -15,7 +16,7 @@ def register(engine) -> None:
 
     def _on_finish(sender, game_id: int):
         try:
-            with Session(engine) as session:
+            with database.session(engine) as session:
                 # Load finished game and determine winner
                 game = session.get(game_model.Game, game_id)
                 if not game:
@@ -107,30 +108,10 @@ def reconcile_achievements(session: Session):
         session.add(up)
 
 def reconcile_wins(session: Session):
-    # Build subquery to find max points per finished game
-    sq = (
-        select(
-            game_model.GamePlayer.game_id,
-            func.max(game_model.GamePlayer.points).label("max_points"),
-        )
-        .group_by(game_model.GamePlayer.game_id)
-        .filter(
-            game_model.GamePlayer.game.has(
-                game_model.Game.game_state == game_model.GameState.FINISHED
-            )
-        )
-        .subquery()
-    )
-
-    # Count wins per player by joining with subquery where points == max_points
+    # Count wins per player from the results stored at finish
     stmt = (
         select(game_model.GamePlayer.player_id, func.count("*").label("wins"))
-        .select_from(game_model.GamePlayer)
-        .join(
-            sq,
-            (sq.c.game_id == game_model.GamePlayer.game_id)
-            & (sq.c.max_points == game_model.GamePlayer.points),
-        )
+        .filter_by(is_winner=True)
         .group_by(game_model.GamePlayer.player_id)
     )
 
@@ -153,7 +134,7 @@ def reconcile(engine) -> None:
     """
 
     try:
-        with Session(engine) as session:
+        with database.session(engine) as session:
             reconcile_games(session)
             reconcile_wins(session)
             reconcile_achievements(session)
@@ -189,7 +170,7 @@ def load_achievements(engine, dir_path: str | None = None) -> None:
             logging.info("No achievement JSON files found in %s", str(base))
             return
 
-        with Session(engine) as session:
+        with database.session(engine) as session:
             for fp in files:
                 try:
                     data = json.loads(fp.read_text(encoding="utf-8"))
@@ -42,7 +42,7 @@ class PlayerAchievement(models.Base):
 
     player_id: Mapped[int] = mapped_column("player.player_id", primary_key=True)
     achievement_id: Mapped[str] = mapped_column(
-        String(26), ForeignKey("achievement.achievement_id"), primary_key=True
+        String(26), ForeignKey("achievement.achievement_id"), primary_key=True, index=True
     )
     unlocked_at: Mapped[datetime] = mapped_column(
         DateTime, server_default=func.current_timestamp()
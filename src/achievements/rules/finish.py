@@ -103,29 +103,20 @@ def finish(session: Session, rule: Dict[str, Any], player_id: int) -> Achievemen
                     return "Unsupported role in against_faction filter"
 
                 gp_named = aliased(game_model.GamePlayer)
-                gp_cmp = aliased(game_model.GamePlayer)
 
                 if role == "winner":
-                    # primary GamePlayer must have fewer or equal points than named? No,
-                    # we require that the named player is the winner. So named player's
-                    # row has no other player with more points.
+                    # The named player's row is a winner of the game.
                     role_clause = select(gp_named).where(
                         gp_named.game_id == game_model.GamePlayer.game_id,
                         gp_named.faction == faction_name,
-                        ~select(gp_cmp).where(
-                            gp_cmp.game_id == gp_named.game_id,
-                            gp_cmp.points > gp_named.points,
-                        ).exists(),
+                        gp_named.is_winner == True,
                         gp_named.player_id != game_model.GamePlayer.player_id,
                     ).exists()
                 elif role == "loser":
                     role_clause = select(gp_named).where(
                         gp_named.game_id == game_model.GamePlayer.game_id,
                         gp_named.faction == faction_name,
-                        ~select(gp_cmp).where(
-                            gp_cmp.game_id == gp_named.game_id,
-                            gp_cmp.points < gp_named.points,
-                        ).exists(),
+                        gp_named.is_last == True,
                         gp_named.player_id != game_model.GamePlayer.player_id,
                     ).exists()
                 else:
@@ -148,11 +139,8 @@ def finish(session: Session, rule: Dict[str, Any], player_id: int) -> Achievemen
     if isinstance(filter_, dict) and "win_against" in filter_:
         f = filter_["win_against"]
         gp_op = aliased(game_model.GamePlayer)
-        # primary is winner: no other player in same game has more points
-        stmt = stmt.where(~select(gp_op).where(
-            gp_op.game_id == game_model.GamePlayer.game_id,
-            gp_op.points > game_model.GamePlayer.points,
-        ).exists())
+        # primary is winner, tied winners included
+        stmt = stmt.where(game_model.GamePlayer.is_winner == True)
 
         if isinstance(f, str):
             stmt = stmt.where(select(gp_op).where(
@@ -174,11 +162,8 @@ def finish(session: Session, rule: Dict[str, Any], player_id: int) -> Achievemen
     if isinstance(filter_, dict) and "lose_against" in filter_:
         f = filter_["lose_against"]
         gp_op = aliased(game_model.GamePlayer)
-        # primary is loser: no other player in same game has fewer points
-        stmt = stmt.where(~select(gp_op).where(
-            gp_op.game_id == game_model.GamePlayer.game_id,
-            gp_op.points < game_model.GamePlayer.points,
-        ).exists())
+        # primary is loser, tied last places included
+        stmt = stmt.where(game_model.GamePlayer.is_last == True)
 
         if isinstance(f, str):
             stmt = stmt.where(select(gp_op).where(
@@ -222,29 +207,20 @@ def finish(session: Session, rule: Dict[str, Any], player_id: int) -> Achievemen
                     return f"Player not found: {name}"
 
                 gp_named = aliased(game_model.GamePlayer)
-                gp_cmp = aliased(game_model.GamePlayer)
 
                 if role == "winner":
-                    # Require that the named player's GamePlayer row in the same
-                    # game has no other player with more points (i.e. they finished first)
+                    # Require that the named player won the same game
                     stmt = stmt.where(select(gp_named).where(
                         gp_named.game_id == game_model.GamePlayer.game_id,
                         gp_named.player_id == other_player.player_id,
-                        ~select(gp_cmp).where(
-                            gp_cmp.game_id == gp_named.game_id,
-                            gp_cmp.points > gp_named.points,
-                        ).exists(),
+                        gp_named.is_winner == True,
                     ).exists())
                 elif role == "loser":
-                    # Require that the named player's GamePlayer row in the same
-                    # game has no other player with fewer points (i.e. they finished last)
+                    # Require that the named player finished the same game last
                     stmt = stmt.where(select(gp_named).where(
                         gp_named.game_id == game_model.GamePlayer.game_id,
                         gp_named.player_id == other_player.player_id,
-                        ~select(gp_cmp).where(
-                            gp_cmp.game_id == gp_named.game_id,
-                            gp_cmp.points < gp_named.points,
-                        ).exists(),
+                        gp_named.is_last == True,
                     ).exists())
                 else:
                     return "Unsupported player role"
@@ -1,8 +1,9 @@
 import logging
 from . import model as betting_model
+from .. import database
 from ..game import model as game_model
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import Engine, select
 
 from typing import Optional
@@ -18,7 +19,7 @@ class BettingLogic:
     def _balance(session: Session, bettor: betting_model.Bettor) -> int:
         session.flush()
         stmt = select(betting_model.GameBet).filter_by(player_id=bettor.player_id)
-        debts = session.execute(stmt).all()
+        debts = session.scalars(stmt).all()
         total_debt = sum([debt.bet for debt in debts])
 
         return bettor.balance - total_debt
@@ -26,7 +27,7 @@ class BettingLogic:
     def balance(self, id: int, name) -> str:
         """Returns bettor's current balance."""
         try:
-            with Session(self.engine) as session:
+            with database.session(self.engine) as session:
                 bettor = session.get(betting_model.Bettor, id)
                 if not bettor:
                     player = session.get(game_model.Player, id)
@@ -45,7 +46,7 @@ class BettingLogic:
 
     def payout(self, game_id: int) -> str:
         try:
-            with Session(self.engine) as session:
+            with database.session(self.engine) as session:
                 game = session.get(game_model.Game, game_id)
                 if not game:
                     return "Game not found."
@@ -54,19 +55,13 @@ class BettingLogic:
 
                 stmt = select(betting_model.GameBet).filter_by(game_id=game.game_id)
                 bets = session.scalars(stmt).all()
-                winner = (
-                    session.query(game_model.GamePlayer)
-                    .with_parent(game)
-                    .order_by(game_model.GamePlayer.points.desc())
-                    .first()
-                )
                 if not bets:
                     return "No bets placed"
-                if winner is None:
+                if game.winner_player_id is None:
                     return "Something went wrong"
                 lines = []
                 for game_bet in bets:
-                    if game_bet.winner == winner.player_id:
+                    if game_bet.winner == game.winner_player_id:
                         bettor = game_bet.bettor
                         bettor.balance += game_bet.bet
                         lines.append(f"{bettor.player.name} won {game_bet.bet} Jake coins!")
@@ -92,7 +87,7 @@ class BettingLogic:
         name: str,
     ) -> str:
         """Places a bet on game_id, for bet amount on player id."""
-        with Session(self.engine) as session:
+        with database.session(self.engine) as session:
             bettor = session.get(betting_model.Bettor, id)
             if not bettor:
                 player = session.get(game_model.Player, id)
@@ -101,7 +96,7 @@ class BettingLogic:
                     session.add(player)
                 bettor = betting_model.Bettor(player_id=id)
                 session.add(bettor)
-            session.commit()
+                session.commit()
 
             game = session.get(game_model.Game, game_id)
             if not game:
@@ -147,7 +142,12 @@ class BettingLogic:
             if bet_amount <= 0:
                 return "Nice try"
 
-            stmt = select(game_model.GamePlayer).filter_by(game_id=game.game_id)
+            # The names come with the players, not a query per player.
+            stmt = (
+                select(game_model.GamePlayer)
+                .filter_by(game_id=game.game_id)
+                .options(joinedload(game_model.GamePlayer.player))
+            )
             players = session.scalars(stmt).all()
             for player in players:
                 if winner == player.player.name:
@@ -160,6 +160,6 @@ class BettingLogic:
                     session.add(gm)
                     session.merge(bettor)
                     session.commit()
-                    return f"You placed a bet on {player.player.name} for {gm.bet} Jake coins to win this game."
-                    
+                    return f"You placed a bet on {winner} for {bet_amount} Jake coins to win this game."
+
             return "Player not found."
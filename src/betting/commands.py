@@ -3,7 +3,9 @@ import logging
 from . import bettinglogic
 
 from discord.ext import commands
-from sqlalchemy import Engine
+
+from ..database import Database
+from ..game.executor import GameExecutor
 
 from typing import Optional
 
@@ -11,8 +13,10 @@ from typing import Optional
 class Betting(commands.Cog):
     """Cog containing betting related commands."""
 
-    def __init__(self, engine: Engine) -> None:
-        self.logic = bettinglogic.BettingLogic(engine)
+    def __init__(self, database: Database, games: GameExecutor) -> None:
+        self.database = database
+        self.games = games
+        self.logic = bettinglogic.BettingLogic(database.engine)
 
     @commands.Cog.listener()
     async def on_ready(self) -> None:
@@ -21,19 +25,28 @@ class Betting(commands.Cog):
     @commands.command()
     async def balance(self, ctx: commands.Context) -> None:
         """Returns bettor's current balance."""
-        await ctx.send(self.logic.balance(ctx.author.id, ctx.author.name))
+        await ctx.send(
+            await self.database.write(self.logic.balance, ctx.author.id, ctx.author.name)
+        )
 
     @commands.command()
     async def payout(self, ctx: commands.Context) -> None:
-        await ctx.send(self.logic.payout(ctx.channel.id))
+        async with self.games.serialized(ctx.channel.id):
+            await ctx.send(await self.database.write(self.logic.payout, ctx.channel.id))
 
     @commands.command()
     async def bet(
         self, ctx: commands.Context, bet_amount: Optional[int], winner: Optional[str]
     ) -> None:
         """Places a bet for bet amount on player. Usage !bet {amount} {player}"""
-        await ctx.send(
-            self.logic.bet(
-                ctx.channel.id, bet_amount, winner, ctx.author.id, ctx.author.name
+        async with self.games.serialized(ctx.channel.id):
+            await ctx.send(
+                await self.database.write(
+                    self.logic.bet,
+                    ctx.channel.id,
+                    bet_amount,
+                    winner,
+                    ctx.author.id,
+                    ctx.author.name,
+                )
             )
-        )
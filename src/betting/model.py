@@ -14,7 +14,7 @@ class GameBet(models.Base):
 
     # One bet per game per bettor. Could relax this to allow hedging.
     player_id: Mapped[int] = mapped_column(
-        ForeignKey("bettor.player_id"), primary_key=True
+        ForeignKey("bettor.player_id"), primary_key=True, index=True
     )
 
     winner: Mapped[Optional[int]] = mapped_column(ForeignKey("player.player_id"))
@@ -130,7 +130,7 @@ def test_payout_success(db):
     session, logic = db
     # Setup finished game, player, bettor, and bet
     game = game_model.Game(
-        game_id=1, name="TestGame", game_state=game_model.GameState.FINISHED
+        game_id=1, name="TestGame", game_state=game_model.GameState.FINISHED, winner_player_id=1
     )
     player1 = game_model.Player(player_id=1, name="Alice")
     player2 = game_model.Player(player_id=2, name="Bob")
@@ -141,3 +141,18 @@ def test_payout_success(db):
     session.commit()
     result = logic.payout(1)
     assert "Bob won 10 Jake coins!" in result
+
+
+def test_balance_subtracts_open_bets(db):
+    session, logic = db
+    game = game_model.Game(
+        game_id=1, name="TestGame", game_state=game_model.GameState.DRAFT
+    )
+    player = game_model.Player(player_id=2, name="Bob")
+    bettor = betting_model.Bettor(player_id=2, balance=100)
+    bet = betting_model.GameBet(game_id=1, player_id=2, winner=2, bet=30)
+    session.add_all([game, player, bettor, bet])
+    session.commit()
+    assert "Bob has 70 Jake coins." in logic.balance(2, "Bob")
+    result = logic.bet(1, 80, "Bob", 2, "Bob")
+    assert "You have a bet placed on Bob for 30 Jake coins" in result
@@ -1,50 +1,139 @@
 import discord
 import asyncio
-import Levenshtein
+import functools
 
 from .game.commands import Game
 from .misc.commands import Misc
 from .rating.commands import Rating
 from .betting.commands import Betting
 from .achievements.commands import Achievements
+from .perf.commands import Perf
+from .perf.metrics import Metrics, instrument_http
+from .perf.recorder import Recorder, RecordingContext
+from .perf.watchdog import Watchdog
 
 from discord.ext import commands
+from typing import Optional
 from sqlalchemy import create_engine
-from . import models
+from . import matching, migrations
+from .cache import ResponseCache
+from .database import Database, MemoryStore
+from .game.executor import GameExecutor
+from .startup import Startup, WarmingUp
 
-from sqlalchemy.engine import Engine
-from sqlalchemy import event
 
+class Bot(commands.Bot):
+    def __init__(
+        self,
+        intents: discord.Intents,
+        metrics_host: str = "127.0.0.1",
+        metrics_port: Optional[int] = None,
+        record_to: Optional[str] = None,
+        checkpoint_interval: Optional[float] = None,
+    ) -> None:
+        # With a checkpoint interval, app.db is served from memory and written
+        # back that often. See MemoryStore for what can be lost.
+        store = MemoryStore("app.db", checkpoint_interval) if checkpoint_interval else None
+        engine = create_engine(store.url if store else "sqlite:///app.db", connect_args={"timeout": 15})
 
-@event.listens_for(Engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.execute("PRAGMA journal_mode=WAL")
-    cursor.close()
+        # Instantiate missing tables and make the quick schema changes now. The
+        # backfills and index builds of the migrations run as a startup job.
+        self.migrator = migrations.Migrator(engine)
+        pending = self.migrator.prepare()
 
+        # All database work runs on the database pool, off the event loop.
+        self.database = Database(engine, store=store)
 
-class Bot(commands.Bot):
-    def __init__(self, intents: discord.Intents) -> None:
-        engine = create_engine("sqlite:///app.db", connect_args={"timeout": 15})
+        # Serializes the commands that change a game, per game.
+        self.games = GameExecutor()
+
+        # Responses of read-only commands, invalidated when their data changes.
+        self.cache = ResponseCache()
+
+        # Latency of every command, split into DB, Discord HTTP and Python time.
+        self.metrics = Metrics()
+        self.watchdog = Watchdog()
+
+        # Prometheus endpoint, only served when a port is given.
+        self.metrics_server = None
+        if metrics_port is not None:
+            # aiohttp.web is only imported when the endpoint is enabled.
+            from .perf import exporter
+
+            self.metrics_server = exporter.MetricsServer(
+                [
+                    exporter.command_collector(self.metrics),
+                    exporter.statement_collector,
+                    exporter.loop_collector(self.watchdog),
+                    exporter.game_queue_collector(self.games),
+                    exporter.cache_collector(self.cache),
+                    exporter.games_collector(self.database),
+                    exporter.process_collector,
+                ],
+                host=metrics_host,
+                port=metrics_port,
+            )
 
-        # Instantiate all the tables.
-        models.Base.metadata.create_all(engine)
+        # Every invoked command and its replies, for replaying against another build.
+        self.recorder = Recorder(record_to) if record_to else None
 
-        # Pass engine to cogs that need it.
-        self.init_cogs = [Game(self, engine), Misc(), Betting(engine), Rating(engine), Achievements(engine)]
+        # Cogs add their heavy startup work here. It runs in the background so the
+        # gateway can connect right away.
+        self.startup = Startup()
+        self.startup.add(migrations.JOB, lambda: self.migrator.run(pending, self.database.write))
+
+        # Pass the database to cogs that need it.
+        self.init_cogs = [
+            Game(self, self.database, self.games, self.cache, self.startup),
+            Misc(),
+            Betting(self.database, self.games),
+            Rating(self.database, self.startup, self.cache),
+            Achievements(self.database, self.startup, self.cache),
+            Perf(self.metrics, self.watchdog, self.games),
+        ]
 
         super().__init__(command_prefix="!", intents=intents)
+        self.before_invoke(self.metrics.before_invoke)
+        self.after_invoke(self.metrics.after_invoke)
+        instrument_http(self.http)
+        if self.recorder is not None:
+            self.add_listener(self.recorder.on_command_completion)
+            self.add_listener(self.recorder.on_command_error)
+            self.add_listener(self.recorder.on_guild_channel_create)
 
-    async def on_command_error(self, ctx: commands.Context, error: Exception) -> None:
-        similarity = max([(command.name, Levenshtein.ratio(ctx.message.content, command.name)) for command in self.commands], key = lambda x: x[1])[0]
+    async def get_context(self, origin, *, cls=commands.Context):
+        if self.recorder is not None and cls is commands.Context:
+            cls = RecordingContext
+        return await super().get_context(origin, cls=cls)
 
-        if isinstance(error, commands.CommandNotFound):
+    async def on_command_error(self, ctx: commands.Context, error: Exception) -> None:
+        if isinstance(error, WarmingUp):
+            await ctx.send(str(error))
+        elif isinstance(error, commands.CommandNotFound):
+            similarity = self.command_matcher.match(ctx.invoked_with or ctx.message.content, cutoff=-1)
             await ctx.send(embed=discord.Embed(
                 title="Command not found",
                 description=f"{error}. Did you mean !{similarity}? Type !help for a list of commands",
                 color=discord.Color.red()
             ))
 
+    @functools.cached_property
+    def command_matcher(self) -> matching.Matcher[str]:
+        # Commands are all registered by the time a command can fail.
+        return matching.Matcher(sorted(command.name for command in self.commands))
+
     async def setup_hook(self) -> None:
+        self.watchdog.start()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
         await asyncio.gather(*(self.add_cog(cog) for cog in self.init_cogs))
+        self.startup.start()
+
+    async def close(self) -> None:
+        self.watchdog.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await super().close()
+        await asyncio.to_thread(self.database.close)
+        if self.recorder is not None:
+            self.recorder.close()
@@ -0,0 +1,138 @@
+import threading
+import time
+
+from blinker import signal
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Iterable, Optional, Tuple, TypeVar
+
+from . import database
+
+T = TypeVar("T")
+
+# Signals sent by the logic classes after they change data that commands cache.
+FINISH = "finish"  # A game finished, sent with game_id.
+RATINGS = "ratings"  # Ratings were updated for a game, sent with game_id.
+PROFILE = "profile"  # A player changed their profile, sent with player_id.
+ACHIEVEMENT = "achievement"  # A player unlocked achievements, sent with player_id.
+
+# Key is (command, *arguments).
+Key = Tuple[Hashable, ...]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires: float
+    tags: FrozenSet[Hashable]
+
+
+class ResponseCache:
+    """Read-through cache for the responses of read-only commands.
+
+    Entries are keyed on the command and its arguments, expire after `ttl`
+    seconds and the least recently used are evicted beyond `max_entries`. Each
+    entry lists the tags it depends on, and the signals above invalidate the
+    matching tags once the write that sent them is committed. A response
+    computed while an invalidation happened is returned but not stored, since
+    it may have read the data from before the write.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 512) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self.generation = 0
+        self.hits: Counter[Hashable] = Counter()
+        self.misses: Counter[Hashable] = Counter()
+        self.evictions = 0
+        self.invalidations = 0
+
+        # Bound methods are held weakly, so a dropped cache disconnects itself.
+        signal(FINISH).connect(self.__on_finish)
+        signal(RATINGS).connect(self.__on_ratings)
+        signal(PROFILE).connect(self.__on_profile)
+        signal(ACHIEVEMENT).connect(self.__on_achievement)
+
+    def __on_finish(self, sender: Any, **kwargs: Any) -> None:
+        database.after_commit(lambda: self.invalidate(FINISH))
+
+    def __on_ratings(self, sender: Any, **kwargs: Any) -> None:
+        database.after_commit(lambda: self.invalidate(RATINGS))
+
+    def __on_profile(self, sender: Any, player_id: int, **kwargs: Any) -> None:
+        # The leaderboard lists everyone with a profile, so it depends on all of them.
+        database.after_commit(lambda: self.invalidate(PROFILE, (PROFILE, player_id)))
+
+    def __on_achievement(self, sender: Any, **kwargs: Any) -> None:
+        # Unlock counts are shown to every player, so drop them all.
+        database.after_commit(lambda: self.invalidate(ACHIEVEMENT))
+
+    async def get(
+        self,
+        key: Key,
+        compute: Callable[[], Awaitable[T]],
+        tags: Iterable[Hashable] = (),
+        ttl: Optional[float] = None,
+        store: Callable[[T], bool] = lambda _: True,
+    ) -> T:
+        """The cached response for key, or the result of compute.
+
+        A result is only cached if store(result) is true, so errors can be
+        kept out.
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires > now:
+                self.entries.move_to_end(key)
+                self.hits[key[0]] += 1
+                return entry.value
+            if entry is not None:
+                del self.entries[key]
+            self.misses[key[0]] += 1
+            generation = self.generation
+
+        value = await compute()
+        if not store(value):
+            return value
+
+        with self.lock:
+            if self.generation == generation:
+                expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+                self.entries[key] = _Entry(value, expires, frozenset(tags))
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, *tags: Hashable) -> None:
+        """Drop every entry depending on any of tags."""
+        with self.lock:
+            self.generation += 1
+            stale = [key for key, entry in self.entries.items() if not entry.tags.isdisjoint(tags)]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def hit_rate(self, command: Optional[Hashable] = None) -> float:
+        hits = self.hits[command] if command else sum(self.hits.values())
+        misses = self.misses[command] if command else sum(self.misses.values())
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "entries": len(self.entries),
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "hit_rate": self.hit_rate(),
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
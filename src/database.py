@@ -0,0 +1,356 @@
+import asyncio
+import contextvars
+import functools
+import itertools
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field
+from sqlalchemy import Connection, Engine, create_engine, event
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .perf.metrics import timed
+
+T = TypeVar("T")
+
+# Set on the writer thread while a batch is open.
+_batch = threading.local()
+
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def session(bind: Engine) -> Session:
+    """Open a Session on bind.
+
+    On the writer thread the Session instead joins the open batch through a
+    SAVEPOINT, so `session.commit()` only releases the savepoint and the whole
+    batch is committed at once by the writer.
+    """
+    connection: Optional[Connection] = getattr(_batch, "connection", None)
+    if connection is not None:
+        return Session(connection, join_transaction_mode="create_savepoint")
+    return Session(bind)
+
+
+def after_commit(fn: Callable[[], None]) -> None:
+    """Call fn once the data written so far is committed.
+
+    On the writer thread that is after the whole batch commits, just before
+    the write futures resolve, and fn is dropped if the unit or batch rolls
+    back. Elsewhere the caller has already committed and fn runs right away.
+    """
+    callbacks: Optional[List[Callable[[], None]]] = getattr(_batch, "after_commit", None)
+    if callbacks is None:
+        fn()
+    else:
+        callbacks.append(fn)
+
+
+@dataclass
+class _WriteUnit:
+    fn: Callable[..., Any]
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+    future: Future = field(default_factory=Future)
+
+
+def _disable_pysqlite_transactions(dbapi_connection, connection_record) -> None:
+    # pysqlite opens and commits transactions behind our back, which breaks
+    # nested SAVEPOINTs. Take over and emit BEGIN ourselves.
+    dbapi_connection.isolation_level = None
+
+
+def _begin_immediate(connection: Connection) -> None:
+    connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _read_only_pragmas(dbapi_connection, connection_record) -> None:
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    # 16 MiB page cache per reader and in-memory temp tables for sorts/group bys.
+    cursor.execute("PRAGMA cache_size=-16384")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _begin_snapshot(connection: Connection) -> None:
+    # A deferred BEGIN pins one WAL snapshot for every query in the session.
+    connection.exec_driver_sql("BEGIN")
+
+
+def read_only_engine(engine: Engine, pool_size: int, snapshot: bool = True) -> Engine:
+    """An engine on the same database whose connections can only read.
+
+    Under WAL, readers never wait for the writer, so read-heavy commands get
+    their own pool instead of queueing behind write transactions. Without
+    WAL a pinned snapshot would hold off the writer for the whole session,
+    so pass snapshot=False and every statement reads the latest data.
+    """
+    read_engine = create_engine(
+        engine.url, connect_args={"timeout": 15}, pool_size=pool_size
+    )
+    event.listen(read_engine, "connect", _read_only_pragmas)
+    if snapshot:
+        event.listen(read_engine, "begin", _begin_snapshot)
+    return read_engine
+
+
+class Writer:
+    """Single writer for a SQLite database with group commit.
+
+    Write units from every cog are queued and applied in order on one
+    connection. Units that queue up while a batch is being applied, or within
+    the optional `window` seconds after the first one, share a single
+    transaction and thus a single fsync. Each unit runs in its own SAVEPOINT, so a unit that raises
+    is rolled back alone and the rest of the batch still commits.
+    """
+
+    def __init__(self, engine: Engine, window: float = 0.0, max_batch: int = 64) -> None:
+        if engine.url.database in (None, "", ":memory:"):
+            raise ValueError("The writer needs a file backed database")
+        self.window = window
+        self.max_batch = max_batch
+        self.engine = create_engine(
+            engine.url, connect_args={"timeout": 15}, pool_size=1, max_overflow=0
+        )
+        event.listen(self.engine, "connect", _disable_pysqlite_transactions)
+        event.listen(self.engine, "begin", _begin_immediate)
+
+        self.queue: queue.Queue[Optional[_WriteUnit]] = queue.Queue()
+        # Set when the writer thread died, every write fails with it from then on.
+        self.error: Optional[BaseException] = None
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.__run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        """Queue fn(*args, **kwargs) to run on the writer. The future resolves once its batch is committed."""
+        unit = _WriteUnit(fn, args, kwargs)
+        with self.lock:
+            if self.error is not None:
+                raise RuntimeError("The database writer has stopped") from self.error
+            self.queue.put(unit)
+        return unit.future
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+        self.engine.dispose()
+
+    def __collect(self, first: _WriteUnit) -> Tuple[List[_WriteUnit], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                unit = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if unit is None:
+                return batch, True
+            batch.append(unit)
+        return batch, False
+
+    def __apply(self, connection: Connection, batch: List[_WriteUnit]) -> None:
+        outcomes: List[Tuple[_WriteUnit, Any, Optional[BaseException]]] = []
+        callbacks: List[Callable[[], None]] = []
+        _batch.connection = connection
+        _batch.after_commit = callbacks
+        try:
+            with connection.begin():
+                for unit in batch:
+                    registered = len(callbacks)
+                    try:
+                        with connection.begin_nested():
+                            result = unit.context.run(unit.fn, *unit.args, **unit.kwargs)
+                        outcomes.append((unit, result, None))
+                    except Exception as e:
+                        # The unit was rolled back, so its callbacks have nothing to act on.
+                        del callbacks[registered:]
+                        outcomes.append((unit, None, e))
+        except Exception as e:
+            logging.exception("Write batch failed to commit")
+            for unit in batch:
+                unit.future.set_exception(e)
+            return
+        finally:
+            _batch.connection = None
+            _batch.after_commit = None
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logging.exception("After commit callback failed")
+
+        for unit, result, error in outcomes:
+            if error is not None:
+                unit.future.set_exception(error)
+            else:
+                unit.future.set_result(result)
+
+    def __run(self) -> None:
+        batch: List[_WriteUnit] = []
+        try:
+            with self.engine.connect() as connection:
+                stopping = False
+                while not stopping:
+                    first = self.queue.get()
+                    if first is None:
+                        break
+                    batch, stopping = self.__collect(first)
+                    self.__apply(connection, batch)
+        except BaseException as e:
+            logging.exception("Database writer stopped")
+            self.__fail(batch, e)
+
+    def __fail(self, batch: List[_WriteUnit], error: BaseException) -> None:
+        with self.lock:
+            self.error = error
+            pending = list(batch)
+            while True:
+                try:
+                    unit = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if unit is not None:
+                    pending.append(unit)
+        for unit in pending:
+            if not unit.future.done():
+                unit.future.set_exception(error)
+
+
+_memory_databases = itertools.count(1)
+
+
+class MemoryStore:
+    """Serves a database file from memory and writes it back behind the bot.
+
+    The file is copied into a shared in-memory database, which every engine on
+    `url` opens, so reads and writes never touch the disk. A checkpoint copies
+    the whole database back to the file with SQLite's online backup API, every
+    `interval` seconds when something changed and once more on `close`.
+
+    Durability: a checkpoint replaces the file in one transaction, so the file
+    always holds a consistent, committed state. Writes committed since the
+    last checkpoint, at most `interval` seconds of them, are lost if the
+    process dies without closing the store. The file must not be used by
+    anything else in the meantime, its changes would be overwritten. The
+    in-memory database has no WAL, so a write commits only once the reads in
+    progress are done.
+    """
+
+    def __init__(self, path: str, interval: float = 60.0) -> None:
+        self.path = path
+        self.interval = interval
+        name = f"file:/memory-{next(_memory_databases)}?vfs=memdb"
+        self.url = f"sqlite:///{name}&uri=true"
+        # Keeps the in-memory database alive, and is the source of checkpoints.
+        self.connection = sqlite3.connect(name, uri=True, check_same_thread=False)
+        self.__load()
+        self.lock = threading.Lock()
+        self.checkpointed = self.__data_version()
+        self.checkpoints = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.__run, name="db-checkpoint", daemon=True)
+        self.thread.start()
+
+    def __load(self) -> None:
+        with closing(sqlite3.connect(self.path)) as disk:
+            if not disk.execute("PRAGMA page_count").fetchone()[0]:
+                return  # A new database
+            image = bytearray(disk.serialize())
+        # The in-memory database can't use WAL. Mark the image as using a
+        # rollback journal, the file keeps its own mode on checkpoints.
+        image[18:20] = b"\x01\x01"
+        with closing(sqlite3.connect(":memory:")) as loaded:
+            loaded.deserialize(bytes(image))
+            loaded.backup(self.connection)
+
+    def __data_version(self) -> int:
+        # Changes whenever another connection commits.
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def checkpoint(self) -> bool:
+        """Copy the database to the file if it changed. Returns whether it did."""
+        with self.lock:
+            version = self.__data_version()
+            if version == self.checkpointed:
+                return False
+            started = time.perf_counter()
+            with closing(sqlite3.connect(self.path)) as disk:
+                disk.execute("PRAGMA synchronous=FULL")
+                self.connection.backup(disk)
+            self.checkpointed = version
+            self.checkpoints += 1
+            logging.info(f"Checkpointed {self.path} in {(time.perf_counter() - started) * 1000:.0f} ms")
+            return True
+
+    def __run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception:
+                logging.exception(f"Checkpoint of {self.path} failed")
+
+    def close(self) -> None:
+        """Stop the periodic checkpoints and write the last changes."""
+        self.stopped.set()
+        self.thread.join()
+        self.checkpoint()
+        self.connection.close()
+
+
+class Database:
+    """Runs blocking database work off the event loop.
+
+    Reads go through `run`, which executes them on a bounded pool of worker
+    threads. Logic classes should point their read paths at `read_engine`.
+    Anything that writes goes through `write`, which hands it to the single
+    writer. With a MemoryStore, engine is on the store's url and closing the
+    database makes the final checkpoint.
+    """
+
+    def __init__(self, engine: Engine, workers: int = 4, store: Optional[MemoryStore] = None) -> None:
+        self.engine = engine
+        self.store = store
+        self.read_engine = read_only_engine(engine, pool_size=workers, snapshot=store is None)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self.writer = Writer(engine)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on the database pool and await its result."""
+        loop = asyncio.get_running_loop()
+        # Copy the caller's context so context variables (e.g. the command being
+        # invoked) are visible to the code running in the worker thread.
+        ctx = contextvars.copy_context()
+        with timed("db"):
+            return await loop.run_in_executor(
+                self.executor, functools.partial(ctx.run, fn, *args, **kwargs)
+            )
+
+    async def write(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on the writer and await its committed result."""
+        with timed("db"):
+            return await asyncio.wrap_future(self.writer.submit(fn, *args, **kwargs))
+
+    def close(self) -> None:
+        self.writer.close()
+        self.executor.shutdown(wait=True)
+        self.read_engine.dispose()
+        self.engine.dispose()
+        if self.store is not None:
+            self.store.close()
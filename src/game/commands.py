@@ -1,18 +1,24 @@
+import asyncio
+import dataclasses
+import functools
 import logging
-from unittest import case
-import Levenshtein
 import discord
 
 from . import gamelogic
-from . import factions
+from . import factions as fs
 from . import strategy_cards
 from . import board
+from .. import cache
+from .. import logs
+from .. import matching
+from .. import migrations
+from ..database import Database
+from ..startup import Startup
+from .executor import GameExecutor
 from ..typing import *
 
 from discord.ext import commands
-from typing import Optional
-from discord.ext import commands
-from sqlalchemy import Engine
+from typing import Iterable, List, Optional
 
 class Game(commands.Cog):
     """Cog containing game related commands."""
@@ -20,13 +26,41 @@ class Game(commands.Cog):
     def __init__(
         self,
         bot: commands.Bot,
-        engine: Engine,
+        database: Database,
+        games: GameExecutor,
+        response_cache: cache.ResponseCache,
+        startup: Startup,
     ) -> None:
         """Initialize the Commands cog with factions."""
-        self.factions = factions.read_factions()
-        self.strategy_cards = strategy_cards.read_strategy_cards()
-        self.logic = gamelogic.GameLogic(bot, engine)
-        self.planets = board.read_planets()
+        self.bot = bot
+        self.database = database
+        # Commands that change a game run one at a time per game.
+        self.games = games
+        self.cache = response_cache
+        self.logic = gamelogic.GameLogic(bot, database.engine, database.read_engine)
+        # Games not loaded by then are loaded by the first command on them.
+        startup.add(
+            "active games",
+            lambda: database.write(self.logic.load_active_games),
+            after=(migrations.JOB,),
+        )
+
+    # Static game data is read on first use rather than at startup.
+    @functools.cached_property
+    def factions(self) -> fs.Factions:
+        return fs.read_factions()
+
+    @functools.cached_property
+    def faction_matcher(self) -> matching.Matcher[fs.Faction]:
+        return matching.Matcher(self.factions.factions, key=lambda f: f.name)
+
+    @functools.cached_property
+    def strategy_cards(self) -> List[strategy_cards.StrategyCard]:
+        return strategy_cards.read_strategy_cards()
+
+    @functools.cached_property
+    def planets(self) -> List[board.Planet]:
+        return board.read_planets()
 
 
     async def __send_embed_or_pretty_err(self, ctx: commands.Context, result: Result[discord.Embed]) -> None:
@@ -45,17 +79,28 @@ class Game(commands.Cog):
     async def on_ready(self) -> None:
         logging.info("Game cog loaded")
 
+    async def cog_before_invoke(self, ctx: commands.Context) -> None:
+        # Tag log records from this command with the game.
+        logs.game_id.set(self.__game_id(ctx))
+
     def __game_id(self, ctx: commands.Context):
         # Let's use the channel ID for the game ID.
         return ctx.channel.id
 
+    @staticmethod
+    async def __lines(lines: Iterable[str]) -> str:
+        # Static data has no database work to await, but is cached the same way.
+        return "\n".join(lines)
+
     @commands.command(name="strategy-cards")
     async def strat_cards(
         self, ctx: commands.Context) -> None:
         """Returns the list of strategy cards in the game."""
 
         await ctx.send(
-            f"{'\n'.join([str(sc) for sc in self.strategy_cards])}"
+            await self.cache.get(
+                ("strategy-cards",), lambda: self.__lines(str(sc) for sc in self.strategy_cards)
+            )
         )
 
     @commands.command(name="planets")
@@ -64,7 +109,10 @@ class Game(commands.Cog):
         """Returns the list of planets in the game."""
 
         await ctx.send(
-            f"{'\n'.join([f"{planet.source}: {str(planet)}" for planet in self.planets])}"
+            await self.cache.get(
+                ("planets",),
+                lambda: self.__lines(f"{planet.source}: {planet}" for planet in self.planets),
+            )
         )
     @commands.command(name="factions")
     async def random_factions(
@@ -90,9 +138,10 @@ class Game(commands.Cog):
     @commands.command()
     async def faction(self, ctx: commands.Context, faction: str) -> None:
         """Returns info about the given faction."""
-        best = max(
-            self.factions.factions, key=lambda c: Levenshtein.ratio(faction, c.name)
-        )
+        best = self.faction_matcher.match(faction)
+        if not best:
+            await ctx.send(f"Can't find a faction matching {faction}.")
+            return
         await ctx.send(str(best))
 
     def __string_from_string_result(self, s: Result[str]) -> str:
@@ -108,28 +157,38 @@ class Game(commands.Cog):
     ) -> None:
         """Finish the game. Usage !finish {list_of_points} where the order is the turn order of the players."""
         is_admin = ctx.author.guild_permissions.administrator
-        await self.__send_embed_or_pretty_err(ctx, self.logic.finish(is_admin, self.__game_id(ctx), points))
+        async with self.games.serialized(self.__game_id(ctx)):
+            await self.__send_embed_or_pretty_err(
+                ctx, await self.database.write(self.logic.finish, is_admin, self.__game_id(ctx), points)
+            )
 
     @commands.command()
     async def ban(
         self, ctx: commands.Context, *, faction: Optional[str] = None
     ) -> None:
         """Ban a faction."""
-        await ctx.send(
-            await self.logic.ban(ctx.author.id, self.__game_id(ctx), faction)
-        )
+        async with self.games.serialized(self.__game_id(ctx)):
+            await ctx.send(
+                await self.database.write(self.logic.ban, ctx.author.id, self.__game_id(ctx), faction)
+            )
 
     @commands.command()
     async def draft(
         self, ctx: commands.Context, *, faction: Optional[str] = None
     ) -> None:
         """Draft your faction."""
-        await self.__send_embed_or_pretty_err(ctx, await self.logic.draft(ctx.author.id, self.__game_id(ctx), faction))
+        async with self.games.serialized(self.__game_id(ctx)):
+            await self.__send_embed_or_pretty_err(
+                ctx, await self.database.write(self.logic.draft, ctx.author.id, self.__game_id(ctx), faction)
+            )
 
     @commands.command()
     async def start(self, ctx: commands.Context) -> None:
         """Start the lobby."""
-        await self.__send_embed_or_pretty_err(ctx, self.logic.start(self.factions, self.__game_id(ctx)))
+        async with self.games.serialized(self.__game_id(ctx)):
+            await self.__send_embed_or_pretty_err(
+                ctx, await self.database.write(self.logic.start, self.factions, self.__game_id(ctx))
+            )
 
     @commands.command()
     async def cancel(self, ctx: commands.Context) -> None:
@@ -141,31 +200,56 @@ class Game(commands.Cog):
             case _:
                 return
 
-        match self.logic.cancel(self.__game_id(ctx)):
-            case Ok(s):
-                match ctx.channel:
-                    case discord.TextChannel():
-                        await ctx.channel.delete()
-            case Err(s):
-                await ctx.send(s)
+        async with self.games.serialized(self.__game_id(ctx)):
+            match await self.database.write(self.logic.cancel, self.__game_id(ctx)):
+                case Ok(s):
+                    match ctx.channel:
+                        case discord.TextChannel():
+                            await ctx.channel.delete()
+                case Err(s):
+                    await ctx.send(s)
 
     @commands.command()
     async def info(self, ctx: commands.Context, *, game_name: Optional[str]) -> None:
         """Fetch game info"""
         if not game_name:
             game_id = self.__game_id(ctx)
-            await self.__send_embed_or_pretty_err(ctx, self.logic.game(game_id))
+            await self.__send_embed_or_pretty_err(ctx, await self.database.run(self.logic.game, game_id))
             return
-        await self.__send_embed_or_pretty_err(ctx, self.logic.game_from_name(game_name))
+        await self.__send_embed_or_pretty_err(
+            ctx, await self.database.run(self.logic.game_from_name, game_name)
+        )
         
         
 
     @commands.command()
-    async def games(self, ctx: commands.Context) -> None:
-        """Fetches latest games."""
-        match self.logic.games():
-            case Ok(paginated):
-                await paginated.view_menu(ctx).start()
+    async def games(self, ctx: commands.Context, *, filters: Optional[str] = "") -> None:
+        """Browse finished games, newest first. Filter with player:, faction:, after:, before: and players:, e.g. !games player:Alice after:2025-01-01"""
+        res = gamelogic.GameFilter.parse(filters or "")
+        if isinstance(res, Err):
+            await ctx.send(res.msg)
+            return
+        parsed = res.value
+        if parsed.faction is not None:
+            best = self.faction_matcher.match(parsed.faction)
+            if not best:
+                await ctx.send(f"Can't find a faction matching {parsed.faction}.")
+                return
+            parsed = dataclasses.replace(parsed, faction=best.name)
+
+        # Only the first page is cached, the others are fetched as they are shown.
+        result = await self.cache.get(
+            ("games", parsed),
+            lambda: self.database.run(self.logic.games, parsed),
+            tags=(cache.FINISH,),
+            store=lambda r: isinstance(r, Ok),
+        )
+        match result:
+            case Ok(page):
+                history = gamelogic.GameHistory(
+                    page, lambda cursor: self.database.run(self.logic.games, parsed, cursor)
+                )
+                await history.view_menu(ctx).start()
             case Err(s):
                 await ctx.send(s)
 
@@ -190,50 +274,85 @@ class Game(commands.Cog):
             return
 
         channel = await ctx.guild.create_text_channel(name)
-        match await self.logic.lobby(channel, channel.id, ctx.author.id, ctx.author.name, name):
-            case Ok(s):
-                await channel.send(embed=s)
-                await ctx.send(f"Created {channel.mention} for TI4 Lobby")
-            case Err(s):
-                await ctx.send(s)
+        # Hold the new game until its polls exist, so !polls or !start can't run half way.
+        async with self.games.serialized(channel.id):
+            match await self.database.write(self.logic.lobby, channel.id, ctx.author.id, ctx.author.name, name):
+                case Ok(s):
+                    await channel.send(embed=s)
+                    await ctx.send(f"Created {channel.mention} for TI4 Lobby")
+                case Err(s):
+                    await ctx.send(s)
+                    return
+
+            try:
+                thread = await channel.create_thread(name="Configuration", type=discord.ChannelType.public_thread)
+                messages = [await thread.send(poll=poll) for poll in self.logic.settings_polls()]
+                await self.database.write(
+                    self.logic.add_settings_polls, channel.id, thread.id, [message.id for message in messages]
+                )
+            except Exception:
+                logging.exception("Error creating configuration polls")
 
     @commands.command()
     async def lobbies(self, ctx: commands.Context) -> None:
         """Show all open lobbies."""
-        await ctx.send(self.__string_from_string_result(self.logic.lobbies()))
+        await ctx.send(self.__string_from_string_result(await self.database.run(self.logic.lobbies)))
 
     @commands.command()
     async def leave(self, ctx: commands.Context) -> None:
         """Leave a lobby."""
         id = ctx.author.id
-        await ctx.send(
-            self.__string_from_string_result(self.logic.leave(self.__game_id(ctx), id))
-        )
+        async with self.games.serialized(self.__game_id(ctx)):
+            await ctx.send(
+                self.__string_from_string_result(
+                    await self.database.write(self.logic.leave, self.__game_id(ctx), id)
+                )
+            )
 
     @commands.command()
     async def join(self, ctx: commands.Context) -> None:
         """Join a lobby."""
         id = ctx.author.id
         name = ctx.author.name
-        await ctx.send(
-            self.__string_from_string_result(
-                self.logic.join(self.__game_id(ctx), id, name)
+        async with self.games.serialized(self.__game_id(ctx)):
+            await ctx.send(
+                self.__string_from_string_result(
+                    await self.database.write(self.logic.join, self.__game_id(ctx), id, name)
+                )
             )
-        )
 
     @commands.command()
     async def polls(self, ctx: commands.Context) -> None:
         """Apply the results of the polls to the game."""
         await ctx.send("Reading polls...")
-        await ctx.send(
-            self.__string_from_string_result(
-                await self.logic.apply_poll_results(self.__game_id(ctx))
-            )
-        )
+        async with self.games.serialized(self.__game_id(ctx)):
+            await ctx.send(self.__string_from_string_result(await self.__apply_poll_results(self.__game_id(ctx))))
+
+    async def __apply_poll_results(self, game_id: int) -> Result[str]:
+        match await self.database.run(self.logic.settings_poll_messages, game_id):
+            case Ok((thread_id, message_ids)):
+                pass
+            case Err(s):
+                return Err(s)
+
+        thread = self.bot.get_channel(thread_id)
+        if not isinstance(thread, discord.Thread):
+            return Err("Polls can not be found")
+        try:
+            msgs = await asyncio.gather(*[thread.fetch_message(message_id) for message_id in message_ids])
+        except Exception:
+            logging.exception("Error fetching polls data")
+            return Err("An error occurred while fetching the game data.")
+
+        polls = [msg.poll for msg in msgs if msg.poll]
+        return await self.database.write(self.logic.apply_poll_results, game_id, polls)
 
     @commands.command()
     async def config(
         self, ctx: commands.Context, property: Optional[str], value: Optional[str]
     ) -> None:
         """Configure a lobby."""
-        await self.__send_embed_or_pretty_err(ctx, self.logic.config(self.__game_id(ctx), property, value))
+        async with self.games.serialized(self.__game_id(ctx)):
+            await self.__send_embed_or_pretty_err(
+                ctx, await self.database.write(self.logic.config, self.__game_id(ctx), property, value)
+            )
@@ -1,14 +1,43 @@
-from sqlalchemy import select
-from sqlalchemy.orm import Session, with_parent
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session, joinedload, selectinload, with_parent
 
 from .model import Game, GamePlayer
 
-from typing import Sequence
+from typing import List, Optional, Sequence
+
+
+# Loading profiles: the part of a game's object graph each view walks, loaded
+# up front in a fixed number of queries instead of lazily per player.
+
+# Lobbies and who is in them.
+LOBBY_VIEW = (selectinload(Game.game_players).joinedload(GamePlayer.player),)
+# Starting, banning and drafting, which also read the settings.
+DRAFT_VIEW = (
+    joinedload(Game.game_settings),
+    selectinload(Game.game_players).joinedload(GamePlayer.player),
+)
+# A game with its players and results, and the settings it was played with.
+# The results live on the players, so this is the same graph as drafting.
+RESULTS_VIEW = DRAFT_VIEW
 
 
 class GameController:
 
+    def game(self, session: Session, game_id: int, profile: Sequence = ()) -> Game|None:
+        """The game with the part of its graph in profile loaded."""
+        return session.get(Game, game_id, options=profile)
+
+    @staticmethod
+    def _loaded_players(game: Game) -> Optional[List[GamePlayer]]:
+        """The players of game if a loading profile already loaded them."""
+        if "game_players" in inspect(game).unloaded:
+            return None
+        return game.game_players
+
     def player_from_game(self, session: Session, game:Game, player_id: int) -> GamePlayer|None:
+        players = self._loaded_players(game)
+        if players is not None:
+            return next((p for p in players if p.player_id == player_id), None)
         return session.scalar(
             select(GamePlayer)
             .where(
@@ -20,6 +49,9 @@ class GameController:
     def players_ordered_by_turn(
         self, session: Session, game: Game
     ) -> Sequence[GamePlayer]:
+        players = self._loaded_players(game)
+        if players is not None:
+            return sorted(players, key=lambda p: p.turn_order or 0)
         return session.scalars(
             select(GamePlayer)
             .where(with_parent(game, Game.game_players))
@@ -28,13 +60,17 @@ class GameController:
 
 
     def current_drafter(self, session: Session, game: Game) -> GamePlayer:
-        current_drafter = session.scalar(
-            select(GamePlayer)
-            .where(
-                with_parent(game, Game.game_players),
-                GamePlayer.turn_order == game.turn,
+        players = self._loaded_players(game)
+        if players is not None:
+            current_drafter = next((p for p in players if p.turn_order == game.turn), None)
+        else:
+            current_drafter = session.scalar(
+                select(GamePlayer)
+                .where(
+                    with_parent(game, Game.game_players),
+                    GamePlayer.turn_order == game.turn,
+                )
             )
-        )
         if current_drafter is None:
             raise LookupError("Current drafter not found for this game!")
         return current_drafter
@@ -42,6 +78,9 @@ class GameController:
     def players_ordered_by_points(
         self, session: Session, game: Game
     ) -> Sequence[GamePlayer]:
+        players = self._loaded_players(game)
+        if players is not None:
+            return sorted(players, key=lambda p: p.points or 0, reverse=True)
         return session.scalars(
             select(GamePlayer)
             .where(with_parent(game, Game.game_players))
@@ -50,12 +89,31 @@ class GameController:
 
     # Assumes only one winner
     def winner(self, session: Session, game: Game) -> GamePlayer:
-        winner = session.scalar(
-            select(GamePlayer)
-            .where(with_parent(game, Game.game_players))
-            .order_by(GamePlayer.points.desc())
-        )
-       
+        if game.winner_player_id is not None:
+            winner = session.get(GamePlayer, (game.game_id, game.winner_player_id))
+        else:
+            # Not finished, the leader so far.
+            winner = session.scalar(
+                select(GamePlayer)
+                .where(with_parent(game, Game.game_players))
+                .order_by(GamePlayer.points.desc())
+            )
+
         if winner is None:
             raise LookupError("Winner not found for this game!")
-        return winner
\ No newline at end of file
+        return winner
+
+    def record_result(self, session: Session, game: Game) -> None:
+        """Store the result of a finished game on it and its players."""
+        # Most points first, ties in turn order.
+        players = sorted(
+            self.players_ordered_by_turn(session, game),
+            key=lambda p: (-(p.points or 0), p.turn_order or 0, p.player_id),
+        )
+        game.player_count = len(players)
+        game.winner_player_id = players[0].player_id if players else None
+        for player in players:
+            points = player.points or 0
+            player.finish_rank = 1 + sum((p.points or 0) > points for p in players)
+            player.is_winner = player.finish_rank == 1
+            player.is_last = not any((p.points or 0) < points for p in players)
@@ -6,9 +6,9 @@ import random
 import discord
 
 from . import model, controller
-from . import gamelogic
 from . import factions as fs
 from . import strategy_cards
+from .. import matching
 from ..typing import *
 
 from itertools import batched
@@ -91,7 +91,7 @@ class ExclusivePool(GameMode):
             return Err(f"It is not your turn to draft! It is {current_drafter.player.name}'s turn")
 
         # Extract this out to shared utils.
-        best = gamelogic.GameLogic._closest_match(faction, player.factions)
+        best = matching.closest(faction, player.factions)
         if not best:
             return Err(f"You can't draft faction {faction}. Check your spelling or available factions.")
 
@@ -143,7 +143,6 @@ class ExclusivePool(GameMode):
             factions_lines.extend(
                 list(map(lambda x: f"{x} ({player.player.name})", player_factions))
             )
-            session.merge(player)
 
         players_info_lines = []
         for i in range(number_of_players):
@@ -170,46 +169,50 @@ class ExclusivePool(GameMode):
 class PicksOnly(GameMode):
     def draft(
         self, session: Session, player: model.GamePlayer, faction: Optional[str]
-    ) -> Optional[str]:
-
+    ) -> Result[discord.Embed|GameStarted]:
         if player.faction:
-            return f"You have drafted {player.faction}"
+            return Ok(discord.Embed(
+                title="Faction Drafted",
+                description=f"You have drafted {player.faction}",
+                color=discord.Color.green()
+            ))
 
         if not faction:
-            return f"Your available factions are:\n{"\n".join(player.factions)}"
+            return Ok(discord.Embed(
+                title="Available Factions",
+                description=f"Your available factions are:\n{"\n".join(player.factions)}",
+                color=discord.Color.blue()
+            ))
 
         current_drafter = self.controller.current_drafter(session, self.game)
 
         if self.game.turn != player.turn_order:
-            return f"It is not your turn to draft! It is {current_drafter.player.name}'s turn"
+            return Err(f"It is not your turn to draft! It is {current_drafter.player.name}'s turn")
 
-        best = gamelogic.GameLogic._closest_match(faction, player.factions)
+        best = matching.closest(faction, player.factions)
         if not best:
-            return f"You can't draft faction {faction}. Check your spelling or available factions."
+            return Err(f"You can't draft faction {faction}. Check your spelling or available factions.")
 
         player.faction = best
         self.game.turn += 1
 
-        other_players = [
-            other
-            for other in self.game.game_players
-            if other.player_id != player.player_id
-        ]
-        for other_player in other_players:
-            other_player.factions.remove(player.faction)
-            session.merge(other_player)
+        for other_player in self.game.game_players:
+            if other_player.player_id != player.player_id and best in other_player.factions:
+                other_player.factions.remove(best)
+                attributes.flag_modified(other_player, "factions")
 
         session.merge(self.game)
         session.merge(player)
-        lines = [f"{player.player.name} has selected {player.faction}."]
         if self.game.turn == len(self.game.game_players):
-            return None
+            return Ok(GameStarted())
         session.commit()
 
         current_drafter = self.controller.current_drafter(session, self.game)
-
-        lines.append(f"Next drafter is <@{current_drafter.player_id}>. Use !draft.")
-        return "\n".join(lines)
+        return Ok(discord.Embed(
+            title="Next Drafter",
+            description=f"{player.player.name} has selected {player.faction}.\nNext drafter is <@{current_drafter.player_id}>. Use !draft.",
+            color=discord.Color.blue()
+        ))
 
     def start(self, session: Session, factions: fs.Factions) -> Result[discord.Embed]:
         players = self.game.game_players
@@ -224,7 +227,7 @@ class PicksOnly(GameMode):
         for i, player in enumerate(players):
             player.turn_order = turn_order[i]
             player_from_turn[player.turn_order] = player.player.name
-            player.factions = fs
+            player.factions = list(fs)
 
         players_info_lines = []
         for i in range(number_of_players):
@@ -252,22 +255,26 @@ class PicksOnly(GameMode):
 
 class PicksAndBans(GameMode):
     def draft(
-        self,
-        session: Session,
-        player: model.GamePlayer,
-        faction: Optional[str],
-    ) -> Optional[str]:
-
+        self, session: Session, player: model.GamePlayer, faction: Optional[str]
+    ) -> Result[discord.Embed|GameStarted]:
         if player.faction:
-            return f"You have drafted {player.faction}"
+            return Ok(discord.Embed(
+                title="Faction Drafted",
+                description=f"You have drafted {player.faction}",
+                color=discord.Color.green()
+            ))
 
         if not faction:
-            return f"Your available factions are:\n{"\n".join(player.factions)}"
+            return Ok(discord.Embed(
+                title="Available Factions",
+                description=f"Your available factions are:\n{"\n".join(player.factions)}",
+                color=discord.Color.blue()
+            ))
 
         current_drafter = self.controller.current_drafter(session, self.game)
 
         if self.game.turn != player.turn_order:
-            return f"It is not your turn to draft! It is {current_drafter.player.name}'s turn"
+            return Err(f"It is not your turn to draft! It is {current_drafter.player.name}'s turn")
 
         all_bans = []
         for game_player in self.game.game_players:
@@ -277,39 +284,34 @@ class PicksAndBans(GameMode):
         all_factions_available = player.factions.copy()
         all_factions_available.extend(all_bans)
 
-        best = gamelogic.GameLogic._closest_match(faction, all_factions_available)
+        best = matching.closest(faction, all_factions_available)
         if not best:
-            return f"You can't draft faction {faction}. Check your spelling or available factions."
+            return Err(f"You can't draft faction {faction}. Check your spelling or available factions.")
 
         # Check if this faction is already banned by anyone
-
         if best in all_bans:
-            return f"Faction {best} has already been banned."
+            return Err(f"Faction {best} has already been banned.")
 
         player.faction = best
         self.game.turn += 1
 
-        other_players = [
-            other for other in self.game.game_players if other.player_id != player.player_id
-        ]
-        for other_player in other_players:
-            # Somehow the typing doesn't work without the if-statement
-            # Look into it later.
-            if player.faction:
-                other_player.factions.remove(player.faction)
-                session.merge(other_player)
+        for other_player in self.game.game_players:
+            if other_player.player_id != player.player_id and best in other_player.factions:
+                other_player.factions.remove(best)
+                attributes.flag_modified(other_player, "factions")
 
         session.merge(self.game)
         session.merge(player)
-        lines = [f"{player.player.name} has selected {player.faction}."]
         if self.game.turn == len(self.game.game_players):
-            return None
+            return Ok(GameStarted())
         session.commit()
 
         current_drafter = self.controller.current_drafter(session, self.game)
-
-        lines.append(f"Next drafter is <@{current_drafter.player_id}>. Use !draft.")
-        return "\n".join(lines)
+        return Ok(discord.Embed(
+            title="Next Drafter",
+            description=f"{player.player.name} has selected {player.faction}.\nNext drafter is <@{current_drafter.player_id}>. Use !draft.",
+            color=discord.Color.blue()
+        ))
 
     def start(self, session: Session, factions: fs.Factions) -> Result[discord.Embed]:
         players = self.game.game_players
@@ -324,7 +326,7 @@ class PicksAndBans(GameMode):
         for i, player in enumerate(players):
             player.turn_order = turn_order[i]
             player_from_turn[player.turn_order] = player.player.name
-            player.factions = fs
+            player.factions = list(fs)
 
         players_info_lines = []
         for i in range(number_of_players):
@@ -373,7 +375,7 @@ class PicksAndBans(GameMode):
             return f"It is not your turn to ban! It is {current_drafter.player.name}'s turn"
 
         # Process the ban
-        best = gamelogic.GameLogic._closest_match(faction, player.factions)
+        best = matching.closest(faction, player.factions)
         if not best:
             return f"You can't ban faction {faction}. Check your spelling or available factions."
 
@@ -509,7 +511,7 @@ class HomeBrewDraft(GameMode):
             possible_matches : Dict[str, Union[str, strategy_cards.StrategyCard]] = {x.lower(): x for x in available_factions}
             possible_matches.update({sc.name.lower(): sc for sc in strategy_cards_map.values()})
             
-            best = gamelogic.GameLogic._closest_match(draft_choice.lower(), possible_matches.keys())
+            best = matching.closest(draft_choice.lower(), possible_matches.keys())
             if not best:
                 return Err(f"Not possible to match {draft_choice} to anything. Check your spelling or available picks")
             if best in strategy_cards_map.keys():
@@ -535,7 +537,7 @@ class HomeBrewDraft(GameMode):
                 for other_player in other_players:
                     if player.faction:
                         other_player.factions.remove(player.faction)
-                        session.merge(other_player)
+                        attributes.flag_modified(other_player, "factions")
             else:
                 return Err("You've already drafted faction.")
 
@@ -599,7 +601,6 @@ class HomeBrewDraft(GameMode):
             factions_lines.extend(
                 list(map(lambda x: f"{x} ({player.player.name})", player_factions))
             )
-            session.merge(player)
 
         players_info_lines = []
         for i in range(number_of_players):
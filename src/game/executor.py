@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple
+
+from ..perf.metrics import Histogram
+
+
+class GameQueue:
+    """Queue statistics of one game."""
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.depth = 0  # Commands running or waiting.
+        self.max_depth = 0
+        self.count = 0
+        self.wait = Histogram(size=256)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "count": self.count,
+            **{f"wait_{k}": v for k, v in self.wait.summary().items()},
+        }
+
+
+class GameExecutor:
+    """Runs mutating commands one at a time per game and different games in parallel.
+
+    Each game (keyed on its channel id) has its own lock, held for the whole
+    command: the reads, the writes and the Discord calls in between. Two
+    players typing !draft at once are handled in order and each sees the
+    other's result.
+    """
+
+    def __init__(self, max_games: int = 256) -> None:
+        self.max_games = max_games
+        self.games: "OrderedDict[int, GameQueue]" = OrderedDict()
+
+    def __queue(self, game_id: int) -> GameQueue:
+        queue = self.games.get(game_id)
+        if queue is None:
+            queue = self.games[game_id] = GameQueue()
+            self.__evict(keep=game_id)
+        self.games.move_to_end(game_id)
+        return queue
+
+    def __evict(self, keep: int) -> None:
+        # Forget the least recently used idle games, never the one being queued.
+        # When every other game is busy there can be more than max_games.
+        for game_id in list(self.games):
+            if len(self.games) <= self.max_games:
+                break
+            if game_id != keep and self.games[game_id].depth == 0:
+                del self.games[game_id]
+
+    @asynccontextmanager
+    async def serialized(self, game_id: int) -> AsyncIterator[None]:
+        queue = self.__queue(game_id)
+        queue.depth += 1
+        queue.max_depth = max(queue.max_depth, queue.depth)
+        started = time.perf_counter()
+        try:
+            async with queue.lock:
+                queue.wait.add(time.perf_counter() - started)
+                queue.count += 1
+                yield
+        finally:
+            queue.depth -= 1
+
+    def busiest(self, n: int = 10) -> List[Tuple[int, Dict[str, float]]]:
+        """The n games with the longest p95 wait."""
+        summaries = [(game_id, queue.summary()) for game_id, queue in self.games.items()]
+        summaries.sort(key=lambda s: s[1]["wait_p95"], reverse=True)
+        return summaries[:n]
@@ -1,8 +1,7 @@
-import Levenshtein
 import logging
-import asyncio
 import random
 import re
+import dataclasses
 import discord
 import enum
 
@@ -11,62 +10,197 @@ from . import strategy_cards
 from . import model
 from . import draftingmodes
 from . import controller
+from . import registry
+from .. import database
+from .. import matching
 
 from ..typing import *
 
-from reactionmenu import ViewMenu, ViewButton
 from discord.ext import commands
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from sqlalchemy import inspect, Enum, Boolean, String, Integer, select
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, Enum, Boolean, String, Integer, exists, select, tuple_, type_coerce
+from sqlalchemy.orm import Session, aliased
 from string import Template
-from typing import Optional, Dict, Any, Iterable, Sequence, List, List
-from itertools import batched
+from typing import Optional, Dict, Any, Awaitable, Callable, Sequence, List, Tuple
 
 from blinker import signal
 
 
-class PaginatedEmbed:
-    def __init__(self, embeds: List[discord.Embed]):
-        self.controller = controller
-        self.embeds = embeds
+# Where a page of the game history starts: the finish time and id of the
+# last game on the page before, since games are listed newest first. The
+# finish time is compared as stored, finish times written by SQLite and by
+# SQLAlchemy have a different format.
+Cursor = Tuple[str, int]
+
+
+@dataclass
+class GameSummary:
+    """One finished game in the !games listing."""
+
+    game_id: int
+    name: str
+    players: int
+    winner: Optional[str]
+    faction: Optional[str]
+    # Where the page after this game starts.
+    cursor: Optional[Cursor] = dataclasses.field(default=None, compare=False, repr=False)
+
+    def field(self) -> Tuple[str, str]:
+        """Name and value of the game's embed field."""
+        winner = f"{self.winner} ({self.faction})" if self.winner else "Unknown"
+        return f"{self.name} (players {self.players})", f"Winner: {winner}"
+
+
+@dataclass(frozen=True)
+class GameFilter:
+    """Which finished games !games lists. Unset fields match every game.
+
+    With both a player and a faction, the player must have played the faction.
+    `after` is inclusive and `before` exclusive.
+    """
+
+    player: Optional[str] = None
+    faction: Optional[str] = None
+    after: Optional[datetime] = None
+    before: Optional[datetime] = None
+    players: Optional[int] = None
+
+    KEYS = ("player", "faction", "after", "before", "players")
+
+    @classmethod
+    def parse(cls, text: str) -> Result["GameFilter"]:
+        """Filters written as `key:value`, e.g. `player:Alice after:2025-01-01 players:6`."""
+        text = text.strip()
+        if not text:
+            return Ok(cls())
+        usage = f"Filter games with {', '.join(f'{k}:' for k in cls.KEYS)} e.g. player:Alice after:2025-01-01 players:6"
+        # Values run until the next key, so player names may have spaces.
+        parts = re.split(r"(?:^|\s+)(\w+):", text)
+        if parts[0]:
+            return Err(usage)
+        values: Dict[str, str] = {}
+        for key, value in zip(parts[1::2], parts[2::2]):
+            key, value = key.lower(), value.strip()
+            if key not in cls.KEYS or not value:
+                return Err(usage)
+            values[key] = value
+        try:
+            return Ok(cls(
+                player=values.get("player"),
+                faction=values.get("faction"),
+                after=datetime.fromisoformat(values["after"]) if "after" in values else None,
+                before=datetime.fromisoformat(values["before"]) if "before" in values else None,
+                players=int(values["players"]) if "players" in values else None,
+            ))
+        except ValueError:
+            return Err(usage)
+
+    def describe(self) -> str:
+        return ", ".join(
+            f"{key}: {value.date() if isinstance(value, datetime) else value}"
+            for key in self.KEYS
+            if (value := getattr(self, key)) is not None
+        )
+
+
+@dataclass
+class GamePage:
+    """One page of !games, and where the next one starts."""
+
+    games: List[GameSummary]
+    next: Optional[Cursor]
+    filters: GameFilter = GameFilter()
+
+    def embed(self, number: int) -> discord.Embed:
+        embed = discord.Embed(title="🎮 Games", color=discord.Color.blue())
+        for game in self.games:
+            name, value = game.field()
+            embed.add_field(name=name, value=value, inline=False)
+        footer = f"Page {number}"
+        if self.filters != GameFilter():
+            footer += f" · {self.filters.describe()}"
+        embed.set_footer(text=footer)
+        return embed
+
+
+class GameHistory:
+    """The !games menu, one page at a time.
+
+    Only the first page is fetched up front. Older fetches the page after the
+    current one with its cursor, and newer refetches the one before from the
+    cursors of the pages seen so far.
+    """
+
+    def __init__(
+        self,
+        first: GamePage,
+        fetch: Callable[[Optional[Cursor]], Awaitable[Result[GamePage]]],
+    ) -> None:
+        self.page = first
+        self.fetch = fetch
+        # Cursor each page up to the current one starts from.
+        self.starts: List[Optional[Cursor]] = [None]
 
     @property
-    def description(self) -> str:
-        # Provide a combined description from all embeds so tests can assert on it.
-        parts: List[str] = []
-        for e in self.embeds:
-            if e.description:
-                parts.append(e.description)
-                continue
-            # Fall back to including title and fields for embeds without description
-            if e.title:
-                parts.append(e.title)
-            for f in getattr(e, 'fields', []):
-                parts.append(f"{f.name}: {f.value}")
-        return "\n\n".join(parts)
-
-    def __getattr__(self, item):
-        # Forward attribute access to the first embed for convenience (e.g., title, color)
-        if self.embeds:
-            return getattr(self.embeds[0], item)
-        raise AttributeError(item)
+    def number(self) -> int:
+        return len(self.starts)
+
+    def embed(self) -> discord.Embed:
+        return self.page.embed(self.number)
+
+    async def older(self) -> bool:
+        """Move to the next page. False if this is the last one or it can't be fetched."""
+        if self.page.next is None:
+            return False
+        return await self.__show(self.starts + [self.page.next])
+
+    async def newer(self) -> bool:
+        """Move to the previous page. False on the first page or if it can't be fetched."""
+        if len(self.starts) == 1:
+            return False
+        return await self.__show(self.starts[:-1])
+
+    async def __show(self, starts: List[Optional[Cursor]]) -> bool:
+        match await self.fetch(starts[-1]):
+            case Ok(page) if page.games:
+                self.page, self.starts = page, starts
+                return True
+            case _:
+                return False
 
     def view_menu(self, ctx: commands.Context):
+        # reactionmenu is only needed once someone pages through a menu.
+        from reactionmenu import ViewMenu, ViewButton
+
         menu = ViewMenu(ctx, menu_type=ViewMenu.TypeEmbed)
-        for embed in self.embeds:
-            menu.add_page(embed)
-        menu.add_button(ViewButton.back())
-        menu.add_button(ViewButton.next())
+        menu.add_page(self.embed())
+
+        def button(label: str, move: Callable[[], Awaitable[bool]]) -> ViewButton:
+            async def press() -> None:
+                if await move():
+                    await menu.update(new_pages=[self.embed()], new_buttons=None)
+
+            return ViewButton(
+                label=label,
+                custom_id=ViewButton.ID_CALLER,
+                followup=ViewButton.Followup(details=ViewButton.Followup.set_caller_details(press)),
+            )
+
+        menu.add_button(button("Newer", self.newer))
+        menu.add_button(button("Older", self.older))
         return menu
 
 class GameLogic:
 
-    def __init__(self, bot: commands.Bot, engine):
+    def __init__(self, bot: commands.Bot, engine, read_engine=None):
         self.bot = bot
         self.engine = engine
+        self.read_engine = read_engine or engine
         self.signal = signal("finish")
         self.controller = controller.GameController()
+        # Commands that change a game read and change it in memory.
+        self.active = registry.ActiveGames()
 
     __game_start_quotes = [
         "> In the ashes of Mecatol Rex, the galaxy trembles. Ancient rivalries stir, alliances are whispered in shadow, and war fleets awaken from slumber. The throne is empty… but not for long.\n> -$player",
@@ -113,16 +247,6 @@ Living rules reference (Prophecy of Kings)
     def _parse_ints(s):
         return list(map(int, re.findall(r"-?\d+", s)))
 
-    # Extract this to a utility module. It's being used everywhere and is generic enough.
-    # Could even be made more generic by extracting a custom key extractor.
-    # E.g. comparing some internal field of the object.
-    @staticmethod
-    def _closest_match(s: str, ss: Iterable[str], cutoff=0.1) -> str | None:
-        best = max(ss, key=lambda c: Levenshtein.ratio(s, c))
-        if Levenshtein.ratio(s, best) <= cutoff:
-            return None
-        return best
-
     def __finish_game(self, session: Session, game: model.Game) -> None:
         game.game_state = model.GameState.FINISHED
         game.game_finish_time = datetime.now()
@@ -165,9 +289,9 @@ Living rules reference (Prophecy of Kings)
     def finish(
         self, is_admin: bool, game_id: int, all_points: Optional[str]
     ) -> Result[discord.Embed]:
-        with Session(self.engine) as session:
+        with database.session(self.engine) as session:
             try:
-                game = session.get(model.Game, game_id)
+                game = self.active.checkout(session, game_id)
                 if not game:
                     return Err("Game not found.")
                 if is_admin and game.game_state == model.GameState.FINISHED:
@@ -191,6 +315,7 @@ Living rules reference (Prophecy of Kings)
                 for player, points in zip(players, self._parse_ints(all_points)):
                     player.points = points
                 session.add_all(players)
+                self.controller.record_result(session, game)
 
                 self.__finish_game(session, game)
                 players = self.controller.players_ordered_by_points(session, game)
@@ -203,12 +328,12 @@ Living rules reference (Prophecy of Kings)
                 logging.exception("Can't finish game")
                 return Err("Can't finish game. Something went wrong.")
 
-    async def ban(
+    def ban(
         self, player_id: int, game_id: int, faction: Optional[str] = None
     ) -> Optional[str]:
         try:
-            with Session(self.engine) as session:
-                game = session.get(model.Game, game_id)
+            with database.session(self.engine) as session:
+                game = self.active.checkout(session, game_id)
                 if not game:
                     return "No game found."
 
@@ -225,12 +350,12 @@ Living rules reference (Prophecy of Kings)
             logging.exception("Error drafting")
             return "Something went wrong"
 
-    async def draft(
+    def draft(
         self, player_id: int, game_id: int, faction: Optional[str] = None
     ) -> Result[discord.Embed]:
         try:
-            with Session(self.engine) as session:
-                game = session.get(model.Game, game_id)
+            with database.session(self.engine) as session:
+                game = self.active.checkout(session, game_id)
                 if not game:
                     return Err("No game found.")
                 if game.game_state != model.GameState.DRAFT:
@@ -260,8 +385,8 @@ Living rules reference (Prophecy of Kings)
             return Err("Something went wrong")
 
     def cancel(self, game_id: int) -> Result[discord.Embed]:
-        with Session(self.engine) as session:
-            game = session.get(model.Game, game_id)
+        with database.session(self.engine) as session:
+            game = self.active.checkout(session, game_id)
             if not game:
                 return Err(f"No such game found")
 
@@ -296,8 +421,8 @@ Living rules reference (Prophecy of Kings)
 
     def start(self, factions: fs.Factions, game_id: int) -> Result[discord.Embed]:
         try:
-            with Session(self.engine) as session:
-                res = self._find_lobby(session, game_id)
+            with database.session(self.engine) as session:
+                res = self._find_lobby(self.active.checkout(session, game_id))
                 if isinstance(res, Err):
                     return res
                 game = res.value
@@ -308,7 +433,7 @@ Living rules reference (Prophecy of Kings)
             return Err("An error occurred while fetching the game data.")
 
     def game_from_name(self, game_name: str) -> Result[discord.Embed]:
-        with Session(self.engine) as session:
+        with database.session(self.read_engine) as session:
             try:
                 game = session.scalars(
                     select(model.Game).filter_by(name=game_name)
@@ -322,9 +447,9 @@ Living rules reference (Prophecy of Kings)
                 return Err("An error occurred while fetching the game data.")
 
     def game(self, game_id: int) -> Result[discord.Embed]:
-        with Session(self.engine) as session:
+        with database.session(self.read_engine) as session:
             try:
-                game = session.get(model.Game, game_id)
+                game = self.controller.game(session, game_id, controller.RESULTS_VIEW)
                 if not game:
                     return Err(f"No game found.")
 
@@ -350,10 +475,8 @@ Living rules reference (Prophecy of Kings)
                         lines.append(s)
                 lines.append("")
 
-                match self.config(game.game_id, "get", None):
-                    case Ok(s):
-                        if s.description:
-                            lines.append(s.description)
+                if game.game_settings:
+                    lines.append(self.__configuration(game.game_settings))
                 return Ok(discord.Embed(
                     title="📜 Game Information",
                     description="\n".join(lines),
@@ -364,10 +487,11 @@ Living rules reference (Prophecy of Kings)
                 return Err("An error occurred while fetching the game data.")
 
     def lobbies(self) -> Result[str]:
-        with Session(self.engine) as session:
+        with database.session(self.read_engine) as session:
             try:
                 games = session.scalars(
                     select(model.Game)
+                    .options(*controller.LOBBY_VIEW)
                     .order_by(model.Game.lobby_create_time.desc())
                     .filter_by(game_state=model.GameState.LOBBY)
                 ).all()
@@ -383,6 +507,11 @@ Living rules reference (Prophecy of Kings)
                 logging.exception("Error fetching game data")
                 return Err("An error occurred while fetching the game data.")
 
+    def load_active_games(self) -> int:
+        """Load the games in a lobby or being played into memory. Returns how many there are."""
+        with database.session(self.engine) as session:
+            return self.active.rebuild(session)
+
     def _get_valid_values(self, dtype):
         if isinstance(dtype, Enum):
             return dtype.enums
@@ -392,11 +521,11 @@ Living rules reference (Prophecy of Kings)
             return list(range(1,6))
         return []
 
-    async def lobby(
-        self, channel: discord.TextChannel, game_id: int, player_id: int, player_name: str, name: str
+    def lobby(
+        self, game_id: int, player_id: int, player_name: str, name: str
     ) -> Result[discord.Embed]:
         try:
-            with Session(self.engine) as session:
+            with database.session(self.engine) as session:
                     game = model.Game(game_id=game_id, game_state="LOBBY", name=name)
                     session.add(game)
                     session.flush()
@@ -411,42 +540,37 @@ Living rules reference (Prophecy of Kings)
                         player_id=player_id,
                     )
                     session.add(game_player)
-
-                    settings = inspect(model.GameSettings)
-                    valid_keys: Dict[str, Any] = dict()
-                    for key, dtype in [(col.key, col.type) for col in settings.columns]:
-                        if not ("game" in key and "id" in key):
-                            valid_keys[key] = dtype
-                    thread = await channel.create_thread(name="Configuration", type=discord.ChannelType.public_thread)
                     embed = self.__start_lobby_message(player)
                     session.commit()
-
-            messages = []
-            for k,v in valid_keys.items():
-                # Unnecessary poll.
-                if "codex" in k:
-                    continue
-                poll = discord.Poll(question=k, duration=timedelta(hours=24))
-                for opt in self._get_valid_values(v):
-                    if isinstance(opt, enum.Enum):
-                        opt = opt.name
-                    poll.add_answer(text=str(opt))
-                messages.append(await thread.send(poll=poll))
-
-            with Session(self.engine) as session:
-                    for message in messages:
-                        settings_poll = model.SettingsPoll(message_id=message.id, game_id=game_id, thread_id=thread.id)
-                        session.add(settings_poll)
-                    session.commit()
                     return Ok(embed)
 
         except Exception as e:
             logging.exception("Error creating game")
             return Err("An error occurred while creating the game.")
 
-    def _find_lobby(self, session: Session, game_id: int) -> Result[model.Game]:
-        game = session.get(model.Game, game_id)
+    def settings_polls(self) -> List[discord.Poll]:
+        """Polls letting the lobby vote on each game setting."""
+        polls = []
+        for k,v in self.__settings_keys().items():
+            # Unnecessary poll.
+            if "codex" in k:
+                continue
+            poll = discord.Poll(question=k, duration=timedelta(hours=24))
+            for opt in self._get_valid_values(v):
+                if isinstance(opt, enum.Enum):
+                    opt = opt.name
+                poll.add_answer(text=str(opt))
+            polls.append(poll)
+        return polls
+
+    def add_settings_polls(self, game_id: int, thread_id: int, message_ids: List[int]) -> None:
+        with database.session(self.engine) as session:
+            for message_id in message_ids:
+                settings_poll = model.SettingsPoll(message_id=message_id, game_id=game_id, thread_id=thread_id)
+                session.add(settings_poll)
+            session.commit()
 
+    def _find_lobby(self, game: Optional[model.Game]) -> Result[model.Game]:
         if game is None:
             return Err("No lobby found.")
 
@@ -456,9 +580,9 @@ Living rules reference (Prophecy of Kings)
         return Ok(game)
 
     def leave(self, game_id: int, player_id: int) -> Result[str]:
-        with Session(self.engine) as session:
+        with database.session(self.engine) as session:
             try:
-                res = self._find_lobby(session, game_id)
+                res = self._find_lobby(self.active.checkout(session, game_id))
                 if isinstance(res, Err):
                     return res
                 game = res.value
@@ -470,6 +594,7 @@ Living rules reference (Prophecy of Kings)
 
                 name = gp.player.name
                 session.delete(gp)
+                game.game_players.remove(gp)
                 session.commit()
                 if len(game.game_players) == 0:
                     return Ok(
@@ -484,9 +609,9 @@ Living rules reference (Prophecy of Kings)
                 return Err("An error occurred while leaving the lobby.")
 
     def join(self, game_id: int, player_id: int, player_name: str) -> Result[str]:
-        with Session(self.engine) as session:
+        with database.session(self.engine) as session:
             try:
-                res = self._find_lobby(session, game_id)
+                res = self._find_lobby(self.active.checkout(session, game_id))
                 if isinstance(res, Err):
                     return res
                 game = res.value
@@ -508,7 +633,9 @@ Living rules reference (Prophecy of Kings)
                 game_player = model.GamePlayer(
                     game_id=game.game_id,
                     player_id=player_id,
+                    player=player,
                 )
+                game.game_players.append(game_player)
                 session.add(game_player)
                 session.commit()
                 return Ok(
@@ -520,82 +647,141 @@ Living rules reference (Prophecy of Kings)
                 logging.exception("Error joining lobby")
                 return Err("An error occurred while joining the lobby.")
 
-    def games(self, game_limit: int = 40) -> Result[PaginatedEmbed]:
-        def embed_from_games(games: List[model.Game]) -> discord.Embed:
-            embed = discord.Embed(title="🎮 Recent Games", color=discord.Color.blue())
-            for game in games:
-                winner = self.controller.winner(session, game)
-                embed.add_field(
-                    name=f"{game.name} (players {len(game.game_players)})",
-                    value=f"Winner: {f"{winner.player.name} ({winner.faction})" if winner else "Unknown"}",
-                    inline=False
-                )
-            return embed
+    @staticmethod
+    def _game_filters(session: Session, filters: GameFilter) -> Result[List[Any]]:
+        """Conditions on model.Game for filters, looking up the player by name."""
+        conditions: List[Any] = []
+        played = []
+        # Its own alias, the listing joins the winner's row of game_player.
+        game_player = aliased(model.GamePlayer)
+        if filters.player is not None:
+            match model.Player.find(session, filters.player):
+                case Ok(player_id):
+                    played.append(game_player.player_id == player_id)
+                case error:
+                    return error
+        if filters.faction is not None:
+            played.append(game_player.faction == filters.faction)
+        # Looked up per game through the game_player primary key.
+        if played:
+            conditions.append(exists().where(game_player.game_id == model.Game.game_id, *played))
+        if filters.players is not None:
+            conditions.append(model.Game.player_count == filters.players)
+        if filters.after is not None:
+            conditions.append(model.Game.game_finish_time >= filters.after)
+        if filters.before is not None:
+            conditions.append(model.Game.game_finish_time < filters.before)
+        return Ok(conditions)
 
-        with Session(self.engine) as session:
+    @staticmethod
+    def _game_summaries(
+        session: Session, limit: int, conditions: Sequence[Any] = (), cursor: Optional[Cursor] = None
+    ) -> List[GameSummary]:
+        """Finished games with their player count and winner, newest first, in one query.
+
+        Pages are keyset paginated: the games after `cursor` are read off
+        ix_game_state_finish_time, whose entries end with the game id, so a
+        deep page costs the same as the first one.
+        """
+        finish_time = type_coerce(model.Game.game_finish_time, String)
+        statement = (
+            select(
+                model.Game.game_id,
+                model.Game.name,
+                finish_time,
+                model.Game.player_count,
+                model.Player.name,
+                model.GamePlayer.faction,
+            )
+            .outerjoin(
+                model.GamePlayer,
+                (model.GamePlayer.game_id == model.Game.game_id)
+                & (model.GamePlayer.player_id == model.Game.winner_player_id),
+            )
+            .outerjoin(model.Player, model.Player.player_id == model.Game.winner_player_id)
+            .where(model.Game.game_state == model.GameState.FINISHED, *conditions)
+            .order_by(model.Game.game_finish_time.desc(), model.Game.game_id.desc())
+            .limit(limit)
+        )
+        if cursor is not None:
+            statement = statement.where(tuple_(finish_time, model.Game.game_id) < cursor)
+        return [
+            GameSummary(game_id, name, players or 0, winner, faction, (finish_time, game_id))
+            for game_id, name, finish_time, players, winner, faction in session.execute(statement)
+        ]
+
+    def games(
+        self, filters: GameFilter = GameFilter(), cursor: Optional[Cursor] = None, page_size: int = 5
+    ) -> Result[GamePage]:
+        """The page of finished games after cursor, or the newest ones."""
+        with database.session(self.read_engine) as session:
             try:
-                games = session.scalars(
-                    select(model.Game)
-                    .order_by(model.Game.game_finish_time.desc())
-                    .filter_by(game_state=model.GameState.FINISHED)
-                    .limit(game_limit)
-                ).all()
+                conditions = self._game_filters(session, filters)
+                if isinstance(conditions, Err):
+                    return conditions
+                # One game more than fits tells whether there is a next page.
+                games = self._game_summaries(session, page_size + 1, conditions.value, cursor)
                 if not games:
                     return Err(f"No games found.")
-                embeds = []
-                for game_batch in batched(games, 5):
-                    embed = embed_from_games(list(game_batch))
-                    embeds.append(embed)
-                return Ok(PaginatedEmbed(embeds))
+                games, more = games[:page_size], len(games) > page_size
+                return Ok(GamePage(games, games[-1].cursor if more else None, filters))
             except Exception as e:
                 logging.exception("Error fetching game data")
                 return Err("An error occurred while fetching the game data.")
 
+    @staticmethod
+    def __settings_keys() -> Dict[str, Any]:
+        settings = inspect(model.GameSettings)
+        valid_keys: Dict[str, Any] = dict()
+        for key, dtype in [(col.key, col.type) for col in settings.columns]:
+            if not ("game" in key and "id" in key):
+                valid_keys[key] = dtype
+        return valid_keys
+
+    def __configuration(self, game_settings: model.GameSettings) -> str:
+        def get_valid_values(dtype):
+            if isinstance(dtype, Enum):
+                return dtype.enums
+            elif isinstance(dtype, Boolean):
+                return [True, False]
+            return None
+
+        ret = "Configuration:\n"
+        for key, dtype in self.__settings_keys().items():
+            ret += f"* {key}:\n"
+            set_config = getattr(game_settings, key)
+
+            if isinstance(set_config, enum.Enum):
+                set_config = set_config.name
+
+            valid_values = get_valid_values(dtype)
+            if not valid_values:
+                ret += f"  - **{set_config}**\n"
+                continue
+            for data in valid_values:
+                if data == set_config:
+                    ret += f"  - **{data}**\n"
+                else:
+                    ret += f"  - {data}\n"
+        return ret
+
     def config(
         self, game_id: int, property: Optional[str], value: Optional[str]
     ) -> Result[discord.Embed]:
         """Configure a game session. For example !config factions_per_player 5. !config to show current settings."""
-        with Session(self.engine) as session:
+        with database.session(self.engine) as session:
             try:
-                game = session.get(model.Game, game_id)
+                game = self.active.checkout(session, game_id)
                 if not game:
                     return Err("No lobby found.")
 
-                def get_valid_values(dtype):
-                    if isinstance(dtype, Enum):
-                        return dtype.enums
-                    elif isinstance(dtype, Boolean):
-                        return [True, False]
-                    return None
-
-                settings = inspect(model.GameSettings)
-                valid_keys: Dict[str, Any] = dict()
-                for key, dtype in [(col.key, col.type) for col in settings.columns]:
-                    if not ("game" in key and "id" in key):
-                        valid_keys[key] = dtype
+                valid_keys = self.__settings_keys()
 
                 if not property or not value:
                     game_settings = session.get(model.GameSettings, game.game_id)
-                    ret = "Configuration:\n"
-                    for key, dtype in valid_keys.items():
-                        ret += f"* {key}:\n"
-                        set_config = getattr(game_settings, key)
-
-                        if isinstance(set_config, enum.Enum):
-                            set_config = set_config.name
-
-                        valid_values = get_valid_values(dtype)
-                        if not valid_values:
-                            ret += f"  - **{set_config}**\n"
-                            continue
-                        for data in valid_values:
-                            if data == set_config:
-                                ret += f"  - **{data}**\n"
-                            else:
-                                ret += f"  - {data}\n"
                     return Ok(discord.Embed(
                         title="🛡️ Game Configuration",
-                        description=ret,
+                        description=self.__configuration(game_settings),
                         color=discord.Color.blue()
                     ))
 
@@ -603,7 +789,7 @@ Living rules reference (Prophecy of Kings)
                     return Err("Game is not in lobby. Can't change config now")
 
                 valid_properties = valid_keys.keys()
-                best_prop = GameLogic._closest_match(property, valid_properties)
+                best_prop = matching.closest(property, valid_properties)
                 if not best_prop:
                     return Err(
                         "Cannot understand which property you mean. Please check your spelling."
@@ -616,7 +802,7 @@ Living rules reference (Prophecy of Kings)
                 dtype = valid_keys[property]
                 if isinstance(dtype, Enum):
                     enum_map: Dict[str, Any] = {text.lower(): text for text in dtype.enums}
-                    best_value = GameLogic._closest_match(value.lower(), enum_map.keys())
+                    best_value = matching.closest(value.lower(), enum_map.keys())
                     if not best_value:
                         return Err(f"Valid values are: {enum_map.values()}")
                     new_value = enum_map[best_value]
@@ -639,7 +825,11 @@ Living rules reference (Prophecy of Kings)
                     return Err("Invalid datatype")
 
                 game_settings = session.get(model.GameSettings, game_id)
-                setattr(game_settings, property, new_value)
+                # The settings stay in memory, store enums as the enum the column loads.
+                if isinstance(dtype, Enum) and dtype.enum_class is not None:
+                    setattr(game_settings, property, dtype.enum_class[new_value])
+                else:
+                    setattr(game_settings, property, new_value)
                 session.commit()
                 return Ok(discord.Embed(
                     title="🛡️ Game Configuration Updated",
@@ -651,28 +841,24 @@ Living rules reference (Prophecy of Kings)
                 logging.exception("Error configuring lobby")
                 return Err("An error occurred while configuring the lobby.")
 
-    async def apply_poll_results(self, game_id: int) -> Result[str]:
-        with Session(self.engine) as session:
+    def settings_poll_messages(self, game_id: int) -> Result[Tuple[int, List[int]]]:
+        """Returns the thread and message ids of the configuration polls of a game."""
+        with database.session(self.read_engine) as session:
+            messages = session.scalars(
+                select(model.SettingsPoll)
+                .filter_by(game_id=game_id)
+            ).all()
+            if not messages:
+                return Err("Polls can not be found")
+            return Ok((messages[0].thread_id, [message.message_id for message in messages]))
+
+    def apply_poll_results(self, game_id: int, polls: List[discord.Poll]) -> Result[str]:
+        with database.session(self.engine) as session:
             try:
-                messages = session.scalars(
-                    select(model.SettingsPoll)
-                    .filter_by(game_id=game_id)
-                ).all()
+                # The settings come with the game.
+                self.active.checkout(session, game_id)
                 lines = ["Poll results are:"]
-                polls = []
-
-                if not messages:
-                    return Err("Polls can not be found")
-
-                thread = self.bot.get_channel(messages[0].thread_id)
-                if not isinstance(thread, discord.Thread):
-                    return Err("Polls can not be found")
-                msgs = await asyncio.gather(*[thread.fetch_message(message.message_id) for message in messages])
-
-                for msg in msgs:
-                    if not msg.poll:
-                        continue
-                    poll = msg.poll
+                for poll in polls:
                     answer = max(poll.answers, key=lambda c: c.vote_count)
                     lines.append(f"{poll.question}: {answer.text} with {answer.vote_count}")
 
@@ -686,5 +872,5 @@ Living rules reference (Prophecy of Kings)
                 session.commit()
                 return Ok("\n".join(lines))
             except Exception as e:
-                logging.exception("Error fetching polls data")
+                logging.exception("Error applying polls data")
                 return Err("An error occurred while fetching the game data.")
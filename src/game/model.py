@@ -1,12 +1,13 @@
 import enum
 
 from datetime import datetime
-from sqlalchemy import ForeignKey, DateTime, Integer, String, Enum, Boolean, JSON
-from sqlalchemy.orm import Mapped, relationship, mapped_column
+from sqlalchemy import ForeignKey, DateTime, Index, Integer, String, Enum, Boolean, JSON, select
+from sqlalchemy.orm import Mapped, Session, relationship, mapped_column
 from sqlalchemy.sql import func
 from typing import Optional, List
 
-from .. import models
+from .. import matching, models
+from ..typing import Ok, Result
 
 
 class GameState(enum.Enum):
@@ -44,16 +45,29 @@ class GamePlayer(models.Base):
     # Used in picks and bans
     bans: Mapped[Optional[List[str]]] = mapped_column(JSON, default=[])
 
+    # The result, stored when the game finishes. Tied players share a rank,
+    # and all of them count as winners or last.
+    finish_rank: Mapped[Optional[int]] = mapped_column(Integer)
+    is_winner: Mapped[Optional[bool]] = mapped_column(Boolean)
+    is_last: Mapped[Optional[bool]] = mapped_column(Boolean)
+
     # Relationships
     game: Mapped["Game"] = relationship("Game", back_populates="game_players")
     player: Mapped["Player"] = relationship("Player", back_populates="game_players")
 
+    # The primary key covers lookups by game. Stats and achievements look up by
+    # player, and the win counts by winner.
+    __table_args__ = (
+        Index("ix_game_player_player_faction", "player_id", "faction"),
+        Index("ix_game_player_winner_player", "is_winner", "player_id"),
+    )
+
 
 class Game(models.Base):
     __tablename__ = "game"
     game_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     game_state: Mapped[GameState] = mapped_column("game_state", Enum(GameState))
-    name: Mapped[str] = mapped_column("name")
+    name: Mapped[str] = mapped_column("name", index=True)
 
     lobby_create_time: Mapped[datetime] = mapped_column(
         DateTime, server_default=func.current_timestamp()
@@ -64,6 +78,12 @@ class Game(models.Base):
 
     turn: Mapped[int] = mapped_column(Integer, default=0)
 
+    # Stored when the game finishes, with the results of its players. On a
+    # tie the winner is the tied player first in turn order. A copy of a
+    # game_player's player_id, without a foreign key, like migrated tables.
+    winner_player_id: Mapped[Optional[int]] = mapped_column(Integer)
+    player_count: Mapped[Optional[int]] = mapped_column(Integer)
+
     map_string: Mapped[List[int]] = mapped_column(JSON, default=[])
     game_players: Mapped[List["GamePlayer"]] = relationship(
         "GamePlayer", back_populates="game", cascade="all"
@@ -72,6 +92,9 @@ class Game(models.Base):
         "GameSettings", back_populates="game", cascade="all"
     )
 
+    # Lobbies, finished games and unrated games, newest or oldest first.
+    __table_args__ = (Index("ix_game_state_finish_time", "game_state", "game_finish_time"),)
+
 class GameSettings(models.Base):
     __tablename__ = "game_settings"
     game_id: Mapped[int] = mapped_column(ForeignKey("game.game_id"), primary_key=True)
@@ -101,8 +124,21 @@ class SettingsPoll(models.Base):
 class Player(models.Base):
     __tablename__ = "player"
     player_id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    name: Mapped[str] = mapped_column(String)
+    name: Mapped[str] = mapped_column(String, index=True)
 
     game_players: Mapped[List["GamePlayer"]] = relationship(
         "GamePlayer", back_populates="player"
     )
+
+    @classmethod
+    def find(cls, session: Session, name: str) -> Result[int]:
+        """Id of the player called name, see matching.find_name."""
+        player_id = session.scalar(select(cls.player_id).filter_by(name=name))
+        if player_id is not None:
+            return Ok(player_id)
+        players = dict(session.execute(select(cls.name, cls.player_id)).all())
+        match matching.find_name(name, players.keys()):
+            case Ok(found):
+                return Ok(players[found])
+            case error:
+                return error
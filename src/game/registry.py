@@ -0,0 +1,110 @@
+import threading
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from typing import Dict, Optional
+
+from .. import database
+from .controller import DRAFT_VIEW
+from .model import Game, GameState
+
+ACTIVE = (GameState.LOBBY, GameState.BAN, GameState.DRAFT, GameState.STARTED)
+
+
+class ActiveGames:
+    """The games in a lobby or being played, kept in memory between commands.
+
+    Each game is a detached object graph as DRAFT_VIEW loads it. `checkout`
+    attaches it to the session of a command without reading the database, so
+    the command reads from memory and its commit writes only the columns it
+    changed. A game leaves the registry when its changes are flushed and comes
+    back once they are committed, so a command that fails or rolls back drops
+    it and the next one loads it from the database again. Finished and
+    deleted games are dropped too.
+
+    Everything that changes an active game has to go through `checkout`, and
+    commands on the same game must not run at once, which GameExecutor sees to.
+    """
+
+    def __init__(self) -> None:
+        self.games: Dict[int, Game] = {}
+        self.lock = threading.Lock()
+        # Games read from the database instead of memory.
+        self.loads = 0
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def rebuild(self, session: Session) -> int:
+        """Load the active games not in memory yet. Returns how many games are in memory."""
+        games = session.scalars(
+            select(Game).options(*DRAFT_VIEW).where(Game.game_state.in_(ACTIVE))
+        ).all()
+        session.expunge_all()
+        with self.lock:
+            for game in games:
+                self.games.setdefault(game.game_id, game)
+            return len(self.games)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.games.clear()
+
+    def checkout(self, session: Session, game_id: int) -> Optional[Game]:
+        """The game attached to session, from memory when it is there."""
+        self.__watch(session)
+        with self.lock:
+            game = self.games.get(game_id)
+        if game is not None and not self.__changed(game):
+            session.add(game)
+        else:
+            self.loads += 1
+            game = session.get(Game, game_id, options=DRAFT_VIEW)
+            self.__put([game] if game is not None else [], game_id)
+        if game is not None:
+            session.info["active_games"].append(game)
+        return game
+
+    @staticmethod
+    def __changed(game: Game) -> bool:
+        # Changed in memory by a command that never flushed them.
+        objects = [game, game.game_settings, *game.game_players]
+        return any(o is not None and inspect(o).modified for o in objects)
+
+    def __put(self, games, game_id: Optional[int] = None) -> None:
+        with self.lock:
+            if game_id is not None:
+                self.games.pop(game_id, None)
+            for game in games:
+                if game.game_state in ACTIVE and not inspect(game).was_deleted:
+                    self.games[game.game_id] = game
+                else:
+                    self.games.pop(game.game_id, None)
+
+    def __watch(self, session: Session) -> None:
+        if "active_games" in session.info:
+            return
+        session.info["active_games"] = []
+        session.info["flushes"] = 0
+        # The games outlive the session, their state must too.
+        session.expire_on_commit = False
+
+        def flushed(session: Session, context) -> None:
+            session.info["flushes"] += 1
+            with self.lock:
+                for game in session.info["active_games"]:
+                    self.games.pop(game.game_id, None)
+
+        def committed(session: Session) -> None:
+            info, games = session.info, list(session.info["active_games"])
+            flushes = info["flushes"]
+
+            def put() -> None:
+                # Not if the session flushed changes after this commit.
+                if info["flushes"] == flushes:
+                    self.__put(games)
+
+            database.after_commit(put)
+
+        event.listen(session, "after_flush", flushed)
+        event.listen(session, "after_commit", committed)
@@ -118,21 +118,20 @@ def test_picks_only_start_and_draft(db):
     player = game.game_players[0]
     # Should prompt for available factions
     prompt = mode.draft(session, player, None)
-    assert prompt is not None and "Your available factions" in prompt
+    assert isinstance(prompt, Ok) and "Your available factions" in prompt.value.description
     # Should error on wrong turn
-    player2 = game.game_players[1]
-    wrong_turn = mode.draft(session, player2, "Faction1")
-    if wrong_turn is not None:
-        assert "not your turn" in wrong_turn or "has selected" in wrong_turn
-    # Should handle invalid faction (code may draft closest match or error)
-    invalid = mode.draft(session, player, "Nonexistent")
-    if invalid is not None:
-        assert "has selected" in invalid or "can't draft faction" in invalid
-    # Should succeed on valid draft (if not already drafted)
-    if player.faction is None:
-        result2 = mode.draft(session, player, player.factions[0])
-        assert player.faction == player.factions[0]
-        assert result2 is None or "has selected" in result2
+    drafter, waiting = sorted(game.game_players, key=lambda p: p.turn_order)
+    wrong_turn = mode.draft(session, waiting, waiting.factions[0])
+    assert isinstance(wrong_turn, Err) and "not your turn" in wrong_turn.msg
+    # Should succeed on valid draft and take the faction from the other player
+    picked = drafter.factions[0]
+    result2 = mode.draft(session, drafter, picked)
+    assert isinstance(result2, Ok) and "has selected" in result2.value.description
+    assert drafter.faction == picked
+    assert picked not in waiting.factions
+    # The last pick starts the game
+    last = mode.draft(session, waiting, waiting.factions[0])
+    assert isinstance(last, Ok) and isinstance(last.value, draftingmodes.GameStarted)
 
 def test_picks_and_bans_start_and_ban_draft(db):
     session, game = db
@@ -160,3 +159,27 @@ def test_picks_and_bans_start_and_ban_draft(db):
     ban_result2 = mode.ban(session, player, player.factions[1])
     assert ban_result2 is not None
     assert "not your turn" in ban_result2 or "has banned" in ban_result2
+
+
+def test_picks_and_bans_last_pick_starts_the_game(db):
+    session, game = db
+    game.game_settings.drafting_mode = model.DraftingMode.PICKS_AND_BANS
+    for i in range(2):
+        session.add(model.Player(player_id=i+1, name=f"P{i+1}"))
+        session.add(model.GamePlayer(game_id=game.game_id, player_id=i+1))
+    session.commit()
+    game = session.query(model.Game).first()
+    mode = draftingmodes.PicksAndBans(game)
+    mode.start(session, fs.Factions([fs.Faction(f"Faction{i}", "base", "") for i in range(4)]))
+    first, second = sorted(game.game_players, key=lambda p: p.turn_order)
+
+    assert "has banned Faction0" in mode.ban(session, first, "Faction0")
+    assert "Banning is now complete" in mode.ban(session, second, "Faction1")
+
+    banned = mode.draft(session, first, "Faction0")
+    assert isinstance(banned, Err) and "banned" in banned.msg
+    picked = mode.draft(session, first, "Faction2")
+    assert isinstance(picked, Ok) and "has selected Faction2" in picked.value.description
+    assert "Faction2" not in second.factions
+    last = mode.draft(session, second, "Faction3")
+    assert isinstance(last, Ok) and isinstance(last.value, draftingmodes.GameStarted)
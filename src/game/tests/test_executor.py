@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.database import Database
+from src.game import factions as fs, gamelogic, model
+from src.game.executor import GameExecutor
+from src.models import Base
+from src.typing import Ok
+
+PLAYERS = 4
+
+
+@pytest_asyncio.fixture
+async def setup(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    database = Database(engine)
+    logic = gamelogic.GameLogic(None, database.engine, database.read_engine)
+    yield database, logic, GameExecutor()
+    database.close()
+
+
+async def start_game(database, logic, game_id: int) -> None:
+    players = [game_id * 10 + i for i in range(PLAYERS)]
+    await database.write(logic.lobby, game_id, players[0], f"P{players[0]}", f"Lobby{game_id}")
+    for player_id in players[1:]:
+        await database.write(logic.join, game_id, player_id, f"P{player_id}")
+    assert isinstance(await database.write(logic.start, fs.read_factions(), game_id), Ok)
+
+
+def pools(database, game_id: int):
+    with Session(database.engine) as session:
+        return {gp.player_id: list(gp.factions) for gp in session.get(model.Game, game_id).game_players}
+
+
+async def draft_when_my_turn(database, logic, games, game_id: int, player_id: int, faction: str) -> int:
+    """Fire !draft like an impatient player until it is accepted. Returns the attempts."""
+    attempts = 0
+    while True:
+        attempts += 1
+        async with games.serialized(game_id):
+            result = await database.write(logic.draft, player_id, game_id, faction)
+        if isinstance(result, Ok):
+            return attempts
+        assert "not your turn" in result.msg
+        await asyncio.sleep(0)
+
+
+def assert_drafted(database, game_id: int, chosen: dict) -> None:
+    with Session(database.engine) as session:
+        game = session.get(model.Game, game_id)
+        assert game.game_state == model.GameState.STARTED
+        assert {gp.player_id: gp.faction for gp in game.game_players} == chosen
+
+
+@pytest.mark.asyncio
+async def test_concurrent_drafts_at_one_lobby(setup):
+    database, logic, games = setup
+    await start_game(database, logic, 1)
+    chosen = {player_id: pool[0] for player_id, pool in pools(database, 1).items()}
+
+    await asyncio.gather(*(
+        draft_when_my_turn(database, logic, games, 1, player_id, faction)
+        for player_id, faction in chosen.items()
+    ))
+
+    assert_drafted(database, 1, chosen)
+    stats = games.games[1].summary()
+    assert stats["depth"] == 0
+    assert stats["max_depth"] > 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_drafts_at_many_lobbies(setup):
+    database, logic, games = setup
+    lobbies = range(1, 9)
+    await asyncio.gather(*(start_game(database, logic, game_id) for game_id in lobbies))
+    chosen = {
+        game_id: {player_id: pool[0] for player_id, pool in pools(database, game_id).items()}
+        for game_id in lobbies
+    }
+
+    await asyncio.gather(*(
+        draft_when_my_turn(database, logic, games, game_id, player_id, faction)
+        for game_id in lobbies
+        for player_id, faction in chosen[game_id].items()
+    ))
+
+    for game_id in lobbies:
+        assert_drafted(database, game_id, chosen[game_id])
+    assert set(games.games) == set(lobbies)
+    assert all(stats["count"] >= PLAYERS for _, stats in games.busiest(n=len(lobbies)))
+
+
+@pytest.mark.asyncio
+async def test_serializes_per_game_and_runs_games_in_parallel():
+    games = GameExecutor()
+    running = {1: 0, 2: 0}
+    overlap = {1: 0, 2: 0}
+    both = 0
+
+    async def command(game_id: int) -> None:
+        nonlocal both
+        async with games.serialized(game_id):
+            running[game_id] += 1
+            overlap[game_id] = max(overlap[game_id], running[game_id])
+            if running[1] and running[2]:
+                both += 1
+            await asyncio.sleep(0.01)
+            running[game_id] -= 1
+
+    await asyncio.gather(*(command(game_id) for game_id in (1, 2) for _ in range(5)))
+
+    assert overlap == {1: 1, 2: 1}
+    assert both > 0
+    stats = games.games[1].summary()
+    assert (stats["count"], stats["max_depth"], stats["depth"]) == (5, 5, 0)
+    assert stats["wait_p99"] >= 30
+
+
+@pytest.mark.asyncio
+async def test_idle_games_are_forgotten():
+    games = GameExecutor(max_games=2)
+    for game_id in (1, 2, 3):
+        async with games.serialized(game_id):
+            pass
+    assert list(games.games) == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_a_new_game_is_queued_when_every_game_is_busy():
+    games = GameExecutor(max_games=2)
+    async with games.serialized(1), games.serialized(2):
+        async with games.serialized(3):
+            assert list(games.games) == [1, 2, 3]
+    async with games.serialized(4):
+        pass
+    # Back to max_games once the others are idle again.
+    assert list(games.games) == [3, 4]
@@ -1,8 +1,11 @@
 import pytest
-from sqlalchemy import create_engine
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, select
+from contextlib import contextmanager
 from sqlalchemy.orm import sessionmaker
-from src.game import gamelogic, model
+from src.game import controller, gamelogic, model, factions as fs
 from src.models import Base
+from src.perf.queries import assert_max_queries, track
 from src.typing import *
 
 
@@ -110,6 +113,133 @@ def test_games_no_games(db):
     assert "No games found." in result.msg
 
 
+@pytest.fixture
+def history(db):
+    """60 finished games a day apart, one without players, and a running game."""
+    session, logic = db
+    for player_id in range(1, 5):
+        session.add(model.Player(player_id=player_id, name=f"Player{player_id}"))
+    for game_id in range(1, 61):
+        session.add(model.Game(game_id=game_id, game_state="FINISHED", name=f"G{game_id}",
+                               game_finish_time=datetime(2025, 1, 1) + timedelta(days=game_id)))
+        for player_id in range(1, 2 + game_id % 4):
+            # The game's winner is player game_id % 4 + 1.
+            points = 10 if player_id == game_id % 4 + 1 else player_id
+            session.add(model.GamePlayer(game_id=game_id, player_id=player_id, faction=f"Faction{player_id}", points=points))
+    session.add(model.Game(game_id=61, game_state="FINISHED", name="Empty", game_finish_time=datetime(2026, 1, 1)))
+    session.add(model.Game(game_id=62, game_state="DRAFT", name="Running"))
+    session.flush()
+    for game_id in range(1, 62):
+        logic.controller.record_result(session, session.get(model.Game, game_id))
+    session.commit()
+    return session, logic
+
+
+def test_games_summary_is_one_query(history):
+    session, logic = history
+    with assert_max_queries(1):
+        games = logic._game_summaries(session, 40)
+    assert [g.game_id for g in games] == [61] + list(range(60, 21, -1))
+    assert games[0] == gamelogic.GameSummary(61, "Empty", 0, None, None)
+    assert games[1] == gamelogic.GameSummary(60, "G60", 1, "Player1", "Faction1")
+    assert games[2] == gamelogic.GameSummary(59, "G59", 4, "Player4", "Faction4")
+
+    with assert_max_queries(2):
+        result = logic.games()
+    embed = result.value.embed(1)
+    assert [f.name for f in embed.fields] == [
+        "Empty (players 0)", "G60 (players 1)", "G59 (players 4)", "G58 (players 3)", "G57 (players 2)"
+    ]
+    assert embed.fields[0].value == "Winner: Unknown"
+    assert embed.fields[2].value == "Winner: Player4 (Faction4)"
+
+
+def pages(logic, filters=gamelogic.GameFilter(), page_size=5):
+    """Game ids of every page, following the cursors."""
+    cursor, seen = None, []
+    while True:
+        page = logic.games(filters, cursor, page_size).value
+        seen.append([g.game_id for g in page.games])
+        if page.next is None:
+            return seen
+        cursor = page.next
+
+
+def test_games_pages_through_the_whole_history(history):
+    _, logic = history
+    seen = pages(logic, page_size=7)
+    assert [len(p) for p in seen] == [7] * 8 + [5]
+    assert sum(seen, []) == [61] + list(range(60, 0, -1))
+
+    # A deep page is the same query as the first.
+    page = logic.games(page_size=7).value
+    for _ in range(5):
+        with assert_max_queries(2):
+            page = logic.games(gamelogic.GameFilter(), page.next, 7).value
+    assert page.games[0].game_id == 26
+
+
+def test_games_pages_through_games_finished_at_the_same_time(db):
+    session, logic = db
+    # Finish times from SQLite's default, without fractions of seconds.
+    for game_id in range(1, 13):
+        session.add(model.Game(game_id=game_id, game_state="FINISHED", name=f"G{game_id}"))
+    session.commit()
+    assert sum(pages(logic), []) == list(range(12, 0, -1))
+
+
+def test_games_filters(history):
+    _, logic = history
+    Filter = gamelogic.GameFilter
+    # Player4 only plays the games with game_id % 4 == 3, as Faction4.
+    assert sum(pages(logic, Filter(player="Player4")), []) == list(range(59, 0, -4))
+    assert sum(pages(logic, Filter(player="PLAYER4")), []) == list(range(59, 0, -4))
+    assert sum(pages(logic, Filter(faction="Faction3")), []) == [g for g in range(60, 0, -1) if g % 4 >= 2]
+    assert logic.games(Filter(player="Player1", faction="Faction2")).msg == "No games found."
+    assert sum(pages(logic, Filter(players=2)), []) == list(range(57, 0, -4))
+    assert sum(pages(logic, Filter(after=datetime(2025, 2, 20), before=datetime(2025, 3, 1))), []) == list(range(58, 49, -1))
+    assert sum(pages(logic, Filter(players=3, after=datetime(2025, 2, 20))), []) == [58, 54, 50]
+
+    assert logic.games(Filter(player="Nobody at all")).msg == "Can't find anyone with that name"
+    # A near miss could be someone else, it is only suggested.
+    assert logic.games(Filter(player="Player 4")).msg == "Can't find anyone with that name. Did you mean Player4?"
+    assert logic.games(Filter(players=8)).msg == "No games found."
+
+
+def test_game_filter_parse():
+    parse = gamelogic.GameFilter.parse
+    assert parse("").value == gamelogic.GameFilter()
+    assert parse("player:Mr Bean faction:The Arborec after:2025-01-01 players:6").value == gamelogic.GameFilter(
+        player="Mr Bean", faction="The Arborec", after=datetime(2025, 1, 1), players=6
+    )
+    assert parse("before:2025-02-01").value.before == datetime(2025, 2, 1)
+    for bad in ("Alice", "colour:red", "players:six", "after:yesterday", "player:"):
+        assert isinstance(parse(bad), Err)
+
+
+@pytest.mark.asyncio
+async def test_game_history_fetches_pages_as_they_are_shown(history):
+    _, logic = history
+    fetched = []
+
+    async def fetch(cursor):
+        fetched.append(cursor)
+        return logic.games(gamelogic.GameFilter(), cursor, 21)
+
+    menu = gamelogic.GameHistory(logic.games(page_size=21).value, fetch)
+    assert not await menu.newer()
+    assert await menu.older() and await menu.older()
+    assert menu.number == 3
+    assert menu.embed().footer.text == "Page 3"
+    assert menu.embed().fields[-1].name == "G1 (players 2)"
+    # Nothing comes after the last page.
+    assert not await menu.older()
+    assert await menu.newer()
+    assert menu.page.games[0].game_id == 40
+    assert len(fetched) == 3
+    assert fetched[0] == fetched[2] is not None
+
+
 def test_lobby_and_join_leave(db):
     session, logic = db
     lobby_name = "TestLobby"
@@ -224,6 +354,95 @@ def test_finish_game_flow(db):
     assert "7 point(s)" in embed.description
 
 
+def test_finish_stores_the_result(db):
+    session, logic = db
+    game = model.Game(game_state="STARTED", name="ResultTest")
+    session.add(game)
+    session.flush()
+    for i in range(1, 5):
+        session.add(model.Player(player_id=i, name=f"P{i}"))
+        session.add(model.GamePlayer(game_id=game.game_id, player_id=i, turn_order=i - 1))
+    session.commit()
+
+    assert isinstance(logic.finish(False, game.game_id, "7 10 10 3"), Ok)
+    session.expire_all()
+    game = session.get(model.Game, game.game_id)
+    # A tie for first, the winner is first in turn order.
+    assert (game.winner_player_id, game.player_count) == (2, 4)
+    results = {gp.player_id: (gp.finish_rank, gp.is_winner, gp.is_last) for gp in game.game_players}
+    assert results == {1: (3, False, False), 2: (1, True, False), 3: (1, True, False), 4: (4, False, True)}
+
+
+def add_table(session, players, drafting_mode=model.DraftingMode.PICKS_AND_BANS):
+    """A lobby of players set up to ban and draft, and a player not in it."""
+    settings = model.GameSettings(drafting_mode=drafting_mode, factions_per_player=2, bans_per_player=1)
+    session.add(model.Game(game_id=1, game_state="LOBBY", name="Table", game_settings=settings))
+    for i in range(1, players + 1):
+        session.add(model.Player(player_id=i, name=f"P{i}"))
+        session.add(model.GamePlayer(game_id=1, player_id=i))
+    session.add(model.Player(player_id=99, name="Late"))
+    session.commit()
+
+
+@contextmanager
+def assert_max_reads(n):
+    with track() as log:
+        yield log
+    reads = [s for s in log.statements if s.startswith("SELECT")]
+    assert len(reads) <= n, "\n".join(reads)
+
+
+@pytest.mark.parametrize("profile, settings", [
+    (controller.LOBBY_VIEW, False), (controller.DRAFT_VIEW, True), (controller.RESULTS_VIEW, True),
+])
+def test_loading_profiles_load_the_graph_up_front(db, profile, settings):
+    session, logic = db
+    add_table(session, players=8)
+    session.expunge_all()
+    with assert_max_queries(2):
+        game = logic.controller.game(session, 1, profile)
+    with assert_max_queries(0):
+        assert [gp.player.name for gp in game.game_players] == [f"P{i}" for i in range(1, 9)]
+        if settings:
+            assert game.game_settings.bans_per_player == 1
+
+
+@pytest.mark.parametrize("players", [3, 8])
+def test_game_night_reads_do_not_grow_with_the_players(db, players):
+    session, logic = db
+    add_table(session, players)
+    factions = fs.Factions([fs.Faction(f"Faction{i}", "base", "") for i in range(40)])
+
+    def turns():
+        session.expire_all()
+        order = session.scalars(select(model.GamePlayer.player_id).order_by(model.GamePlayer.turn_order))
+        for player_id in order.all():
+            session.expire_all()
+            yield session.get(model.GamePlayer, (1, player_id))
+
+    with assert_max_reads(2):
+        assert isinstance(logic.lobbies(), Ok)
+    if players < 8:
+        with assert_max_reads(3):
+            assert isinstance(logic.join(1, 99, "Late"), Ok)
+        with assert_max_reads(4):
+            assert isinstance(logic.leave(1, 99), Ok)
+    with assert_max_reads(4):
+        assert isinstance(logic.start(factions, 1), Ok)
+    for gp in turns():
+        faction = gp.factions[gp.turn_order]
+        with assert_max_reads(2):
+            assert "has banned" in logic.ban(gp.player_id, 1, faction)
+    for gp in turns():
+        faction = gp.factions[0]
+        with assert_max_reads(5):
+            assert isinstance(logic.draft(gp.player_id, 1, faction), Ok)
+    with assert_max_reads(4):
+        assert isinstance(logic.finish(False, 1, " ".join(["5"] * players)), Ok)
+    with assert_max_reads(2):
+        assert isinstance(logic.game(1), Ok)
+
+
 def test_games_summary(db):
     session, logic = db
     for i in range(1, 4):
@@ -236,13 +455,10 @@ def test_games_summary(db):
             game_id=game.game_id, player_id=i, faction="FactionA", points=10
         )
         session.add(gp)
+        logic.controller.record_result(session, game)
         session.commit()
 
-    result = logic.games().value
-    # games returns an Embed
-    embed = result
-    assert "Winner" in embed.description
-    assert "FactionA" in embed.description
-    assert "G1" in embed.description
-    assert "G2" in embed.description
-    assert "G3" in embed.description
+    embed = logic.games().value.embed(1)
+    assert [f.name for f in embed.fields] == ["G3 (players 1)", "G2 (players 1)", "G1 (players 1)"]
+    assert [f.value for f in embed.fields] == [f"Winner: Winner{i} (FactionA)" for i in (3, 2, 1)]
+    assert embed.footer.text == "Page 1"
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import Session
+
+from src.achievements import listener
+from src.achievements import model as achievements_model
+from src.achievements.achievementtype import Achieved
+from src.achievements.checker import AchievementChecker
+from src.betting import model as betting_model
+from src.game import controller, model
+from src.game.util import generate_db
+from src.rating import model as rating_model
+from src.rating import ratinglogic
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    path = tmp_path_factory.mktemp("generated") / "generated.db"
+    counts = generate_db.generate(str(path), players=10, games=60, seed=3)
+    assert counts["game"] == 60
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+
+def test_games_are_finished_with_one_winner(engine):
+    with Session(engine) as session:
+        games = session.scalars(select(model.Game)).all()
+        assert {g.game_state for g in games} == {model.GameState.FINISHED}
+        for game in games:
+            points = sorted((gp.points for gp in game.game_players), reverse=True)
+            assert 3 <= len(points) <= 8
+            assert points[0] > points[1]
+            assert sorted(gp.turn_order for gp in game.game_players) == list(range(len(points)))
+            assert len({gp.faction for gp in game.game_players}) == len(points)
+
+
+def test_results_match_the_ones_stored_at_finish(engine):
+    def result(game):
+        return game.winner_player_id, game.player_count, [
+            (gp.finish_rank, gp.is_winner, gp.is_last) for gp in game.game_players
+        ]
+
+    with Session(engine) as session:
+        for game in session.scalars(select(model.Game)):
+            generated = result(game)
+            controller.GameController().record_result(session, game)
+            assert result(game) == generated
+        session.rollback()
+
+
+def test_ratings_match_replaying_the_games(engine):
+    logic = ratinglogic.RatingLogic(engine)
+    assert logic.unrated_games() == []
+    with Session(engine) as session:
+        generated = dict(session.execute(select(rating_model.MatchPlayer.player_id, rating_model.MatchPlayer.rating)).all())
+        for table in (rating_model.OutcomeLedger, rating_model.WinnerHeadToHead, rating_model.MatchPlayer):
+            session.execute(delete(table))
+        session.commit()
+
+    for game_id in logic.unrated_games():
+        logic.update_rating(None, game_id)
+
+    with Session(engine) as session:
+        replayed = dict(session.execute(select(rating_model.MatchPlayer.player_id, rating_model.MatchPlayer.rating)).all())
+    assert replayed.keys() == generated.keys()
+    for player_id, rating in generated.items():
+        assert replayed[player_id] == pytest.approx(rating)
+
+
+def test_counters_match_reconcile(engine):
+    def progress():
+        with Session(engine) as session:
+            rows = session.execute(select(
+                achievements_model.PlayerProgress.player_id,
+                achievements_model.PlayerProgress.counter_key,
+                achievements_model.PlayerProgress.value,
+            )).all()
+            return sorted(tuple(r) for r in rows)
+
+    generated = progress()
+    listener.reconcile(engine)
+    assert progress() == generated
+
+
+def test_no_achievement_left_to_unlock(engine):
+    checker = AchievementChecker(engine)
+    with Session(engine) as session:
+        achievements = session.scalars(select(achievements_model.Achievement)).all()
+        players = session.scalars(select(model.Player.player_id)).all()
+        assert session.scalar(select(achievements_model.PlayerAchievement).limit(1)) is not None
+    pending = [
+        (a.key, player_id)
+        for a in achievements
+        for player_id in players
+        if isinstance(checker.check(a, player_id), Achieved)
+    ]
+    assert pending == []
+
+
+def test_unpaid_bets_fit_the_balance(engine):
+    with Session(engine) as session:
+        for bettor in session.scalars(select(betting_model.Bettor)):
+            debt = sum(session.scalars(select(betting_model.GameBet.bet).filter_by(player_id=bettor.player_id)))
+            assert bettor.balance - debt >= 0
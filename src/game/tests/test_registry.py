@@ -0,0 +1,171 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.database import Database
+from src.game import factions as fs, gamelogic, model
+from src.models import Base
+from src.perf.queries import track
+from src.typing import Ok
+
+PLAYERS = 4
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def logic(engine):
+    return gamelogic.GameLogic(None, engine)
+
+
+def start(logic, game_id=1, mode="PICKS_AND_BANS"):
+    logic.lobby(game_id, 1, "P1", f"Game{game_id}")
+    for player_id in range(2, PLAYERS + 1):
+        assert isinstance(logic.join(game_id, player_id, f"P{player_id}"), Ok)
+    assert isinstance(logic.config(game_id, "drafting_mode", mode), Ok)
+    assert isinstance(logic.start(fs.read_factions(), game_id), Ok)
+
+
+def stored(engine, game_id=1):
+    """The game as the database has it."""
+    with Session(engine) as session:
+        game = session.get(model.Game, game_id)
+        players = {
+            gp.player_id: (gp.turn_order, gp.faction, list(gp.factions), list(gp.bans or []))
+            for gp in game.game_players
+        }
+        return game.game_state, game.turn, players
+
+
+def in_memory(logic, game_id=1):
+    game = logic.active.games[game_id]
+    players = {
+        gp.player_id: (gp.turn_order, gp.faction, list(gp.factions), list(gp.bans or []))
+        for gp in game.game_players
+    }
+    return game.game_state, game.turn, players
+
+
+def turn_order(logic, game_id=1):
+    return sorted(logic.active.games[game_id].game_players, key=lambda gp: gp.turn_order)
+
+
+def test_bans_and_drafts_read_nothing(engine, logic):
+    start(logic)
+    loads = logic.active.loads
+    for gp in turn_order(logic):
+        with track() as log:
+            assert "has banned" in logic.ban(gp.player_id, 1, gp.factions[-1])
+        assert not [s for s in log.statements if s.startswith("SELECT")]
+        assert in_memory(logic) == stored(engine)
+    for gp in turn_order(logic):
+        with track() as log:
+            assert isinstance(logic.draft(gp.player_id, 1, gp.factions[0]), Ok)
+        assert not [s for s in log.statements if s.startswith("SELECT")]
+        if 1 in logic.active.games:
+            assert in_memory(logic) == stored(engine)
+    assert logic.active.loads == loads
+    assert stored(engine)[0] == model.GameState.STARTED
+
+
+def test_finished_and_cancelled_games_leave(logic):
+    start(logic, 1)
+    start(logic, 2)
+    assert isinstance(logic.cancel(2), Ok)
+    assert set(logic.active.games) == {1}
+    with Session(logic.engine) as session:
+        session.get(model.Game, 1).game_state = model.GameState.STARTED
+        session.commit()
+    logic.active.clear()
+    assert isinstance(logic.finish(False, 1, "1 2 3 4"), Ok)
+    assert logic.active.games == {}
+
+
+def test_join_and_leave_keep_the_players_in_memory(engine, logic):
+    logic.lobby(1, 1, "P1", "Lobby")
+    assert isinstance(logic.join(1, 2, "P2"), Ok)
+    assert isinstance(logic.join(1, 3, "P3"), Ok)
+    assert isinstance(logic.leave(1, 2), Ok)
+    assert in_memory(logic) == stored(engine)
+    assert [gp.player.name for gp in logic.active.games[1].game_players] == ["P1", "P3"]
+
+
+def test_changes_that_are_not_committed_are_not_served(engine, logic):
+    start(logic)
+    with Session(engine) as session:
+        logic.active.checkout(session, 1).turn = 3
+    loads = logic.active.loads
+    # Loaded again, where it is still the first turn.
+    drafter = turn_order(logic)[0]
+    assert "has banned" in logic.ban(drafter.player_id, 1, drafter.factions[-1])
+    assert logic.active.loads == loads + 1
+    assert in_memory(logic) == stored(engine)
+
+
+def test_a_command_failing_half_way_is_not_served(engine, logic, monkeypatch):
+    start(logic)
+    drafter = turn_order(logic)[0]
+    calls = []
+
+    def current_drafter(self, session, game):
+        calls.append(game.turn)
+        if len(calls) == 2:
+            raise LookupError("after the ban")
+        return drafter
+
+    monkeypatch.setattr(gamelogic.controller.GameController, "current_drafter", current_drafter)
+    assert logic.ban(drafter.player_id, 1, drafter.factions[-1]) == "Something went wrong"
+    monkeypatch.undo()
+
+    loads = logic.active.loads
+    with Session(engine) as session:
+        game = logic.active.checkout(session, 1)
+        assert game.turn == 0 and not any(gp.bans for gp in game.game_players)
+    assert logic.active.loads == loads + 1
+
+
+def test_rebuild_loads_the_active_games(engine, logic):
+    start(logic, 1)
+    start(logic, 2)
+    logic.lobby(3, 1, "P1", "Lobby")
+    with Session(engine) as session:
+        session.get(model.Game, 2).game_state = model.GameState.FINISHED
+        session.commit()
+
+    fresh = gamelogic.GameLogic(None, engine)
+    with track() as log:
+        assert fresh.load_active_games() == 2
+    # The games, their players and the settings.
+    assert log.count == 2
+    assert set(fresh.active.games) == {1, 3}
+    assert in_memory(fresh) == stored(engine)
+
+
+@pytest.mark.asyncio
+async def test_game_comes_back_only_once_its_batch_commits(engine):
+    database = Database(engine)
+    logic = gamelogic.GameLogic(None, database.engine)
+    try:
+        await database.write(start, logic)
+        drafter = turn_order(logic)[0]
+
+        def ban_then_fail():
+            logic.ban(drafter.player_id, 1, drafter.factions[-1])
+            raise RuntimeError("after the ban")
+
+        with pytest.raises(RuntimeError):
+            await database.write(ban_then_fail)
+        # The ban was rolled back with the unit and its game wasn't put back.
+        assert 1 not in logic.active.games
+        assert stored(engine)[1] == 0
+
+        assert "has banned" in await database.write(logic.ban, drafter.player_id, 1, drafter.factions[-1])
+        assert in_memory(logic) == stored(engine)
+    finally:
+        database.close()
@@ -0,0 +1,443 @@
+"""Generate a large, consistent database of finished games.
+
+Players get a hidden skill and an activity level, so a few play most games
+and the better ones win more often. Games have 3 to 8 players, mostly 6,
+factions weighted by popularity from ti4_factions.csv, a random turn order
+with a small edge for going first, and points where the winner reaches the
+victory point goal. Everything derived from the games is filled in the way
+the bot would have: the rating ledger and head to head rows from replaying
+the games in order, bets and balances, achievement counters and the unlocks
+of the counter and faction/points finish rules.
+
+Rows go in with bulk inserts in a single transaction, 100k games take well
+under a minute.
+
+Usage: python -m src.game.util.generate_db [--players 200] [--games 100000] [--out generated.db] [--seed 0]
+"""
+import argparse
+import bisect
+import json
+import os
+import random
+import time
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import accumulate, combinations
+from pathlib import Path
+from sqlalchemy import Connection, create_engine
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .. import factions, model
+from ... import migrations
+from ...achievements import model as achievements_model
+from ...betting import model as betting_model
+from ...rating import model as rating_model
+from ...rating.ratinglogic import RatingLogic
+
+# Share of games by number of players.
+PLAYER_COUNTS = {3: 3, 4: 7, 5: 12, 6: 58, 7: 10, 8: 10}
+DRAFTING_MODES = {
+    model.DraftingMode.EXCLUSIVE_POOL: 70,
+    model.DraftingMode.PICKS_AND_BANS: 20,
+    model.DraftingMode.PICKS_ONLY: 10,
+}
+# Source of the faction to how often it is picked relative to a base game faction.
+SOURCE_POPULARITY = {"Base Game": 1.0, "Prophecy of Kings": 1.2, "Codex": 1.0, "Discordant Stars": 0.3}
+K_GAME = 50
+CHUNK = 50_000
+
+ACHIEVEMENTS = Path(__file__).parent.parent.parent / "achievements" / "achievements"
+
+
+@dataclass
+class GeneratedGame:
+    game_id: int
+    finish_time: datetime
+    # (player_id, faction, points, turn_order), in turn order.
+    players: List[Tuple[int, str, int, int]]
+
+    @property
+    def winner(self) -> int:
+        # Like GameController.record_result, the first in turn order on a tie.
+        return max(self.players, key=lambda p: p[2])[0]
+
+
+@dataclass
+class Rules:
+    """Achievement rules that can be evaluated while generating, by kind."""
+
+    counters: Dict[str, List[Tuple[str, int]]] = field(default_factory=lambda: defaultdict(list))
+    play_as: Dict[str, List[str]] = field(default_factory=lambda: defaultdict(list))
+    against: Dict[str, List[str]] = field(default_factory=lambda: defaultdict(list))
+    win_against: Dict[str, List[str]] = field(default_factory=lambda: defaultdict(list))
+    lose_against: Dict[str, List[str]] = field(default_factory=lambda: defaultdict(list))
+    points: List[Tuple[str, str, int]] = field(default_factory=list)
+    targets: Dict[str, int] = field(default_factory=dict)
+
+
+def load_achievements(path: Path = ACHIEVEMENTS) -> List[Dict[str, Any]]:
+    return [json.loads(p.read_text(encoding="utf-8")) for p in sorted(path.glob("*.json"))]
+
+
+def _names(value: Any) -> List[str]:
+    return [value] if isinstance(value, str) else list(value)
+
+
+def compile_rules(achievements: Iterable[Dict[str, Any]]) -> Rules:
+    """Index the rules the generator can evaluate.
+
+    Rules about named players (head_to_head, player and the player filter)
+    never match generated players, so they are left out like any other rule
+    not understood here.
+    """
+    rules = Rules()
+    for a in achievements:
+        if not a.get("is_active", True):
+            continue
+        rule, id = a["rule_json"], a["achievement_id"]
+        if rule.get("type") == "counter":
+            rules.counters[rule["counter_key"]].append((id, int(rule["target"])))
+            continue
+        filter_ = rule.get("filter") or {}
+        if rule.get("type") != "finish" or len(filter_) != 1:
+            continue
+        (kind, value), = filter_.items()
+        match kind:
+            case "play_as_faction":
+                rules.play_as[value].append(id)
+            case "against_faction" if isinstance(value, (str, list)):
+                for name in _names(value):
+                    rules.against[name].append(id)
+            case "win_against":
+                for name in _names(value):
+                    rules.win_against[name].append(id)
+            case "lose_against":
+                for name in _names(value):
+                    rules.lose_against[name].append(id)
+            case "points":
+                rules.points.append((id, value["op"], int(value["target"])))
+            case _:
+                continue
+        rules.targets[id] = int(rule["target"])
+    for counters in rules.counters.values():
+        counters.sort(key=lambda c: c[1])
+    return rules
+
+
+def _compare(op: str, a: int, b: int) -> bool:
+    match op:
+        case "lte":
+            return a <= b
+        case "lt":
+            return a < b
+        case "gte":
+            return a >= b
+        case "gt":
+            return a > b
+        case "eq" | "=":
+            return a == b
+        case "neq" | "!=":
+            return a != b
+    return False
+
+
+class Generator:
+    def __init__(self, players: int, games: int, seed: int = 0, until: Optional[datetime] = None) -> None:
+        self.rng = random.Random(seed)
+        self.player_count = players
+        self.game_count = games
+        self.until = until or datetime(2026, 1, 1)
+
+        fs = factions.read_factions().factions
+        self.factions = [f.name for f in fs]
+        popularity = [SOURCE_POPULARITY.get(f.source, 1.0) for f in fs]
+        # Some factions are favorites whatever the expansion.
+        self.faction_weights = [p * self.rng.lognormvariate(0, 0.5) for p in popularity]
+
+        self.skill = {p: self.rng.gauss(0, 1) for p in range(1, players + 1)}
+        # Activity follows a long tail: a core group plays most games.
+        self.activity = {p: 1 / (rank + 1) ** 0.8 for rank, p in enumerate(self.rng.sample(range(1, players + 1), players))}
+
+    def __weighted_sample(self, population: List[Any], cum_weights: List[float], k: int) -> List[Any]:
+        # Draw with replacement until k are distinct, cheap while k is small next to the population.
+        picked: Dict[Any, None] = {}
+        while len(picked) < k:
+            for x in self.rng.choices(population, cum_weights=cum_weights, k=k - len(picked)):
+                picked[x] = None
+        return list(picked)[:k]
+
+    def games(self) -> Iterable[GeneratedGame]:
+        """Finished games, oldest first, over the years before `until`."""
+        counts, count_weights = zip(*PLAYER_COUNTS.items())
+        ids = list(self.activity)
+        activity = list(accumulate(self.activity.values()))
+        faction_weights = list(accumulate(self.faction_weights))
+        start = self.until - timedelta(days=max(365, self.game_count // 20))
+        span = (self.until - start).total_seconds()
+        times = sorted(self.rng.random() * span for _ in range(self.game_count))
+
+        for game_id, offset in enumerate(times, start=1):
+            n = min(self.rng.choices(counts, count_weights)[0], self.player_count)
+            seated = self.__weighted_sample(ids, activity, n)
+            picked = self.__weighted_sample(self.factions, faction_weights, n)
+            self.rng.shuffle(seated)
+
+            # Going first is a small advantage.
+            performance = [self.skill[p] + self.rng.gauss(0, 1.2) - 0.05 * turn for turn, p in enumerate(seated)]
+            ranking = sorted(range(n), key=lambda i: performance[i], reverse=True)
+            goal = 14 if self.rng.random() < 0.05 else 10
+            points = [0] * n
+            points[ranking[0]] = goal
+            for place, i in enumerate(ranking[1:], start=1):
+                # Close races at the top, a spread below, the odd player wiped out.
+                high = goal - 1 - (place - 1) // 2
+                points[i] = max(0, min(high, round(self.rng.triangular(0, high, high - 1))))
+            yield GeneratedGame(
+                game_id=game_id,
+                finish_time=start + timedelta(seconds=offset),
+                players=[(p, picked[turn], points[turn], turn) for turn, p in enumerate(seated)],
+            )
+
+
+class Writer:
+    """Buffers rows and bulk inserts them in chunks, straight through the driver.
+
+    Going around SQLAlchemy's per row type processing is what makes large
+    datasets fast, so values are converted like the column types would:
+    see `_time` and `_json`. Tables are flushed together in the order they
+    were first written to, so foreign keys always point at inserted rows.
+    """
+
+    def __init__(self, connection: Connection) -> None:
+        self.connection = connection
+        self.rows: Dict[str, List[Tuple[Any, ...]]] = {}
+        self.statements: Dict[str, str] = {}
+        self.buffered = 0
+        self.counts: Counter = Counter()
+
+    def table(self, table: Any, *columns: str) -> None:
+        name = table.__tablename__
+        placeholders = ", ".join("?" * len(columns))
+        self.statements[name] = f'INSERT INTO {name} ({", ".join(f'"{c}"' for c in columns)}) VALUES ({placeholders})'
+        self.rows[name] = []
+
+    def add(self, table: str, *row: Any) -> None:
+        self.rows[table].append(row)
+        self.buffered += 1
+        if self.buffered >= CHUNK:
+            self.flush()
+
+    def flush(self) -> None:
+        for name, rows in self.rows.items():
+            if rows:
+                self.connection.exec_driver_sql(self.statements[name], rows)
+                self.counts[name] += len(rows)
+                self.rows[name] = []
+        self.buffered = 0
+
+
+def _time(value: datetime) -> str:
+    # How SQLAlchemy stores DateTime on SQLite.
+    return value.isoformat(" ", "microseconds")
+
+
+def _json(value: Any) -> str:
+    return json.dumps(value)
+
+
+def generate(path: str, players: int, games: int, seed: int = 0, until: Optional[datetime] = None) -> Counter:
+    """Write a database with players and finished games to path, returning the rows per table."""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    generator = Generator(players, games, seed, until)
+    rng = random.Random(seed + 1)
+    achievements = load_achievements()
+    rules = compile_rules(achievements)
+    finished = model.GameState.FINISHED.name
+    modes = list(DRAFTING_MODES)
+    mode_weights = list(DRAFTING_MODES.values())
+
+    engine = create_engine(f"sqlite:///{path}")
+    # A new database, created at the latest schema version.
+    migrations.Migrator(engine).prepare()
+    try:
+        with engine.begin() as connection:
+            connection.exec_driver_sql("PRAGMA synchronous=OFF")
+            out = Writer(connection)
+            out.table(model.Player, "player_id", "name")
+            out.table(achievements_model.Achievement, "achievement_id", "key", "version", "name", "description", "rule_json", "points", "is_active")
+            # Ratings and balances are only known at the end and updated then.
+            out.table(rating_model.MatchPlayer, "player_id", "rating", "thumbnail_url", "description")
+            out.table(betting_model.Bettor, "player_id", "balance")
+            out.table(model.Game, "game_id", "game_state", "name", "lobby_create_time", "game_finish_time", "turn", "map_string", "winner_player_id", "player_count")
+            out.table(model.GameSettings, "game_id", "drafting_mode", "base_game_factions", "prophecy_of_kings_factions", "codex_factions", "discordant_stars_factions", "factions_per_player", "bans_per_player")
+            out.table(model.GamePlayer, "game_id", "player_id", "faction", "points", "turn_order", "factions", "bans", "finish_rank", "is_winner", "is_last")
+            out.table(rating_model.WinnerHeadToHead, "game_id", "winner_id", "loser_id")
+            out.table(rating_model.OutcomeLedger, "game_id", "player_id", "match_time", "rating_before", "rating_after", "rating_delta")
+            out.table(betting_model.GameBet, "game_id", "player_id", "winner", "bet")
+            out.table(achievements_model.PlayerAchievement, "player.player_id", "achievement_id", "unlocked_at", "awarded_by")
+            out.table(achievements_model.PlayerProgress, "player_id", "counter_key", "value")
+
+            for p in range(1, players + 1):
+                out.add("player", p, f"Player {p}")
+                out.add("match_player", p, rating_model.INITIAL_RATING, "", "")
+            for a in achievements:
+                out.add(
+                    "achievement", a["achievement_id"], a["key"], int(a.get("version", 1)), a["name"], a["description"],
+                    _json(a.get("rule_json") or {}), int(a.get("points", 0)), int(bool(a.get("is_active", True))),
+                )
+            bettors = set(rng.sample(range(1, players + 1), max(1, players * 2 // 5)))
+            for b in sorted(bettors):
+                out.add("bettor", b, 1000)
+
+            rating: Dict[int, float] = {}
+            counters: Dict[str, Counter] = defaultdict(Counter)
+            # (player, achievement) to finishes matching it, and unlock times per player.
+            progress: Counter = Counter()
+            unlocked: Dict[int, Dict[str, datetime]] = defaultdict(dict)
+            balance = {b: 1000 for b in bettors}
+            outstanding: Dict[int, int] = defaultdict(int)
+            by_points: Dict[int, List[str]] = {}
+
+            for game in generator.games():
+                game_id, n = game.game_id, len(game.players)
+                finish_time = _time(game.finish_time)
+                mode = rng.choices(modes, mode_weights)[0]
+                out.add(
+                    "game", game_id, finished, f"Game {game_id}",
+                    _time(game.finish_time - timedelta(hours=rng.uniform(4, 48))), finish_time, 0, "[]",
+                    game.winner, n,
+                )
+                out.add("game_settings", game_id, mode.name, 1, 1, 1, 1, 4, 1)
+                in_game = {p for p, _, _, _ in game.players}
+                others = [f for f in generator.factions if f not in {f for _, f, _, _ in game.players}]
+                bans = rng.sample(others, n) if mode == model.DraftingMode.PICKS_AND_BANS else []
+                scores = [p[2] for p in game.players]
+                for i, (player_id, faction, points, turn) in enumerate(game.players):
+                    pool = [faction] + rng.sample(others, 3) if mode == model.DraftingMode.EXCLUSIVE_POOL else []
+                    rank = 1 + sum(s > points for s in scores)
+                    out.add(
+                        "game_player", game_id, player_id, faction, points, turn, _json(pool), _json(bans[i:i + 1]),
+                        rank, int(rank == 1), int(points == min(scores)),
+                    )
+
+                # Ratings, like RatingLogic._update_game_rating.
+                deltas: Dict[int, float] = defaultdict(float)
+                for (p1, _, pts1, _), (p2, _, pts2, _) in combinations(game.players, 2):
+                    e_ab, e_ba = RatingLogic._expectations(
+                        rating.get(p1, rating_model.INITIAL_RATING), rating.get(p2, rating_model.INITIAL_RATING)
+                    )
+                    if pts1 == pts2:
+                        deltas[p1] += 0.5 - e_ab
+                        deltas[p2] += 0.5 - e_ba
+                    elif pts1 > pts2:
+                        out.add("winner_head_to_head", game_id, p1, p2)
+                        deltas[p1] += 1 - e_ab
+                        deltas[p2] -= e_ba
+                    else:
+                        out.add("winner_head_to_head", game_id, p2, p1)
+                        deltas[p1] -= e_ab
+                        deltas[p2] += 1 - e_ba
+                for player_id, _, _, _ in game.players:
+                    before = rating.get(player_id, rating_model.INITIAL_RATING)
+                    delta = deltas[player_id] / (n - 1) * K_GAME
+                    rating[player_id] = before + delta
+                    out.add("outcome_ledger", game_id, player_id, finish_time, before, before + delta, delta)
+
+                # Bets from bettors outside the game, most of them paid out.
+                winner = game.winner
+                paid = rng.random() < 0.9
+                watching = sorted(bettors - in_game)
+                for bettor in rng.sample(watching, min(len(watching), rng.randint(0, 2))):
+                    available = balance[bettor] - outstanding[bettor]
+                    if available <= 0:
+                        continue
+                    bet = rng.randint(1, max(1, available // 4))
+                    pick = rng.choice(game.players)[0]
+                    if paid:
+                        balance[bettor] += bet if pick == winner else -bet
+                    else:
+                        outstanding[bettor] += bet
+                        out.add("game_bet", game_id, bettor, pick, bet)
+
+                # Achievement counters and finish rules, like the listener and the checker.
+                lowest = min(points for _, _, points, _ in game.players)
+                for player_id, faction, points, _ in game.players:
+                    reached = unlocked[player_id]
+                    for key, value in (("games_played", 1), ("points_total", points), ("games_won", int(player_id == winner))):
+                        if key == "games_won" and not value:
+                            continue
+                        before = counters[key][player_id]
+                        counters[key][player_id] = after = before + value
+                        for id, target in rules.counters[key]:
+                            if before < target <= after:
+                                reached.setdefault(id, game.finish_time)
+
+                    matched: Set[str] = set(rules.play_as.get(faction, ()))
+                    for p, f, _, _ in game.players:
+                        if p == player_id:
+                            continue
+                        matched.update(rules.against.get(f, ()))
+                        if player_id == winner:
+                            matched.update(rules.win_against.get(f, ()))
+                        if points == lowest:
+                            matched.update(rules.lose_against.get(f, ()))
+                    if points not in by_points:
+                        by_points[points] = [id for id, op, target in rules.points if _compare(op, points, target)]
+                    matched.update(by_points[points])
+                    for id in matched:
+                        progress[player_id, id] += 1
+                        if progress[player_id, id] == rules.targets[id]:
+                            reached.setdefault(id, game.finish_time)
+
+            # Collector achievements count the unlocks before them, in unlock order.
+            for player_id, unlocks in unlocked.items():
+                times = sorted(unlocks.values())
+                for id, target in rules.counters["achievements_unlocked"]:
+                    if len(times) >= target:
+                        at = times[target - 1]
+                        unlocks[id] = at
+                        bisect.insort(times, at)
+                if unlocks:
+                    counters["achievements_unlocked"][player_id] = len(unlocks)
+                for id, at in unlocks.items():
+                    out.add("player_achievement", player_id, id, _time(at), "automation")
+            for key, values in counters.items():
+                for player_id, value in values.items():
+                    out.add("player_progress", player_id, key, value)
+            out.flush()
+
+            connection.exec_driver_sql(
+                "UPDATE match_player SET rating = ? WHERE player_id = ?", [(r, p) for p, r in rating.items()]
+            )
+            # Like the bot, only players who have played a game have a rating.
+            connection.exec_driver_sql(
+                "DELETE FROM match_player WHERE player_id NOT IN (SELECT player_id FROM outcome_ledger)"
+            )
+            connection.exec_driver_sql("UPDATE bettor SET balance = ? WHERE player_id = ?", [(v, b) for b, v in balance.items()])
+            out.counts["match_player"] = len(rating)
+        return out.counts
+    finally:
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--out", default="generated.db", help="Database file to create, must not exist")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Finish time of the last games, ISO date")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.out, args.players, args.games, args.seed, args.until)
+    for table, count in sorted(counts.items()):
+        print(f"{table:>20} {count:9}")
+    print(f"Wrote {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
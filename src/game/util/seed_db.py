@@ -1,11 +1,11 @@
 import csv
-import Levenshtein
 import time
 from datetime import datetime
 
 from .. import factions
+from ... import matching
 from .. import model
-from ... import models
+from ... import migrations
 from pathlib import Path
 from sqlalchemy import create_engine, select
 from sqlalchemy.orm import Session
@@ -17,13 +17,6 @@ fs = factions.read_factions()
 here = Path(__file__).parent
 
 
-def _closest_match(s: str, ss, cutoff=0.1) -> str | None:
-    best = max(ss, key=lambda c: Levenshtein.ratio(s, c))
-    if Levenshtein.ratio(s, best) <= cutoff:
-        return None
-    return best
-
-
 def main():
     names = [faction.name for faction in fs.factions]
     items = []
@@ -44,15 +37,16 @@ def main():
             game_name, player, faction, points = row
             unique_players.add(player)
             unique_games[game_name] = True
-            print(f"{game_name},{player},{_closest_match(faction, names)},{points}")
-            items.append((game_name, player, _closest_match(faction, names), points))
+            match = matching.closest(faction, names)
+            print(f"{game_name},{player},{match},{points}")
+            items.append((game_name, player, match, points))
         print(unique_players)
 
     name_to_game_id = {game: i + 1 for i, game in enumerate(unique_games)}
 
     engine = create_engine("sqlite:///app.db", echo=True)
-    # Instantiate all the tables.
-    models.Base.metadata.create_all(engine)
+    # Instantiate all the tables, or bring an existing database up to date.
+    migrations.Migrator(engine).migrate()
 
     with Session(engine) as session:
         for item in items:
@@ -85,6 +79,11 @@ def main():
             )
             session.commit()
 
+    # The games were written without their results, store them like a migration would.
+    with engine.begin() as connection:
+        while migrations.store_results(connection, 1000):
+            pass
+
 
 if __name__ == "__main__":
     main()
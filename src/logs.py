@@ -0,0 +1,116 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from .perf import metrics
+
+# Set by cogs whose commands act on a single game.
+game_id: ContextVar[Optional[int]] = ContextVar("game_id", default=None)
+
+FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+DATEFMT = "%Y-%m-%d %H:%M:%S"
+CONTEXT_FIELDS = ("command", "guild_id", "channel_id", "game_id")
+
+
+class ContextFilter(logging.Filter):
+    """Attach the command being invoked, its guild, channel and game to each record.
+
+    Must run on the thread that logs, since that is where the context lives.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        invocation = metrics.current.get()
+        record.command = invocation.command if invocation else None
+        record.guild_id = invocation.guild_id if invocation else None
+        record.channel_id = invocation.channel_id if invocation else None
+        record.game_id = game_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates when the file reaches max_bytes or every interval seconds, whichever is first."""
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        interval: float = 24 * 60 * 60,
+        backup_count: int = 7,
+    ) -> None:
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval and time.time() >= self.rollover_at:
+            # An empty file has nothing worth keeping.
+            return os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves the process, so skip the default copy and
+        # formatting and leave all of it to the listener thread.
+        return record
+
+
+def setup(
+    filename: str,
+    json_lines: bool = False,
+    level: int = logging.INFO,
+    max_bytes: int = 10 * 1024 * 1024,
+    interval: float = 24 * 60 * 60,
+    backup_count: int = 7,
+) -> logging.handlers.QueueListener:
+    """Log to a rotating file from a background thread.
+
+    Logging calls only put the record on a queue. The returned listener owns
+    the file and must be stopped on exit so queued records are flushed.
+    """
+    handler = SizeAndTimeRotatingFileHandler(filename, max_bytes, interval, backup_count)
+    handler.setFormatter(JsonFormatter() if json_lines else logging.Formatter(FORMAT, DATEFMT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,82 @@
+import functools
+
+from rapidfuzz import fuzz, process
+from typing import Callable, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from .typing import Err, Ok, Result
+
+T = TypeVar("T")
+
+
+def normalize(s: str) -> str:
+    """Case and whitespace insensitive form of s."""
+    return " ".join(s.casefold().split())
+
+
+class Matcher(Generic[T]):
+    """Closest match among a fixed set of candidates.
+
+    Candidate names are normalized once up front. Queries are scored against
+    all of them in one RapidFuzz call (fuzz.ratio, the same score as
+    Levenshtein.ratio but out of 100), and recent queries are cached.
+    """
+
+    def __init__(
+        self,
+        candidates: Iterable[T],
+        key: Callable[[T], str] = str,
+        cache_size: int = 256,
+    ) -> None:
+        self.candidates: List[T] = list(candidates)
+        self.choices: List[str] = [normalize(key(c)) for c in self.candidates]
+        self.__match = functools.lru_cache(maxsize=cache_size)(self.__uncached_match)
+
+    def __uncached_match(self, query: str, cutoff: float) -> Optional[Tuple[int, float]]:
+        if not self.choices:
+            return None
+        _, score, index = process.extractOne(
+            normalize(query), self.choices, scorer=fuzz.ratio, processor=None
+        )
+        # Like the old Levenshtein scans, a score at or below the cutoff is no match.
+        if score <= cutoff * 100:
+            return None
+        return index, score / 100
+
+    def match(self, query: str, cutoff: float = 0.1) -> Optional[T]:
+        """The best candidate for query, or None if it scores cutoff (0 to 1) or lower."""
+        found = self.__match(query, cutoff)
+        return self.candidates[found[0]] if found else None
+
+    def score(self, query: str) -> Optional[Tuple[T, float]]:
+        """The best candidate and its score from 0 to 1."""
+        found = self.__match(query, -1.0)
+        return (self.candidates[found[0]], found[1]) if found else None
+
+
+@functools.lru_cache(maxsize=128)
+def matcher(candidates: Tuple[str, ...]) -> Matcher[str]:
+    """Shared matcher for a set of strings, built once per distinct set."""
+    return Matcher(candidates)
+
+
+def closest(query: str, candidates: Iterable[str], cutoff: float = 0.1) -> Optional[str]:
+    """The candidate closest to query, or None if nothing scores above cutoff."""
+    return matcher(tuple(candidates)).match(query, cutoff)
+
+
+def find_name(query: str, names: Iterable[str], cutoff: float = 0.6) -> Result[str]:
+    """The one name query stands for, ignoring case and whitespace.
+
+    A close spelling is never taken for a name, it could be someone else's.
+    The error suggests the closest name scoring above cutoff instead.
+    """
+    names = list(names)
+    same = [n for n in names if normalize(n) == normalize(query)]
+    if len(same) == 1:
+        return Ok(same[0])
+    if same:
+        return Err("More than one player has that name, type it exactly")
+    suggestion = closest(query, names, cutoff)
+    if suggestion is None:
+        return Err("Can't find anyone with that name")
+    return Err(f"Can't find anyone with that name. Did you mean {suggestion}?")
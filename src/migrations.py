@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import time
+
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import Column, Connection, DateTime, Engine, Index, Integer, String, func, inspect, select, update
+from sqlalchemy.orm import Mapped, aliased, mapped_column
+from sqlalchemy.schema import CreateColumn
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from . import database, models
+# Every table has to be known before create_all and the index lookups below.
+from .achievements import model as achievements_model  # noqa: F401
+from .betting import model as betting_model  # noqa: F401
+from .game import model as game_model  # noqa: F401
+from .rating import model as rating_model  # noqa: F401
+
+T = TypeVar("T")
+
+# Name of the startup job finishing the migrations. Jobs that rely on a
+# migrated schema come after it.
+JOB = "migrations"
+
+
+class SchemaVersion(models.Base):
+    __tablename__ = "schema_version"
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String)
+    applied_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.current_timestamp()
+    )
+
+
+@dataclass
+class Migration:
+    """One versioned change to an existing database.
+
+    `schema` runs before the bot takes commands, in one short transaction, and
+    is for cheap changes like adding a column. The backfill then runs in
+    batches, each its own write, so commands are written in between. It gets
+    a batch size and returns how many rows it changed, and is called until
+    that is 0. `indexes` are built next, and recording the version is the
+    cutover.
+
+    Every step must be safe to repeat, the bot can stop halfway through.
+    """
+
+    version: int
+    name: str
+    schema: Optional[Callable[[Connection], None]] = None
+    backfill: Optional[Callable[[Connection, int], int]] = None
+    indexes: Sequence[Index] = ()
+
+
+def add_column(connection: Connection, column: Column) -> None:
+    """Add a model's column to its existing table, unless it is there already."""
+    table = column.table.name
+    if column.name in {c["name"] for c in inspect(connection).get_columns(table)}:
+        return
+    ddl = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {ddl}")
+
+
+def _indexes(*names: str) -> Tuple[Index, ...]:
+    indexes = {i.name: i for t in models.Base.metadata.sorted_tables for i in t.indexes}
+    return tuple(indexes[name] for name in names)
+
+
+def _result_columns(connection: Connection) -> None:
+    game, game_player = game_model.Game.__table__.c, game_model.GamePlayer.__table__.c
+    for column in (
+        game_player.finish_rank,
+        game_player.is_winner,
+        game_player.is_last,
+        game.winner_player_id,
+        game.player_count,
+    ):
+        add_column(connection, column)
+
+
+def store_results(connection: Connection, batch_size: int) -> int:
+    """Store the results of up to batch_size finished games that have none.
+
+    The same results as GameController.record_result, for games written
+    without it. Returns how many games were done.
+    """
+    Game, GamePlayer = game_model.Game, game_model.GamePlayer
+    ids = connection.scalars(
+        select(Game.game_id)
+        .where(Game.game_state == game_model.GameState.FINISHED, Game.player_count.is_(None))
+        .limit(batch_size)
+    ).all()
+    if not ids:
+        return 0
+
+    other = aliased(GamePlayer)
+    points = func.coalesce(GamePlayer.points, 0)
+    other_points = func.coalesce(other.points, 0)
+
+    def others(condition):
+        return select(func.count()).where(other.game_id == GamePlayer.game_id, condition).scalar_subquery()
+
+    connection.execute(
+        update(GamePlayer)
+        .where(GamePlayer.game_id.in_(ids))
+        .values(
+            finish_rank=1 + others(other_points > points),
+            is_winner=others(other_points > points) == 0,
+            is_last=others(other_points < points) == 0,
+        )
+    )
+    connection.execute(
+        update(Game)
+        .where(Game.game_id.in_(ids))
+        .values(
+            player_count=select(func.count()).where(GamePlayer.game_id == Game.game_id).scalar_subquery(),
+            winner_player_id=select(GamePlayer.player_id)
+            .where(GamePlayer.game_id == Game.game_id)
+            .order_by(points.desc(), func.coalesce(GamePlayer.turn_order, 0), GamePlayer.player_id)
+            .limit(1)
+            .scalar_subquery(),
+        )
+    )
+    return len(ids)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "Indexes for the hot queries",
+        indexes=_indexes(
+            "ix_player_name",
+            "ix_game_name",
+            "ix_game_state_finish_time",
+            "ix_game_player_player_faction",
+            "ix_winner_head_to_head_winner_loser",
+            "ix_winner_head_to_head_loser_winner",
+            "ix_game_bet_player_id",
+            "ix_player_achievement_achievement_id",
+        ),
+    ),
+    Migration(
+        2,
+        "Game results stored at finish",
+        schema=_result_columns,
+        backfill=store_results,
+        indexes=_indexes("ix_game_player_winner_player"),
+    ),
+]
+
+
+async def _now(fn: Callable[..., T], *args: Any) -> T:
+    return fn(*args)
+
+
+class Migrator:
+    """Brings a database up to the latest schema version.
+
+    `prepare` creates missing tables and applies the schema steps of pending
+    migrations, and is quick enough to run before the bot connects. `run`
+    does the backfills and index builds through the single writer. A new
+    database is created at the latest version and has nothing pending.
+    """
+
+    def __init__(
+        self, engine: Engine, migrations: Sequence[Migration] = MIGRATIONS, batch_size: int = 1000
+    ) -> None:
+        versions = [m.version for m in migrations]
+        if versions != sorted(set(versions)) or (versions and versions[0] < 1):
+            raise ValueError("Migration versions must be positive and increasing")
+        self.engine = engine
+        self.migrations = list(migrations)
+        self.batch_size = batch_size
+
+    @property
+    def latest(self) -> int:
+        return self.migrations[-1].version if self.migrations else 0
+
+    def version(self) -> int:
+        with self.engine.connect() as connection:
+            return connection.scalar(select(func.max(SchemaVersion.version))) or 0
+
+    def prepare(self) -> List[Migration]:
+        """Create missing tables and run pending schema steps. Returns the pending migrations."""
+        with self.engine.begin() as connection:
+            new = not inspect(connection).get_table_names()
+            models.Base.metadata.create_all(connection)
+            if new:
+                connection.execute(
+                    SchemaVersion.__table__.insert(),
+                    [{"version": m.version, "name": m.name} for m in self.migrations],
+                )
+                return []
+
+        current = self.version()
+        pending = [m for m in self.migrations if m.version > current]
+        for migration in pending:
+            if migration.schema is not None:
+                with self.engine.begin() as connection:
+                    migration.schema(connection)
+        return pending
+
+    async def run(
+        self, pending: Sequence[Migration], write: Callable[..., Awaitable[Any]]
+    ) -> None:
+        """Backfill, build indexes and record each pending migration, in order.
+
+        write is `Database.write`, or anything with its signature.
+        """
+        for migration in pending:
+            started = time.perf_counter()
+            rows = 0
+            if migration.backfill is not None:
+                while changed := await write(self.__backfill, migration):
+                    rows += changed
+            for index in migration.indexes:
+                await write(self.__build, index)
+            await write(self.__record, migration)
+            logging.info(
+                f"Migrated to version {migration.version} ({migration.name}), "
+                f"{rows} rows backfilled in {time.perf_counter() - started:.2f}s"
+            )
+
+    def migrate(self) -> None:
+        """Apply every pending migration right away, for tools that own the database."""
+        asyncio.run(self.run(self.prepare(), _now))
+
+    def __backfill(self, migration: Migration) -> int:
+        with database.session(self.engine) as session:
+            changed = migration.backfill(session.connection(), self.batch_size)
+            session.commit()
+        return changed
+
+    def __build(self, index: Index) -> None:
+        with database.session(self.engine) as session:
+            index.create(session.connection(), checkfirst=True)
+            session.commit()
+
+    def __record(self, migration: Migration) -> None:
+        with database.session(self.engine) as session:
+            session.merge(SchemaVersion(version=migration.version, name=migration.name))
+            session.commit()
@@ -0,0 +1,112 @@
+import discord
+import io
+import logging
+
+from discord.ext import commands
+from typing import Optional
+
+from ..game.executor import GameExecutor
+from .metrics import Metrics
+from .watchdog import Watchdog
+
+
+class Perf(commands.Cog):
+    """Cog containing performance related commands."""
+
+    def __init__(self, metrics: Metrics, watchdog: Watchdog, games: GameExecutor) -> None:
+        self.metrics = metrics
+        self.watchdog = watchdog
+        self.games = games
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        logging.info("Perf cog loaded")
+
+    def __table(self) -> str:
+        from tabulate import tabulate
+
+        rows = []
+        for name, s in self.metrics.slowest():
+            total = s["total"]
+            rows.append([
+                name,
+                s["count"],
+                f"{total['p50']:.0f}",
+                f"{total['p95']:.0f}",
+                f"{total['p99']:.0f}",
+                f"{s['db']['mean']:.0f}/{s['http']['mean']:.0f}/{s['python']['mean']:.0f}",
+                f"{s['queries']['mean']:.1f}",
+                s["n_plus_one"],
+            ])
+        if not rows:
+            return "No commands recorded yet."
+        table = tabulate(
+            rows,
+            headers=["Command", "N", "p50", "p95", "p99", "DB/HTTP/Py", "SQL", "N+1"],
+            tablefmt="simple",
+        )
+        return f"Slowest commands (ms)\n```\n{table}\n```"
+
+    @commands.command()
+    async def perf(self, ctx: commands.Context, output: Optional[str]) -> None:
+        """Admin command to show command latencies. Use `!perf json` for the full dump."""
+        if not ctx.author.guild_permissions.administrator:
+            await ctx.send("Admin only command")
+            return
+        if output == "json":
+            data = io.BytesIO(self.metrics.to_json().encode())
+            await ctx.send(file=discord.File(data, filename="perf.json"))
+            return
+        await ctx.send(self.__table())
+
+    @commands.command()
+    async def stalls(self, ctx: commands.Context, index: Optional[int]) -> None:
+        """Admin command to list recent event loop stalls. Use `!stalls <#>` for the blocking stack."""
+        if not ctx.author.guild_permissions.administrator:
+            await ctx.send("Admin only command")
+            return
+        stalls = self.watchdog.recent()
+        if not stalls:
+            await ctx.send("No stalls recorded.")
+            return
+        if index is None:
+            from tabulate import tabulate
+
+            table = tabulate(
+                [
+                    [i + 1, f"{s.time:%Y-%m-%d %H:%M:%S}", f"{s.duration * 1000:.0f}", s.command or "-"]
+                    for i, s in enumerate(stalls)
+                ],
+                headers=["#", "Time (UTC)", "ms", "Command"],
+                tablefmt="simple",
+            )
+            await ctx.send(f"```\n{table}\n```")
+            return
+        if not 1 <= index <= len(stalls):
+            await ctx.send(f"Pick a stall between 1 and {len(stalls)}.")
+            return
+        # Keep the innermost frames, which is where the loop was blocked.
+        stack = "".join(stalls[index - 1].stack) or "No stack captured."
+        await ctx.send(f"```\n{stack[-1900:]}\n```")
+
+    @commands.command()
+    async def queues(self, ctx: commands.Context) -> None:
+        """Admin command to show the games where commands wait the longest for each other."""
+        if not ctx.author.guild_permissions.administrator:
+            await ctx.send("Admin only command")
+            return
+        busiest = self.games.busiest()
+        if not busiest:
+            await ctx.send("No game commands recorded yet.")
+            return
+        from tabulate import tabulate
+
+        table = tabulate(
+            [
+                [f"<#{game_id}>", s["count"], s["depth"], s["max_depth"], f"{s['wait_p50']:.0f}", f"{s['wait_p95']:.0f}"]
+                for game_id, s in busiest
+            ],
+            headers=["Game", "N", "Depth", "Max", "Wait p50", "Wait p95"],
+            tablefmt="simple",
+        )
+        await ctx.send(f"Game queues (ms)\n```\n{table}\n```")
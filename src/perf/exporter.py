@@ -0,0 +1,189 @@
+import logging
+import os
+import resource
+
+from aiohttp import web
+from sqlalchemy import func, select
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .. import database as db
+from ..cache import ResponseCache
+from ..database import Database
+from ..game import model
+from ..game.executor import GameExecutor
+from . import queries
+from .metrics import PERCENTILES, Metrics
+from .watchdog import Watchdog
+
+# A collector returns lines in the Prometheus text exposition format.
+Collector = Callable[[], Awaitable[Iterable[str]]]
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _header(name: str, kind: str, help: str) -> List[str]:
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+
+
+def command_collector(metrics: Metrics) -> Collector:
+    async def collect() -> Iterable[str]:
+        lines = _header("ti4_command_invocations_total", "counter", "Commands invoked.")
+        for name, stats in metrics.commands.items():
+            lines.append(f'ti4_command_invocations_total{{command="{_label(name)}"}} {stats.count}')
+        lines += _header("ti4_command_errors_total", "counter", "Commands that raised.")
+        for name, stats in metrics.commands.items():
+            lines.append(f'ti4_command_errors_total{{command="{_label(name)}"}} {stats.errors}')
+        lines += _header("ti4_command_seconds_total", "counter", "Time spent in commands, by kind.")
+        for name, stats in metrics.commands.items():
+            for split, seconds in stats.seconds.items():
+                lines.append(
+                    f'ti4_command_seconds_total{{command="{_label(name)}",kind="{split}"}} {seconds}'
+                )
+        lines += _header(
+            "ti4_command_latency_seconds", "gauge", "Command latency percentiles over the recent window."
+        )
+        for name, stats in metrics.commands.items():
+            histogram = stats.histograms["total"]
+            for p in PERCENTILES:
+                lines.append(
+                    f'ti4_command_latency_seconds{{command="{_label(name)}",quantile="0.{p}"}} '
+                    f"{histogram.percentile(p)}"
+                )
+        lines += _header("ti4_command_statements_total", "counter", "SQL statements run by commands.")
+        for name, stats in metrics.commands.items():
+            lines.append(f'ti4_command_statements_total{{command="{_label(name)}"}} {stats.statements}')
+        return lines
+
+    return collect
+
+
+async def statement_collector() -> Iterable[str]:
+    totals = queries.totals
+    return [
+        *_header("ti4_db_statements_total", "counter", "SQL statements executed."),
+        f"ti4_db_statements_total {totals.count}",
+        *_header("ti4_db_statement_seconds_total", "counter", "Time spent executing SQL statements."),
+        f"ti4_db_statement_seconds_total {totals.time}",
+        *_header("ti4_db_slow_statements_total", "counter", "SQL statements over the slow query threshold."),
+        f"ti4_db_slow_statements_total {totals.slow}",
+    ]
+
+
+def loop_collector(watchdog: Watchdog) -> Collector:
+    async def collect() -> Iterable[str]:
+        lines = _header("ti4_event_loop_lag_seconds", "gauge", "Event loop scheduling lag over the recent window.")
+        for p in PERCENTILES:
+            lines.append(f'ti4_event_loop_lag_seconds{{quantile="0.{p}"}} {watchdog.lag.percentile(p)}')
+        lines += _header("ti4_event_loop_stalls_total", "counter", "Times the event loop was blocked.")
+        lines.append(f"ti4_event_loop_stalls_total {watchdog.stall_count}")
+        return lines
+
+    return collect
+
+
+def game_queue_collector(games: GameExecutor) -> Collector:
+    async def collect() -> Iterable[str]:
+        lines = _header("ti4_game_queue_depth", "gauge", "Commands running or waiting per game.")
+        for game_id, queue in games.games.items():
+            lines.append(f'ti4_game_queue_depth{{game="{game_id}"}} {queue.depth}')
+        lines += _header("ti4_game_queue_wait_seconds", "gauge", "Wait for the game's previous commands over the recent window.")
+        for game_id, queue in games.games.items():
+            for p in PERCENTILES:
+                lines.append(
+                    f'ti4_game_queue_wait_seconds{{game="{game_id}",quantile="0.{p}"}} {queue.wait.percentile(p)}'
+                )
+        return lines
+
+    return collect
+
+
+def cache_collector(cache: ResponseCache) -> Collector:
+    async def collect() -> Iterable[str]:
+        lines = _header("ti4_cache_hits_total", "counter", "Command responses served from the cache.")
+        for command, hits in cache.hits.items():
+            lines.append(f'ti4_cache_hits_total{{command="{_label(str(command))}"}} {hits}')
+        lines += _header("ti4_cache_misses_total", "counter", "Command responses computed and cached.")
+        for command, misses in cache.misses.items():
+            lines.append(f'ti4_cache_misses_total{{command="{_label(str(command))}"}} {misses}')
+        lines += _header("ti4_cache_entries", "gauge", "Responses in the cache.")
+        lines.append(f"ti4_cache_entries {len(cache.entries)}")
+        lines += _header("ti4_cache_evictions_total", "counter", "Responses evicted to stay within the size limit.")
+        lines.append(f"ti4_cache_evictions_total {cache.evictions}")
+        lines += _header("ti4_cache_invalidations_total", "counter", "Responses dropped because their data changed.")
+        lines.append(f"ti4_cache_invalidations_total {cache.invalidations}")
+        return lines
+
+    return collect
+
+
+def games_collector(database: Database) -> Collector:
+    def count_games() -> Dict[model.GameState, int]:
+        with db.session(database.read_engine) as session:
+            rows = session.execute(
+                select(model.Game.game_state, func.count()).group_by(model.Game.game_state)
+            ).all()
+            return {state: count for state, count in rows}
+
+    async def collect() -> Iterable[str]:
+        counts = await database.run(count_games)
+        lines = _header("ti4_games", "gauge", "Games by state.")
+        for state in model.GameState:
+            lines.append(f'ti4_games{{state="{state.name}"}} {counts.get(state, 0)}')
+        return lines
+
+    return collect
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs, fall back to the peak RSS (kilobytes on Linux).
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def process_collector() -> Iterable[str]:
+    return [
+        *_header("ti4_process_resident_memory_bytes", "gauge", "Resident set size."),
+        f"ti4_process_resident_memory_bytes {_rss_bytes()}",
+    ]
+
+
+class MetricsServer:
+    """Serves the collectors on /metrics in the Prometheus text format."""
+
+    def __init__(self, collectors: List[Collector], host: str = "127.0.0.1", port: int = 9090) -> None:
+        self.collectors = collectors
+        self.host = host
+        self.port = port
+        self.runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        lines: List[str] = []
+        for collect in self.collectors:
+            try:
+                lines.extend(await collect())
+            except Exception:
+                logging.exception("Metrics collector failed")
+        return web.Response(
+            text="\n".join(lines) + "\n",
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        # Resolve the actual port when started on port 0.
+        self.port = self.runner.addresses[0][1]
+        logging.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
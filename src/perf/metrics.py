@@ -0,0 +1,197 @@
+import json
+import logging
+import math
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from discord.ext import commands
+
+from . import queries
+from .queries import QueryLog
+
+PERCENTILES = (50, 95, 99)
+SPLITS = ("total", "db", "http", "python")
+
+
+@dataclass
+class Invocation:
+    """Timings of the command currently being invoked, in seconds."""
+
+    command: str
+    guild_id: Optional[int]
+    channel_id: Optional[int]
+    started: float = field(default_factory=time.perf_counter)
+    db: float = 0.0
+    http: float = 0.0
+    queries: QueryLog = field(default_factory=QueryLog)
+
+
+current: ContextVar[Optional[Invocation]] = ContextVar("invocation", default=None)
+
+# The command the event loop ran last, set on the loop when a command starts
+# or resumes, for threads that must not call asyncio to find out.
+running: Optional[str] = None
+
+
+def resumed(invocation: Optional[Invocation]) -> None:
+    """Publish that the loop is running invocation's command."""
+    global running
+    running = invocation.command if invocation else None
+
+
+@contextmanager
+def timed(kind: str) -> Iterator[None]:
+    """Charge the time spent in the block to `kind` ("db" or "http") of the current invocation."""
+    invocation = current.get()
+    if invocation is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(invocation, kind, getattr(invocation, kind) + time.perf_counter() - started)
+        # Back on the loop after awaiting the call.
+        resumed(invocation)
+
+
+def instrument_http(http: Any) -> None:
+    """Time every Discord API request made through http."""
+    request = http.request
+
+    async def timed_request(*args: Any, **kwargs: Any) -> Any:
+        with timed("http"):
+            return await request(*args, **kwargs)
+
+    http.request = timed_request
+
+
+class Histogram:
+    """Rolling window of the last `size` samples."""
+
+    def __init__(self, size: int) -> None:
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        # Nearest rank.
+        rank = max(math.ceil(p / 100 * len(ordered)), 1)
+        return ordered[rank - 1]
+
+    def mean(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(self.samples) / len(self.samples)
+
+    def summary(self) -> Dict[str, float]:
+        """Mean and percentiles in milliseconds."""
+        summary = {"mean": self.mean() * 1000}
+        for p in PERCENTILES:
+            summary[f"p{p}"] = self.percentile(p) * 1000
+        return summary
+
+
+class CommandStats:
+    def __init__(self, size: int) -> None:
+        self.count = 0
+        self.errors = 0
+        self.n_plus_one = 0
+        self.histograms = {split: Histogram(size) for split in SPLITS}
+        self.queries: Deque[int] = deque(maxlen=size)
+        # Cumulative totals since startup, for exporting as counters.
+        self.seconds = {split: 0.0 for split in SPLITS}
+        self.statements = 0
+
+    def add(self, invocation: Invocation, total: float, failed: bool, n_plus_one: bool) -> None:
+        self.count += 1
+        if failed:
+            self.errors += 1
+        if n_plus_one:
+            self.n_plus_one += 1
+        self.queries.append(invocation.queries.count)
+        self.statements += invocation.queries.count
+        # DB and HTTP calls can overlap when a command gathers them.
+        python = max(total - invocation.db - invocation.http, 0.0)
+        for split, value in zip(SPLITS, (total, invocation.db, invocation.http, python)):
+            self.histograms[split].add(value)
+            self.seconds[split] += value
+
+    def summary(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            "count": self.count,
+            "errors": self.errors,
+            "n_plus_one": self.n_plus_one,
+            "queries": {
+                "mean": sum(self.queries) / len(self.queries) if self.queries else 0.0,
+                "max": max(self.queries, default=0),
+            },
+        }
+        for split, histogram in self.histograms.items():
+            summary[split] = histogram.summary()
+        return summary
+
+
+class Metrics:
+    """Per-command latency histograms, split into DB, Discord HTTP and Python time.
+
+    Also counts the SQL statements of every invocation and logs a warning when
+    the same statement shape runs more than `repeat_threshold` times.
+    """
+
+    def __init__(self, window: int = 1024, repeat_threshold: int = 5) -> None:
+        self.window = window
+        self.repeat_threshold = repeat_threshold
+        self.commands: Dict[str, CommandStats] = {}
+
+    async def before_invoke(self, ctx: commands.Context) -> None:
+        invocation = Invocation(
+            command=ctx.command.qualified_name if ctx.command else "unknown",
+            guild_id=ctx.guild.id if ctx.guild else None,
+            channel_id=ctx.channel.id if ctx.channel else None,
+        )
+        current.set(invocation)
+        queries.current.set(invocation.queries)
+        resumed(invocation)
+
+    async def after_invoke(self, ctx: commands.Context) -> None:
+        invocation = current.get()
+        if invocation is None:
+            return
+        current.set(None)
+        queries.current.set(None)
+        resumed(None)
+        self.record(invocation, time.perf_counter() - invocation.started, ctx.command_failed)
+
+    def record(self, invocation: Invocation, total: float, failed: bool = False) -> None:
+        repeated = invocation.queries.repeated(self.repeat_threshold)
+        for statement, n in repeated:
+            logging.warning(f"Possible N+1 in !{invocation.command}: {n} x {statement}")
+        stats = self.commands.get(invocation.command)
+        if stats is None:
+            stats = self.commands[invocation.command] = CommandStats(self.window)
+        stats.add(invocation, total, failed, bool(repeated))
+
+    def slowest(self, n: int = 10, percentile: int = 95) -> List[Tuple[str, Dict[str, Any]]]:
+        """The n commands with the highest total latency at the given percentile."""
+        summaries = [(name, stats.summary()) for name, stats in self.commands.items()]
+        summaries.sort(key=lambda s: s[1]["total"][f"p{percentile}"], reverse=True)
+        return summaries[:n]
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            "window": self.window,
+            "commands": {name: stats.summary() for name, stats in sorted(self.commands.items())},
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.dump(), indent=2)
@@ -0,0 +1,140 @@
+import logging
+import re
+import threading
+import time
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import Engine, event
+from typing import Any, Iterator, List, Optional, Tuple
+
+# Statements slower than this are written to the slow query log.
+SLOW_QUERY_SECONDS = 0.1
+
+slow_log = logging.getLogger("sql.slow")
+
+_whitespace = re.compile(r"\s+")
+# Expanded IN lists have one placeholder per value.
+_placeholders = re.compile(r"\?(?:\s*,\s*\?)+")
+# Full table scans in EXPLAIN QUERY PLAN output, older SQLite says SCAN TABLE.
+_scan = re.compile(r"SCAN (?:TABLE )?(?!CONSTANT ROW)(\w+)")
+# Scans that walk an index in order instead of the table.
+_index = re.compile(r"USING (?:COVERING )?INDEX")
+
+
+def shape(statement: str) -> str:
+    """Normalize a statement so that executions differing only in parameters compare equal."""
+    return _placeholders.sub("?...", _whitespace.sub(" ", statement).strip())
+
+
+def scans(connection: Any, statement: str) -> List[str]:
+    """Tables the statement reads in full, per SQLite's EXPLAIN QUERY PLAN.
+
+    connection is a DB-API connection. Parameters are bound to NULL, which
+    doesn't change the plan without ANALYZE statistics. Scans through an
+    index, and of CTEs and subqueries the statement materialized itself, are
+    left out.
+    """
+    plan = connection.execute(
+        f"EXPLAIN QUERY PLAN {statement}", [None] * statement.count("?")
+    ).fetchall()
+    tables = {name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    rows = [row[-1] for row in plan if not _index.search(row[-1])]
+    return [m.group(1) for m in (_scan.match(row) for row in rows) if m and m.group(1) in tables]
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> str:
+    """Types of the bound parameters, never their values."""
+    if executemany:
+        rows = list(parameters)
+        return f"{len(rows)} x {parameter_shape(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in parameters or ()) + ")"
+
+
+@dataclass
+class QueryLog:
+    """Statements executed within one command invocation or tracked block."""
+
+    count: int = 0
+    time: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+    statements: List[str] = field(default_factory=list)
+
+    def add(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.time += elapsed
+        self.shapes[shape(statement)] += 1
+        self.statements.append(statement)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes executed more than threshold times, a sign of N+1 queries."""
+        return [(s, n) for s, n in self.shapes.most_common() if n > threshold]
+
+
+current: ContextVar[Optional[QueryLog]] = ContextVar("queries", default=None)
+
+
+class Totals:
+    """Statements executed by the whole process since startup."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.count = 0
+        self.time = 0.0
+        self.slow = 0
+
+    def add(self, elapsed: float, slow: bool) -> None:
+        with self.lock:
+            self.count += 1
+            self.time += elapsed
+            self.slow += slow
+
+
+totals = Totals()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    log = current.get()
+    if log is not None:
+        log.add(statement, elapsed)
+    slow = elapsed >= SLOW_QUERY_SECONDS
+    totals.add(elapsed, slow)
+    if slow:
+        slow_log.warning(
+            "%.0f ms: %s %s",
+            elapsed * 1000,
+            shape(statement),
+            parameter_shape(parameters, executemany),
+        )
+
+
+@contextmanager
+def track() -> Iterator[QueryLog]:
+    """Collect the statements executed in the block, including on database worker threads."""
+    log = QueryLog()
+    token = current.set(log)
+    try:
+        yield log
+    finally:
+        current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(n: int) -> Iterator[QueryLog]:
+    """Test helper failing when the block executes more than n statements."""
+    with track() as log:
+        yield log
+    if log.count > n:
+        listing = "\n".join(f"  {s}" for s in log.statements)
+        raise AssertionError(f"Expected at most {n} queries, got {log.count}:\n{listing}")
@@ -0,0 +1,151 @@
+import gzip
+import json
+import logging
+import queue
+import threading
+import time
+
+from dataclasses import asdict, dataclass, field, fields
+from discord.ext import commands
+from typing import Any, IO, Iterator, List, Optional
+
+
+@dataclass
+class Record:
+    """One invoked command, or a channel the bot saw being created."""
+
+    kind: str  # "command" or "channel"
+    time: float  # Unix time
+    channel_id: int
+    guild_id: Optional[int] = None
+    message_id: int = 0
+    command: str = ""
+    # The whole message, which is the command and its arguments.
+    content: str = ""
+    author_id: int = 0
+    author_name: str = ""
+    admin: bool = False
+    seconds: float = 0.0
+    failed: bool = False
+    replies: List[str] = field(default_factory=list)
+    name: str = ""  # Channel name
+
+    def to_json(self) -> str:
+        # Leave out defaults to keep the file small.
+        defaults = Record(kind="", time=0, channel_id=0)
+        data = {k: v for k, v in asdict(self).items() if k in ("kind", "time", "channel_id") or v != getattr(defaults, k)}
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line: str) -> "Record":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in json.loads(line).items() if k in names})
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read(path: str) -> Iterator[Record]:
+    """The records of a recording, oldest first. Plain or gzipped JSON lines."""
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield Record.from_json(line)
+
+
+def describe(content: Optional[str] = None, embed: Any = None, embeds: Any = None, **kwargs: Any) -> str:
+    """Text of a reply, including its embeds, for comparing replies."""
+    parts = [content] if content else []
+    for e in ([embed] if embed else []) + list(embeds or []):
+        parts.extend(filter(None, [e.title, e.description]))
+        parts.extend(f"{f.name}: {f.value}" for f in e.fields)
+    return "\n".join(str(p) for p in parts)
+
+
+class RecordingContext(commands.Context):
+    """Keeps the text of every reply sent through the context."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.replies: List[str] = []
+        self.started = time.perf_counter()
+        self.time = time.time()
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> Any:
+        self.replies.append(describe(content, **kwargs))
+        return await super().send(content, **kwargs)
+
+
+class Recorder:
+    """Writes every invoked command to a JSON lines file, gzipped if it ends in .gz.
+
+    Opt in by passing `record_to` to the bot. Replies are captured through
+    RecordingContext, so only what goes through `ctx.send` is kept. Channels
+    the bot creates are recorded too, so a replay can map their ids.
+
+    Records are only put on a queue on the event loop. A background thread
+    owns the file and writes them, `close` flushes what is queued.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = _open(path, "a")
+        self.queue: queue.SimpleQueue[Optional[Record]] = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.__run, name="command-recorder", daemon=True)
+        self.thread.start()
+
+    def write(self, record: Record) -> None:
+        self.queue.put(record)
+
+    def __run(self) -> None:
+        while (record := self.queue.get()) is not None:
+            try:
+                self.file.write(record.to_json() + "\n")
+                # Flushed once the queue is drained, not after every record.
+                if self.queue.empty():
+                    self.file.flush()
+            except Exception:
+                logging.exception("Failed to record command")
+
+    def __record(self, ctx: commands.Context, failed: bool) -> None:
+        if ctx.command is None or not isinstance(ctx, RecordingContext):
+            return
+        permissions = getattr(ctx.author, "guild_permissions", None)
+        self.write(Record(
+            kind="command",
+            time=ctx.time,
+            channel_id=ctx.channel.id,
+            guild_id=ctx.guild.id if ctx.guild else None,
+            message_id=ctx.message.id,
+            command=ctx.command.qualified_name,
+            content=ctx.message.content,
+            author_id=ctx.author.id,
+            author_name=ctx.author.name,
+            admin=bool(permissions and permissions.administrator),
+            seconds=time.perf_counter() - ctx.started,
+            failed=failed,
+            replies=list(ctx.replies),
+        ))
+
+    async def on_command_completion(self, ctx: commands.Context) -> None:
+        self.__record(ctx, failed=False)
+
+    async def on_command_error(self, ctx: commands.Context, error: Exception) -> None:
+        self.__record(ctx, failed=True)
+
+    async def on_guild_channel_create(self, channel: Any) -> None:
+        self.write(Record(
+            kind="channel",
+            time=time.time(),
+            channel_id=channel.id,
+            guild_id=channel.guild.id,
+            name=channel.name,
+        ))
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
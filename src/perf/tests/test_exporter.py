@@ -0,0 +1,79 @@
+import aiohttp
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.cache import ResponseCache
+from src.database import Database
+from src.game import model
+from src.models import Base
+from src.perf import exporter
+from src.perf.metrics import Invocation, Metrics
+from src.perf.watchdog import Watchdog
+
+
+@pytest_asyncio.fixture
+async def server(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(model.Game(game_id=1, game_state=model.GameState.LOBBY, name="Lobby"))
+        session.add(model.Game(game_id=2, game_state=model.GameState.FINISHED, name="Done"))
+        session.add(model.Game(game_id=3, game_state=model.GameState.FINISHED, name="Done too"))
+        session.commit()
+    database = Database(engine)
+
+    metrics = Metrics()
+    metrics.record(Invocation(command="draft", guild_id=None, channel_id=None, db=0.1), total=0.25)
+    responses = ResponseCache()
+    responses.hits["wins"] += 3
+    responses.misses["wins"] += 1
+    server = exporter.MetricsServer(
+        [
+            exporter.command_collector(metrics),
+            exporter.statement_collector,
+            exporter.loop_collector(Watchdog()),
+            exporter.cache_collector(responses),
+            exporter.games_collector(database),
+            exporter.process_collector,
+        ],
+        port=0,
+    )
+    await server.start()
+    yield server
+    await server.stop()
+    database.close()
+
+
+async def scrape(server: exporter.MetricsServer) -> str:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"http://127.0.0.1:{server.port}/metrics") as response:
+            assert response.status == 200
+            assert response.content_type == "text/plain"
+            return await response.text()
+
+
+@pytest.mark.asyncio
+async def test_scrape(server):
+    text = await scrape(server)
+    assert 'ti4_command_invocations_total{command="draft"} 1' in text
+    assert 'ti4_command_seconds_total{command="draft",kind="db"} 0.1' in text
+    assert 'ti4_command_latency_seconds{command="draft",quantile="0.99"} 0.25' in text
+    assert 'ti4_games{state="FINISHED"} 2' in text
+    assert 'ti4_games{state="DRAFT"} 0' in text
+    assert "ti4_db_statements_total " in text
+    assert 'ti4_cache_hits_total{command="wins"} 3' in text
+    assert 'ti4_cache_misses_total{command="wins"} 1' in text
+    assert 'ti4_event_loop_lag_seconds{quantile="0.50"}' in text
+    rss = next(l for l in text.splitlines() if l.startswith("ti4_process_resident_memory_bytes "))
+    assert int(rss.split()[1]) > 0
+
+
+@pytest.mark.asyncio
+async def test_failing_collector_does_not_break_the_scrape(server):
+    async def broken():
+        raise RuntimeError("boom")
+
+    server.collectors.insert(0, broken)
+    assert "ti4_games" in await scrape(server)
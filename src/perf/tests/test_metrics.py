@@ -0,0 +1,75 @@
+import json
+
+from src.perf.metrics import Histogram, Invocation, Metrics, current, timed
+
+
+def test_histogram_percentiles():
+    histogram = Histogram(size=100)
+    for i in range(1, 101):
+        histogram.add(i / 1000)
+
+    summary = histogram.summary()
+    assert summary["p50"] == 50
+    assert summary["p95"] == 95
+    assert summary["p99"] == 99
+
+
+def test_histogram_keeps_a_rolling_window():
+    histogram = Histogram(size=10)
+    for _ in range(10):
+        histogram.add(1.0)
+    for _ in range(10):
+        histogram.add(0.001)
+
+    assert histogram.percentile(99) == 0.001
+
+
+def test_timed_charges_the_current_invocation():
+    invocation = Invocation(command="draft", guild_id=1, channel_id=2)
+    token = current.set(invocation)
+    try:
+        with timed("db"):
+            pass
+        with timed("http"):
+            pass
+    finally:
+        current.reset(token)
+
+    assert invocation.db > 0
+    assert invocation.http > 0
+
+
+def test_timed_without_invocation_is_a_no_op():
+    with timed("db"):
+        pass
+
+
+def test_record_splits_time():
+    metrics = Metrics()
+    invocation = Invocation(command="draft", guild_id=1, channel_id=2, db=0.2, http=0.3)
+    metrics.record(invocation, total=1.0)
+
+    summary = metrics.dump()["commands"]["draft"]
+    assert summary["count"] == 1
+    assert summary["total"]["p50"] == 1000
+    assert summary["db"]["p50"] == 200
+    assert summary["http"]["p50"] == 300
+    assert summary["python"]["p50"] == 500
+
+
+def test_slowest_orders_by_percentile():
+    metrics = Metrics()
+    metrics.record(Invocation(command="hello", guild_id=None, channel_id=None), total=0.01)
+    metrics.record(Invocation(command="draft", guild_id=None, channel_id=None), total=2.0)
+    metrics.record(Invocation(command="games", guild_id=None, channel_id=None), total=0.5)
+
+    assert [name for name, _ in metrics.slowest()] == ["draft", "games", "hello"]
+    assert [name for name, _ in metrics.slowest(n=1)] == ["draft"]
+
+
+def test_dump_is_json():
+    metrics = Metrics()
+    metrics.record(Invocation(command="hello", guild_id=None, channel_id=None), total=0.01, failed=True)
+
+    data = json.loads(metrics.to_json())
+    assert data["commands"]["hello"]["errors"] == 1
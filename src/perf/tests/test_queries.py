@@ -0,0 +1,104 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session
+
+from src.game import gamelogic, model
+from src.models import Base
+from src.perf import queries
+from src.perf.metrics import Invocation, Metrics
+from src.perf.queries import assert_max_queries, parameter_shape, scans, shape, track
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        for game_id in (1, 2, 3):
+            session.add(model.Game(game_id=game_id, game_state="LOBBY", name=f"Lobby{game_id}"))
+        session.commit()
+    return engine
+
+
+def lazy_lobbies(engine) -> None:
+    """Walks the players of each lobby through lazy loads, an N+1."""
+    with Session(engine) as session:
+        for game in session.scalars(select(model.Game)):
+            len(game.game_players)
+
+
+def test_shape_ignores_whitespace_and_in_list_length():
+    assert shape("SELECT *\n  FROM game WHERE id IN (?, ?, ?)") == "SELECT * FROM game WHERE id IN (?...)"
+    assert shape("SELECT 1 WHERE a IN (?, ?)") == shape("SELECT 1  WHERE a IN (?,?,?)")
+
+
+def test_parameter_shape_hides_values():
+    assert parameter_shape((1, "secret")) == "(int, str)"
+    assert parameter_shape({"id": 1}) == "{id: int}"
+    assert parameter_shape([(1,), (2,)], executemany=True) == "2 x (int)"
+
+
+def test_scans_lists_tables_read_in_full(engine):
+    connection = engine.raw_connection()
+    try:
+        assert scans(connection, "SELECT * FROM game WHERE game.game_id = ?") == []
+        assert scans(connection, "SELECT * FROM player WHERE player.name = ?") == []
+        assert scans(connection, "SELECT * FROM game_player WHERE game_player.points > ?") == ["game_player"]
+        # Index only plans walk the index, not the table.
+        assert scans(connection, "SELECT name FROM player ORDER BY name") == []
+    finally:
+        connection.close()
+
+
+def test_repeated_finds_lazy_loads_per_row(engine):
+    with track() as log:
+        lazy_lobbies(engine)
+
+    # One query for the lobbies, then one per lobby for its players.
+    assert log.count == 4
+    assert log.repeated(threshold=2)[0][1] == 3
+
+
+def test_lobbies_load_players_up_front(engine):
+    logic = gamelogic.GameLogic(bot=None, engine=engine)
+    with track() as log:
+        logic.lobbies()
+    assert log.count == 2
+    assert log.repeated(threshold=2) == []
+
+
+def test_assert_max_queries(engine):
+    with assert_max_queries(4):
+        lazy_lobbies(engine)
+    with pytest.raises(AssertionError, match="at most 1 queries, got 4"):
+        with assert_max_queries(1):
+            lazy_lobbies(engine)
+
+
+def test_metrics_flag_repeated_statements(engine, caplog):
+    metrics = Metrics(repeat_threshold=2)
+    invocation = Invocation(command="lobbies", guild_id=None, channel_id=None)
+    token = queries.current.set(invocation.queries)
+    try:
+        lazy_lobbies(engine)
+    finally:
+        queries.current.reset(token)
+
+    with caplog.at_level(logging.WARNING):
+        metrics.record(invocation, total=0.1)
+
+    assert "Possible N+1 in !lobbies" in caplog.text
+    summary = metrics.dump()["commands"]["lobbies"]
+    assert summary["n_plus_one"] == 1
+    assert summary["queries"]["max"] == 4
+
+
+def test_slow_queries_are_logged(engine, caplog, monkeypatch):
+    monkeypatch.setattr(queries, "SLOW_QUERY_SECONDS", 0)
+    with caplog.at_level(logging.WARNING, logger="sql.slow"):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT :a"), {"a": 1})
+
+    assert "SELECT ? (int)" in caplog.text
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+
+from src.perf import metrics
+from src.perf.metrics import Invocation
+from src.perf.watchdog import Watchdog
+
+
+def block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_stall_captures_command_and_stack():
+    watchdog = Watchdog(threshold=0.1, interval=0.02)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.05)
+        metrics.resumed(Invocation(command="draft", guild_id=None, channel_id=None))
+        block_the_loop(0.4)
+        await asyncio.sleep(0.1)
+    finally:
+        metrics.resumed(None)
+        watchdog.stop()
+
+    [stall] = watchdog.recent()
+    assert stall.duration >= 0.3
+    assert stall.command == "draft"
+    assert any("block_the_loop" in frame for frame in stall.stack)
+
+
+@pytest.mark.asyncio
+async def test_no_stall_when_loop_is_responsive():
+    watchdog = Watchdog(threshold=0.1, interval=0.02)
+    watchdog.start()
+    try:
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+    finally:
+        watchdog.stop()
+
+    assert watchdog.recent() == []
+    assert watchdog.lag.samples
+
+
+def test_ring_buffer_is_bounded():
+    watchdog = Watchdog(size=3)
+    for i in range(5):
+        watchdog._Watchdog__finish_stall(float(i))
+
+    assert [s.duration for s in watchdog.recent()] == [4.0, 3.0, 2.0]
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+
+from . import metrics
+from .metrics import Histogram
+
+
+@dataclass
+class Stall:
+    """The event loop was blocked for `duration` seconds."""
+
+    time: datetime
+    duration: float
+    command: Optional[str]
+    stack: List[str]
+
+
+class Watchdog:
+    """Detects event loop stalls and captures what was blocking it.
+
+    A heartbeat task on the loop measures how late it is woken up. A separate
+    thread notices when the heartbeat has not run for `threshold` seconds and
+    takes the loop thread's stack while it is still blocked, together with the
+    command the loop published as running.
+    """
+
+    def __init__(self, threshold: float = 0.5, interval: float = 0.1, size: int = 50) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: Deque[Stall] = deque(maxlen=size)
+        self.stall_count = 0
+        self.lag = Histogram(size=1024)
+        self.lock = threading.Lock()
+        self.pending: Optional[Stall] = None
+        self.last_beat = time.monotonic()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.heartbeat: Optional[asyncio.Task] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+
+    def start(self) -> None:
+        """Start watching the running event loop."""
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopping.clear()
+        self.heartbeat = self.loop.create_task(self.__heartbeat())
+        self.thread = threading.Thread(target=self.__watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self.heartbeat is not None:
+            self.heartbeat.cancel()
+        if self.thread is not None:
+            self.thread.join()
+
+    def recent(self, n: int = 10) -> List[Stall]:
+        """The n most recent stalls, newest first."""
+        return list(reversed(self.stalls))[:n]
+
+    async def __heartbeat(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - before - self.interval, 0.0)
+            self.last_beat = now
+            self.lag.add(lag)
+            if lag >= self.threshold:
+                self.__finish_stall(lag)
+            else:
+                with self.lock:
+                    self.pending = None
+
+    def __finish_stall(self, lag: float) -> None:
+        with self.lock:
+            stall, self.pending = self.pending, None
+        if stall is None:
+            # The loop got going again before the watchdog had a look.
+            stall = Stall(datetime.now(timezone.utc), lag, None, [])
+        stall.duration = lag
+        self.stalls.append(stall)
+        self.stall_count += 1
+        logging.warning(
+            f"Event loop blocked for {lag * 1000:.0f} ms"
+            + (f" in !{stall.command}" if stall.command else "")
+            + ("\n" + "".join(stall.stack) if stall.stack else "")
+        )
+
+    def __capture(self) -> Stall:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack = traceback.format_stack(frame) if frame else []
+        return Stall(datetime.now(timezone.utc), 0.0, metrics.running, stack)
+
+    def __watch(self) -> None:
+        while not self.stopping.wait(self.interval):
+            if time.monotonic() - self.last_beat < self.threshold + self.interval:
+                continue
+            with self.lock:
+                if self.pending is None:
+                    self.pending = self.__capture()
@@ -3,16 +3,32 @@ import logging
 from . import ratinglogic
 
 from discord.ext import commands
-from sqlalchemy import Engine
 
+from .. import cache
+from .. import migrations
+from ..database import Database
+from ..startup import Startup
 from ..typing import *
 from typing import Optional
 
 class Rating(commands.Cog):
     """Cog containing rating related commands."""
 
-    def __init__(self, engine: Engine) -> None:
-        self.logic = ratinglogic.RatingLogic(engine)
+    def __init__(self, database: Database, startup: Startup, response_cache: cache.ResponseCache) -> None:
+        self.database = database
+        self.startup = startup
+        self.cache = response_cache
+        self.logic = ratinglogic.RatingLogic(database.engine, database.read_engine)
+        # Wins are counted from the game results the migrations store.
+        startup.add("ratings", self.__refresh_ratings, after=(migrations.JOB,))
+
+    async def __refresh_ratings(self) -> None:
+        # One write per game, in order, so commands can write in between.
+        for game_id in await self.database.run(self.logic.unrated_games):
+            await self.database.write(self.logic.update_rating, None, game_id)
+
+    async def cog_check(self, ctx: commands.Context) -> bool:
+        return self.startup.require("ratings")
 
     @commands.Cog.listener()
     async def on_ready(self) -> None:
@@ -23,12 +39,19 @@ class Rating(commands.Cog):
         """Returns stats for you."""
         id = ctx.author.id
         if name:
-            id = self.logic.player_id_from_name(name)
-            if not id:
-                await ctx.send("Can't find anyone with that name")
+            found = await self.database.run(self.logic.player_id_from_name, name)
+            if isinstance(found, Err):
+                await ctx.send(found.msg)
                 return
+            id = found.value
 
-        match self.logic.stats(id):
+        profile = await self.cache.get(
+            ("stats", id),
+            lambda: self.database.run(self.logic.stats, id),
+            tags=(cache.FINISH, cache.RATINGS, (cache.PROFILE, id)),
+            store=lambda r: isinstance(r, Ok),
+        )
+        match profile:
             case Ok(s):
                 await ctx.send(embed=s.card_view())
             case Err(s):
@@ -37,22 +60,32 @@ class Rating(commands.Cog):
     @commands.command()
     async def wins(self, ctx: commands.Context) -> None:
         """Returns wins leaderboard."""
-        await ctx.send(self.logic.wins())
+        await ctx.send(
+            await self.cache.get(("wins",), lambda: self.database.run(self.logic.wins), tags=(cache.FINISH,))
+        )
 
     @commands.command()
     async def leaderboard(self, ctx: commands.Context) -> None:
         """Returns ratings leaderboard."""
-        await ctx.send(self.logic.ratings())
+        await ctx.send(
+            await self.cache.get(
+                ("leaderboard",),
+                lambda: self.database.run(self.logic.ratings),
+                tags=(cache.FINISH, cache.RATINGS, cache.PROFILE),
+            )
+        )
 
     @commands.command()
     async def picture(self, ctx: commands.Context, *, url: str) -> None:
         """Set a profile picture using an https url."""
-        await ctx.send(self.logic.set_pic(ctx.author.id, url))
+        await ctx.send(await self.database.write(self.logic.set_pic, ctx.author.id, url))
 
     @commands.command()
     async def description(self, ctx: commands.Context, *, description: str) -> None:
         """Set a profile description."""
-        await ctx.send(self.logic.set_description(ctx.author.id, description))
+        await ctx.send(
+            await self.database.write(self.logic.set_description, ctx.author.id, description)
+        )
 
     @commands.command()
     async def update_ratings(self, ctx: commands.Context) -> None:
@@ -60,7 +93,7 @@ class Rating(commands.Cog):
         if not ctx.author.guild_permissions.administrator:
             await ctx.send("Admin only command")
         try:
-            self.logic.update_rating(None, ctx.channel.id)
+            await self.database.write(self.logic.update_rating, None, ctx.channel.id)
             await ctx.send("Ratings updated")
         except Exception as e:
             logging.exception("update_rating")
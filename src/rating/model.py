@@ -1,11 +1,13 @@
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, DateTime, Float, String, Integer
+from sqlalchemy import ForeignKey, DateTime, Float, Index, String, Integer
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from .. import models
 from ..game import model as game_model
 
+INITIAL_RATING = 1500
+
 
 # Bookkeeping table.
 class OutcomeLedger(models.Base):
@@ -30,7 +32,7 @@ class MatchPlayer(models.Base):
         ForeignKey("player.player_id", ondelete="CASCADE"), primary_key=True
     )
 
-    rating: Mapped[float] = mapped_column(Float, default=1500)
+    rating: Mapped[float] = mapped_column(Float, default=INITIAL_RATING)
     thumbnail_url: Mapped[str] = mapped_column(String, default="")
     description: Mapped[str] = mapped_column(String, default="")
     
@@ -60,3 +62,9 @@ class WinnerHeadToHead(models.Base):
         "MatchPlayer",
         foreign_keys=[loser_id],
     )
+
+    # Nemesis, pinata and head to head achievements look up by player.
+    __table_args__ = (
+        Index("ix_winner_head_to_head_winner_loser", "winner_id", "loser_id"),
+        Index("ix_winner_head_to_head_loser_winner", "loser_id", "winner_id"),
+    )
@@ -1,14 +1,16 @@
 import logging
 import discord
 
+from blinker import signal
+
 from . import model as model
+from .. import database
 from ..game import model as game_model
 
 from collections import defaultdict
 from itertools import combinations
 from sqlalchemy import Engine, select, func, text, Row, text
 from sqlalchemy.orm import Session
-from tabulate import tabulate
 from typing import Tuple, Optional, List, Sequence
 from ..typing import *
 from dataclasses import dataclass
@@ -64,17 +66,17 @@ class Profile:
 class RatingLogic:
     """Cog containing rating related commands."""
 
-    def __init__(self, engine: Engine) -> None:
+    def __init__(self, engine: Engine, read_engine: Optional[Engine] = None) -> None:
         self.engine = engine
+        self.read_engine = read_engine or engine
         self.k_game = 50  # Boundedness of updates
-        self._refresh_ratings()
 
         # Let's not auto update the ratings until we allow rollbacks or implement a proper refresh command
         # I.e. clear the ledger and reset ratings before recalculating the ratings.
         # signal("finish").connect(self.update_rating)
 
     def update_rating(self, _, game_id: int):
-        with Session(self.engine) as session:
+        with database.session(self.engine) as session:
             game = session.scalar(
                 select(game_model.Game).filter_by(
                     game_id=game_id, game_state=game_model.GameState.FINISHED
@@ -84,6 +86,7 @@ class RatingLogic:
                 return
             self._update_game_rating(session, game)
             session.commit()
+        signal("ratings").send(None, game_id=game_id)
 
     @staticmethod
     def _expectations(a, b) -> Tuple[float, float]:
@@ -103,19 +106,8 @@ class RatingLogic:
             session.flush()
         return p
 
-    # Rewrite this using relationships now
     def __wins_statement(self):
-        sq = (
-            select(
-                game_model.GamePlayer.game_id,
-                func.max(game_model.GamePlayer.points).label("max_points"),
-            )
-            .group_by(game_model.GamePlayer.game_id)
-            .where(
-                game_model.GamePlayer.game.has(game_state=game_model.GameState.FINISHED)
-            )
-            .subquery()
-        )
+        # Tied winners all count, results are only stored for finished games.
         return (
             select(
                 game_model.Player.player_id,
@@ -123,12 +115,8 @@ class RatingLogic:
                 func.count("*").label("wins"),
             )
             .select_from(game_model.GamePlayer)
+            .filter_by(is_winner=True)
             .group_by(game_model.Player.player_id)
-            .join(
-                sq,
-                (sq.c.game_id == game_model.GamePlayer.game_id)
-                & (sq.c.max_points == game_model.GamePlayer.points),
-            )
             .join(
                 game_model.Player,
                 game_model.Player.player_id == game_model.GamePlayer.player_id,
@@ -185,33 +173,46 @@ class RatingLogic:
             p.rating += delta
             session.merge(p)
 
-    def _refresh_ratings(self):
-        with Session(self.engine) as session:
-            games = session.scalars(
-                select(game_model.Game)
-                .filter_by(game_state=game_model.GameState.FINISHED)
-                .order_by(game_model.Game.game_finish_time.asc())
+    def unrated_games(self) -> List[int]:
+        """Finished games missing from the outcome ledger, oldest first.
+
+        Replaying them through update_rating one by one brings the ratings up
+        to date. Runs as a startup job. Games with fewer than two players
+        have nothing to rate and never get into the ledger, so they are left
+        out.
+        """
+        with database.session(self.read_engine) as session:
+            # Correlated, so each finished game is a primary key lookup in the ledger.
+            rated = select(model.OutcomeLedger.game_id).where(
+                model.OutcomeLedger.game_id == game_model.Game.game_id
             )
-
-            for game in games:
-                self._update_game_rating(session, game)
-                session.commit()
-
-    def player_id_from_name(self, name: str) -> Optional[int]:
-        with Session(self.engine) as session:
-            return session.scalar(
-                select(game_model.Player.player_id).filter_by(name=name)
+            players = (
+                select(func.count())
+                .where(game_model.GamePlayer.game_id == game_model.Game.game_id)
+                .scalar_subquery()
             )
+            return list(
+                session.scalars(
+                    select(game_model.Game.game_id)
+                    .filter_by(game_state=game_model.GameState.FINISHED)
+                    .where(~rated.exists(), players > 1)
+                    .order_by(game_model.Game.game_finish_time.asc())
+                )
+            )
+
+    def player_id_from_name(self, name: str) -> Result[int]:
+        with database.session(self.read_engine) as session:
+            return game_model.Player.find(session, name)
 
     def stats(self, player_id: int) -> Result[Profile]:
         """Retrieve the ratings for all players"""
         try:
-            with Session(self.engine) as session:
+            with database.session(self.read_engine) as session:
                 # Find player info
+                player = session.get(game_model.Player, player_id)
+                if not player:
+                    return Err("Something went wrong.")
                 mp = session.get(model.MatchPlayer, player_id)
-                if not mp:
-                    mp = session.merge(model.MatchPlayer(player_id=player_id))
-                    session.commit()
 
                 pp: Sequence[Row[Tuple[str|None, int]]] = session.execute(
                     select(game_model.GamePlayer.faction, func.count("*").label("played_count"))
@@ -234,28 +235,10 @@ class RatingLogic:
                         )
                     )
                 ).scalar()
-                sq = (
-                    select(
-                        game_model.GamePlayer.game_id,
-                        func.max(game_model.GamePlayer.points).label("max_points"),
-                    )
-                    .group_by(game_model.GamePlayer.game_id)
-                    .where(
-                        game_model.GamePlayer.game.has(
-                            game_state=game_model.GameState.FINISHED
-                        )
-                    )
-                    .subquery()
-                )
                 stmt = (
                     select(func.count("*"))
                     .select_from(game_model.GamePlayer)
-                    .filter_by(player_id=player_id)
-                    .join(
-                        sq,
-                        (sq.c.game_id == game_model.GamePlayer.game_id)
-                        & (sq.c.max_points == game_model.GamePlayer.points),
-                    )
+                    .filter_by(player_id=player_id, is_winner=True)
                 )
 
                 wins = session.execute(stmt).scalar()
@@ -268,29 +251,32 @@ class RatingLogic:
                         )
                     )
                 )
+                # With the names joined in, instead of a lazy load of the opponent and their name.
                 nemesis = session.execute(
-                    select(model.WinnerHeadToHead, func.count("*").label("wins")).select_from(model.WinnerHeadToHead)
+                    select(game_model.Player.name, func.count("*").label("wins")).select_from(model.WinnerHeadToHead)
+                    .join(game_model.Player, game_model.Player.player_id == model.WinnerHeadToHead.winner_id)
                     .group_by(model.WinnerHeadToHead.winner_id)
-                    .filter_by(loser_id=player_id)
+                    .filter(model.WinnerHeadToHead.loser_id == player_id)
                     .order_by(text("wins desc"))
                 ).first()
                 pinata = session.execute(
-                    select(model.WinnerHeadToHead, func.count("*").label("losses")).select_from(model.WinnerHeadToHead)
+                    select(game_model.Player.name, func.count("*").label("losses")).select_from(model.WinnerHeadToHead)
+                    .join(game_model.Player, game_model.Player.player_id == model.WinnerHeadToHead.loser_id)
                     .group_by(model.WinnerHeadToHead.loser_id)
-                    .filter_by(winner_id=player_id)
+                    .filter(model.WinnerHeadToHead.winner_id == player_id)
                     .order_by(text("losses desc"))
                 ).first()
                 factions: List[Tuple[str,int]] = [(p.faction, p.played_count) for p in pp]
                 return Ok(
                     Profile(
-                        thumbnail=mp.thumbnail_url,
-                        name=mp.player.name,
-                        description=mp.description,
-                        rating=mp.rating,
+                        thumbnail=mp.thumbnail_url if mp else "",
+                        name=player.name,
+                        description=mp.description if mp else "",
+                        rating=mp.rating if mp else model.INITIAL_RATING,
                         games=games if games else 0,
                         wins=wins if wins else 0,
-                        nemesis=(nemesis.WinnerHeadToHead.winner.player.name, nemesis.wins) if nemesis else None,
-                        pinata=(pinata.WinnerHeadToHead.loser.player.name, pinata.losses) if pinata else None,
+                        nemesis=(nemesis.name, nemesis.wins) if nemesis else None,
+                        pinata=(pinata.name, pinata.losses) if pinata else None,
                         favorite_factions=factions,
                         points_per_game=float(points_per_game) if points_per_game else 0,
                     )
@@ -302,7 +288,7 @@ class RatingLogic:
     def ratings(self) -> str:
         """Retrieve the ratings for all players in a table format"""
         try:
-            with Session(self.engine) as session:
+            with database.session(self.read_engine) as session:
                 sq = self.__wins_statement().subquery()
                 players = session.execute(
                     select(model.MatchPlayer, sq.c.wins)
@@ -322,6 +308,8 @@ class RatingLogic:
                     table_data.append([i + 1, player.player.name, int(player.rating), wins])
 
                 # Generate table using tabulate
+                from tabulate import tabulate
+
                 table = tabulate(
                     table_data,
                     headers=["#", "Player", "Rating", "Wins"],
@@ -337,7 +325,7 @@ class RatingLogic:
 
     def wins(self) -> str:
         try:
-            with Session(self.engine) as session:
+            with database.session(self.read_engine) as session:
                 players = session.execute(self.__wins_statement()).all()
                 # Prepare table data
                 table_data = []
@@ -345,6 +333,8 @@ class RatingLogic:
                     table_data.append([i + 1, player.name, int(player.wins)])
 
                 # Generate table using tabulate
+                from tabulate import tabulate
+
                 table = tabulate(
                     table_data,
                     headers=["#", "Player", "Wins"],
@@ -361,13 +351,14 @@ class RatingLogic:
         if not url.startswith("https://"):
             return "Start the URL with https://"
         try:
-            with Session(self.engine) as session:
+            with database.session(self.engine) as session:
                 mp = session.get(model.MatchPlayer, player_id)
                 if not mp:
                     mp = model.MatchPlayer(player_id=player_id)
                 mp.thumbnail_url=url
                 session.merge(mp)
                 session.commit()
+            signal("profile").send(None, player_id=player_id)
             return "Successfully set profile picture."
         except Exception as e:
             logging.exception("set_pic")
@@ -375,13 +366,14 @@ class RatingLogic:
 
     def set_description(self, player_id: int, description:str) -> str:
         try:
-            with Session(self.engine) as session:
+            with database.session(self.engine) as session:
                 mp = session.get(model.MatchPlayer, player_id)
                 if not mp:
                     mp = model.MatchPlayer(player_id=player_id)
                 mp.description = description
                 session.merge(mp)
                 session.commit()
+            signal("profile").send(None, player_id=player_id)
             return "Successfully updated description."
         except Exception as e:
             logging.exception("set_description")
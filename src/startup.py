@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+
+from dataclasses import dataclass
+from discord.ext import commands
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+
+class WarmingUp(commands.CheckFailure):
+    """A command needs a startup job that has not finished yet."""
+
+
+@dataclass
+class Job:
+    name: str
+    fn: Callable[[], Awaitable[None]]
+    after: Tuple[str, ...] = ()
+
+
+class Startup:
+    """Runs startup jobs in the background, in dependency order.
+
+    Jobs are added by the cogs before the bot connects. `start` schedules every
+    job as soon as the jobs it comes after have finished, so independent jobs
+    run in parallel and the gateway does not wait for any of them. Commands
+    that need a job call `require` from a check.
+    """
+
+    def __init__(self) -> None:
+        self.jobs: Dict[str, Job] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, fn: Callable[[], Awaitable[None]], after: Tuple[str, ...] = ()) -> None:
+        if name in self.jobs:
+            raise ValueError(f"Startup job {name} already exists")
+        self.jobs[name] = Job(name, fn, after)
+
+    def __check_graph(self) -> None:
+        visiting, visited = set(), set()
+
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Startup jobs have a cycle through {name}")
+            if name not in self.jobs:
+                raise ValueError(f"Unknown startup job {name}")
+            visiting.add(name)
+            for dependency in self.jobs[name].after:
+                visit(dependency)
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self.jobs:
+            visit(name)
+
+    def start(self) -> None:
+        self.__check_graph()
+        for name in self.jobs:
+            self.__schedule(name)
+
+    def __schedule(self, name: str) -> asyncio.Task:
+        if name not in self.tasks:
+            job = self.jobs[name]
+            dependencies = [self.__schedule(dependency) for dependency in job.after]
+            task = asyncio.create_task(self.__run(job, dependencies), name=f"startup:{name}")
+            # Failures are logged in __run, don't warn about them again.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self.tasks[name] = task
+        return self.tasks[name]
+
+    async def __run(self, job: Job, dependencies: List[asyncio.Task]) -> None:
+        try:
+            await asyncio.gather(*dependencies)
+        except Exception:
+            logging.error(f"Skipping startup job {job.name} because a job it comes after failed")
+            raise
+        started = time.perf_counter()
+        try:
+            await job.fn()
+        except Exception:
+            logging.exception(f"Startup job {job.name} failed")
+            raise
+        finally:
+            self.timings[job.name] = time.perf_counter() - started
+        logging.info(f"Startup job {job.name} done in {self.timings[job.name]:.2f}s")
+
+    def ready(self, name: str) -> bool:
+        """Whether the job has finished, successfully or not."""
+        task = self.tasks.get(name)
+        return task is not None and task.done()
+
+    def require(self, *names: str) -> bool:
+        """Command check raising WarmingUp until the jobs have finished.
+
+        A failed job is logged and does not block commands forever.
+        """
+        if not all(self.ready(name) for name in names):
+            raise WarmingUp("The bot is still warming up. Try again in a few seconds.")
+        return True
+
+    async def wait(self) -> None:
+        """Wait for every job. Failures are logged, not raised."""
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
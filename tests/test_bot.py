@@ -2,7 +2,9 @@ import discord
 import discord.ext.test as dpytest
 import pytest
 import pytest_asyncio
+from discord.ext import commands
 from src.bot import Bot
+from src.startup import WarmingUp
 
 
 @pytest_asyncio.fixture(autouse=True)
@@ -17,8 +19,10 @@ async def bot():
     await bot._async_setup_hook()  # setup the loop
 
     dpytest.configure(bot, members=2)
+    await bot.startup.wait()
 
     yield bot
+    bot.watchdog.stop()
     await dpytest.empty_queue()
 
 
@@ -33,3 +37,51 @@ async def test_factions():
     await dpytest.message("!factions 3")
     # The response should mention random factions and the number requested
     assert dpytest.verify().message().contains().content("Here are 3 random factions:")
+
+
+@pytest.mark.asyncio
+async def test_command_latency_is_recorded(bot):
+    await dpytest.message("!hello")
+    summary = bot.metrics.dump()["commands"]["hello"]
+    assert summary["count"] == 1
+    assert summary["total"]["p50"] > 0
+
+
+@pytest.mark.asyncio
+async def test_perf_is_admin_only():
+    await dpytest.message("!perf")
+    assert dpytest.verify().message().content("Admin only command")
+
+
+@pytest.mark.asyncio
+async def test_command_queries_are_counted(bot):
+    await dpytest.message("!lobbies")
+    summary = bot.metrics.dump()["commands"]["lobbies"]
+    assert summary["queries"]["max"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_stalls_is_admin_only():
+    await dpytest.message("!stalls")
+    assert dpytest.verify().message().content("Admin only command")
+
+
+@pytest.mark.asyncio
+async def test_commands_needing_startup_jobs_reply_warming_up(bot, monkeypatch):
+    monkeypatch.setattr(bot.startup, "ready", lambda name: False)
+    with pytest.raises(WarmingUp):
+        await dpytest.message("!leaderboard")
+    assert dpytest.verify().message().contains().content("warming up")
+
+
+@pytest.mark.asyncio
+async def test_unknown_command_suggests_the_closest_one():
+    with pytest.raises(commands.CommandNotFound):
+        await dpytest.message("!helo")
+    assert dpytest.verify().message().embed(
+        discord.Embed(
+            title="Command not found",
+            description='Command "helo" is not found. Did you mean !hello? Type !help for a list of commands',
+            color=discord.Color.red(),
+        )
+    )
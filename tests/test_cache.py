@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from blinker import signal
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src import cache
+from src.cache import ResponseCache
+from src.database import Database
+from src.game import gamelogic, model
+from src.models import Base
+from src.rating import ratinglogic
+from src.typing import Ok
+
+
+@pytest_asyncio.fixture
+async def database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(model.Game(game_id=1, game_state=model.GameState.STARTED, name="Game1"))
+        session.add_all([model.Player(player_id=1, name="Alice"), model.Player(player_id=2, name="Bob")])
+        session.add_all([
+            model.GamePlayer(game_id=1, player_id=1, faction="The Arborec", turn_order=0),
+            model.GamePlayer(game_id=1, player_id=2, faction="The Barony of Letnev", turn_order=1),
+        ])
+        session.commit()
+    database = Database(engine)
+    yield database
+    database.close()
+
+
+def counter(value="response"):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return value
+
+    return compute, lambda: calls
+
+
+@pytest.mark.asyncio
+async def test_hits_and_misses_are_counted():
+    responses = ResponseCache()
+    compute, calls = counter()
+    for _ in range(3):
+        assert await responses.get(("wins",), compute) == "response"
+    assert calls() == 1
+    assert (responses.hits["wins"], responses.misses["wins"]) == (2, 1)
+    assert responses.hit_rate("wins") == pytest.approx(2 / 3)
+
+
+@pytest.mark.asyncio
+async def test_entries_expire():
+    responses = ResponseCache(ttl=0)
+    compute, calls = counter()
+    await responses.get(("wins",), compute)
+    await responses.get(("wins",), compute)
+    assert calls() == 2
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_are_evicted():
+    responses = ResponseCache(max_entries=2)
+    compute, _ = counter()
+    for key in ("a", "b", "a", "c"):
+        await responses.get(("stats", key), compute)
+    assert list(responses.entries) == [("stats", "a"), ("stats", "c")]
+    assert responses.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_stored():
+    responses = ResponseCache()
+    compute, calls = counter("Something went wrong.")
+    for _ in range(2):
+        await responses.get(("stats", 1), compute, store=lambda r: r != "Something went wrong.")
+    assert calls() == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_only_matching_tags():
+    responses = ResponseCache()
+    compute, _ = counter()
+    await responses.get(("wins",), compute, tags=(cache.FINISH,))
+    await responses.get(("stats", 1), compute, tags=((cache.PROFILE, 1),))
+    await responses.get(("stats", 2), compute, tags=((cache.PROFILE, 2),))
+
+    signal(cache.PROFILE).send(None, player_id=1)
+
+    assert set(responses.entries) == {("wins",), ("stats", 2)}
+
+
+@pytest.mark.asyncio
+async def test_response_computed_across_an_invalidation_is_not_stored():
+    responses = ResponseCache()
+    reading, finished = asyncio.Event(), asyncio.Event()
+
+    async def slow_compute():
+        reading.set()
+        await finished.wait()
+        return "before the finish"
+
+    pending = asyncio.create_task(responses.get(("wins",), slow_compute, tags=(cache.FINISH,)))
+    await reading.wait()
+    responses.invalidate(cache.FINISH)
+    finished.set()
+    assert await pending == "before the finish"
+
+    compute, calls = counter("after the finish")
+    assert await responses.get(("wins",), compute, tags=(cache.FINISH,)) == "after the finish"
+    assert calls() == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_wins_are_never_served_after_a_finish(database):
+    responses = ResponseCache()
+    games = gamelogic.GameLogic(None, database.engine, database.read_engine)
+    ratings = ratinglogic.RatingLogic(database.engine, database.read_engine)
+
+    async def wins():
+        return await responses.get(("wins",), lambda: database.run(ratings.wins), tags=(cache.FINISH,))
+
+    assert "Alice" not in await wins()
+    assert "Alice" not in await wins()
+    assert responses.hits["wins"] == 1
+
+    # Readers hammer !wins while the game is finished.
+    async def reader():
+        while not done.is_set():
+            await wins()
+            await asyncio.sleep(0)
+
+    done = asyncio.Event()
+    readers = [asyncio.create_task(reader()) for _ in range(4)]
+    assert isinstance(await database.write(games.finish, False, 1, "10 4"), Ok), "finish failed"
+    # As soon as the finish has returned, no reader gets the old table.
+    assert "Alice" in await wins()
+    done.set()
+    await asyncio.gather(*readers)
+    assert "Alice" in await wins()
+
+
+@pytest.mark.asyncio
+async def test_profile_updates_invalidate_that_players_stats(database):
+    responses = ResponseCache()
+    ratings = ratinglogic.RatingLogic(database.engine, database.read_engine)
+
+    async def stats(player_id):
+        return await responses.get(
+            ("stats", player_id),
+            lambda: database.run(ratings.stats, player_id),
+            tags=((cache.PROFILE, player_id),),
+        )
+
+    await stats(1)
+    await stats(2)
+    await database.write(ratings.set_description, 1, "Mecatol or bust")
+
+    assert (await stats(1)).value.description == "Mecatol or bust"
+    assert responses.misses["stats"] == 3
+    await stats(2)
+    assert responses.hits["stats"] == 1
@@ -0,0 +1,262 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+from contextlib import closing
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from src import database as db
+from src.database import Database, MemoryStore, Writer
+from src.game import gamelogic, model
+from src.models import Base
+
+
+@pytest.fixture
+def database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+    @event.listens_for(engine, "connect")
+    def add_sleep(dbapi_connection, connection_record):
+        dbapi_connection.create_function("sleep", 1, time.sleep)
+
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        for game_id in (1, 2):
+            session.add(model.Game(game_id=game_id, game_state="LOBBY", name=f"Lobby{game_id}"))
+        session.commit()
+
+    database = Database(engine)
+    yield database
+    database.close()
+
+
+def slow_query(engine, seconds: float) -> None:
+    with Session(engine) as session:
+        session.execute(text("SELECT sleep(:s)"), {"s": seconds})
+
+
+@pytest.mark.asyncio
+async def test_run_executes_off_the_event_loop(database):
+    loop_thread = threading.get_ident()
+    worker_thread = await database.run(threading.get_ident)
+    assert worker_thread != loop_thread
+
+
+@pytest.mark.asyncio
+async def test_commands_progress_while_a_long_query_runs(database):
+    logic = gamelogic.GameLogic(bot=None, engine=database.engine)
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    long_query = asyncio.create_task(database.run(slow_query, database.engine, 1.0))
+    await asyncio.sleep(0.05)
+
+    # Two different channels join their lobbies while the long query is running.
+    started = time.monotonic()
+    joined = await asyncio.gather(
+        database.run(logic.join, 1, 10, "Alice"),
+        database.run(logic.join, 2, 11, "Bob"),
+    )
+    elapsed = time.monotonic() - started
+
+    assert not long_query.done()
+    assert elapsed < 0.5
+    assert all("has joined lobby" in result.value for result in joined)
+
+    await long_query
+    ticking.cancel()
+
+    # The event loop kept running throughout the long query.
+    assert ticks >= 50
+
+
+def add_player(engine, player_id: int, name: str) -> int:
+    with db.session(engine) as session:
+        session.add(model.Player(player_id=player_id, name=name))
+        session.commit()
+    return player_id
+
+
+def fail_after_insert(engine) -> None:
+    with db.session(engine) as session:
+        session.add(model.Player(player_id=99, name="Ghost"))
+        session.flush()
+        raise RuntimeError("boom")
+
+
+def test_writer_merges_queued_units_into_one_commit(database):
+    writer = Writer(database.engine, window=0.05)
+    commits = 0
+
+    @event.listens_for(writer.engine, "commit")
+    def count_commit(connection):
+        nonlocal commits
+        commits += 1
+
+    futures = [writer.submit(add_player, database.engine, i, f"P{i}") for i in range(1, 11)]
+    assert [f.result(timeout=5) for f in futures] == list(range(1, 11))
+    writer.close()
+
+    assert commits == 1
+    with Session(database.engine) as session:
+        assert session.query(model.Player).count() == 10
+
+
+def test_writer_reports_failures_per_unit(database):
+    writer = Writer(database.engine, window=0.05)
+    ok = writer.submit(add_player, database.engine, 1, "Alice")
+    failed = writer.submit(fail_after_insert, database.engine)
+    also_ok = writer.submit(add_player, database.engine, 2, "Bob")
+
+    assert ok.result(timeout=5) == 1
+    with pytest.raises(RuntimeError):
+        failed.result(timeout=5)
+    assert also_ok.result(timeout=5) == 2
+    writer.close()
+
+    with Session(database.engine) as session:
+        names = sorted(p.name for p in session.query(model.Player))
+    assert names == ["Alice", "Bob"]
+
+
+def test_after_commit_callbacks_run_once_the_batch_is_committed(database):
+    writer = Writer(database.engine, window=0.05)
+    seen = []
+
+    def count_players() -> None:
+        with Session(database.read_engine) as session:
+            seen.append(session.query(model.Player).count())
+
+    def add_and_notify(player_id: int) -> None:
+        add_player(database.engine, player_id, f"P{player_id}")
+        db.after_commit(count_players)
+
+    def fail_and_notify() -> None:
+        db.after_commit(lambda: seen.append("rolled back"))
+        fail_after_insert(database.engine)
+
+    futures = [
+        writer.submit(add_and_notify, 1),
+        writer.submit(fail_and_notify),
+        writer.submit(add_and_notify, 2),
+    ]
+    futures[0].result(timeout=5)
+    writer.close()
+
+    # Both callbacks ran after the whole batch was committed, the failed unit's never ran.
+    assert seen == [2, 2]
+
+
+def test_writer_fails_pending_and_later_writes_once_it_dies(database, monkeypatch):
+    def broken(self, connection, batch):
+        raise RuntimeError("writer broke")
+
+    monkeypatch.setattr(Writer, "_Writer__apply", broken)
+    writer = Writer(database.engine, window=0.05)
+    futures = [writer.submit(add_player, database.engine, i, f"P{i}") for i in range(1, 4)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="writer broke"):
+            future.result(timeout=5)
+    with pytest.raises(RuntimeError, match="has stopped"):
+        writer.submit(add_player, database.engine, 4, "P4")
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_write_returns_committed_result(database):
+    logic = gamelogic.GameLogic(bot=None, engine=database.engine)
+    result = await database.write(logic.join, 1, 10, "Alice")
+    assert "has joined lobby" in result.value
+
+    # Visible to readers on other connections once write has returned.
+    lobbies = await database.run(logic.lobbies)
+    assert "1 player(s)" in lobbies.value
+
+
+def test_read_engine_rejects_writes(database):
+    with pytest.raises(Exception, match="readonly"):
+        add_player(database.read_engine, 1, "Alice")
+
+
+def test_read_session_sees_one_snapshot(database):
+    with db.session(database.read_engine) as session:
+        before = session.query(model.Player).count()
+        database.writer.submit(add_player, database.engine, 1, "Alice").result(timeout=5)
+        assert session.query(model.Player).count() == before
+
+    with db.session(database.read_engine) as session:
+        assert session.query(model.Player).count() == before + 1
+
+
+def players_in(path) -> int:
+    with closing(sqlite3.connect(path)) as connection:
+        return connection.execute("SELECT count(*) FROM player").fetchone()[0]
+
+
+@pytest.fixture
+def wal_file(tmp_path):
+    """A database file in WAL mode with one player."""
+    path = str(tmp_path / "app.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    add_player(engine, 1, "Alice")
+    engine.dispose()
+    return path
+
+
+def memory_database(path: str) -> Database:
+    store = MemoryStore(path, interval=3600)
+    return Database(create_engine(store.url, connect_args={"timeout": 15}), store=store)
+
+
+def test_memory_store_writes_back_on_checkpoint(wal_file):
+    database = memory_database(wal_file)
+    try:
+        database.writer.submit(add_player, database.engine, 2, "Bob").result(timeout=5)
+        with db.session(database.read_engine) as session:
+            assert session.query(model.Player).count() == 2
+        # Nothing reaches the file until a checkpoint.
+        assert players_in(wal_file) == 1
+
+        assert database.store.checkpoint()
+        assert players_in(wal_file) == 2
+        assert not database.store.checkpoint()
+        with closing(sqlite3.connect(wal_file)) as connection:
+            assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        database.close()
+
+
+def test_memory_store_checkpoints_on_close(wal_file):
+    database = memory_database(wal_file)
+    database.writer.submit(add_player, database.engine, 2, "Bob").result(timeout=5)
+    database.close()
+    assert players_in(wal_file) == 2
+    assert database.store.checkpoints == 1
+
+
+def test_memory_store_checkpoints_periodically(tmp_path):
+    path = str(tmp_path / "app.db")
+    store = MemoryStore(path, interval=0.05)
+    engine = create_engine(store.url)
+    try:
+        Base.metadata.create_all(engine)
+        add_player(engine, 1, "Alice")
+        deadline = time.monotonic() + 5
+        while store.checkpoints == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert players_in(path) == 1
+    finally:
+        engine.dispose()
+        store.close()
@@ -0,0 +1,33 @@
+import sqlite3
+
+from contextlib import closing
+
+import pytest
+
+from benchmarks import load_lobbies
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lobbies_play_through_consistently(tmp_path, monkeypatch):
+    # The bot opens app.db in the working directory.
+    monkeypatch.chdir(tmp_path)
+    report = await load_lobbies.run(lobbies=4, players=3)
+
+    assert report.problems == []
+    assert report.command_errors == 0
+    assert report.lock_errors == 0
+    assert report.commands == 4 * (1 + 2 + 2 + 3 * 2 + 2 + 3)
+    assert set(report.latency) == set(load_lobbies.COMMANDS)
+
+
+@pytest.mark.asyncio
+async def test_lobbies_play_through_in_memory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    report = await load_lobbies.run(lobbies=2, players=3, checkpoint_interval=3600)
+
+    assert report.problems == []
+    assert report.command_errors == 0
+    assert report.lock_errors == 0
+    # Written back when the bot closed.
+    with closing(sqlite3.connect(tmp_path / "app.db")) as connection:
+        assert connection.execute("SELECT count(*) FROM game").fetchone()[0] == 2
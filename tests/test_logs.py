@@ -0,0 +1,81 @@
+import json
+import logging
+
+import pytest
+
+from src import logs
+from src.perf import metrics
+from src.perf.metrics import Invocation
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_json_lines_carry_command_context(tmp_path, restore_logging):
+    path = tmp_path / "log.log"
+    listener = logs.setup(str(path), json_lines=True)
+
+    metrics.current.set(Invocation(command="draft", guild_id=1, channel_id=2))
+    logs.game_id.set(2)
+    logging.info("Player %s drafted", "Alice")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.exception("Draft failed")
+    metrics.current.set(None)
+    logs.game_id.set(None)
+    logging.info("Outside a command")
+    listener.stop()
+
+    drafted, failed, outside = [json.loads(line) for line in path.read_text().splitlines()]
+    assert drafted["message"] == "Player Alice drafted"
+    assert drafted["level"] == "INFO"
+    assert (drafted["command"], drafted["guild_id"], drafted["channel_id"], drafted["game_id"]) == (
+        "draft", 1, 2, 2
+    )
+    assert "ValueError: boom" in failed["exception"]
+    assert "command" not in outside
+
+
+def test_plain_format_is_unchanged(tmp_path, restore_logging):
+    path = tmp_path / "log.log"
+    listener = logs.setup(str(path))
+    logging.info("Starting bot...")
+    listener.stop()
+
+    assert path.read_text().rstrip().endswith("[INFO] Starting bot...")
+
+
+def test_rotates_on_size(tmp_path):
+    path = tmp_path / "log.log"
+    handler = logs.SizeAndTimeRotatingFileHandler(str(path), max_bytes=100, interval=0, backup_count=2)
+    logger = logging.Logger("test")
+    logger.addHandler(handler)
+    for i in range(10):
+        logger.info("x" * 40)
+    handler.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["log.log", "log.log.1", "log.log.2"]
+
+
+def test_rotates_on_time(tmp_path):
+    path = tmp_path / "log.log"
+    handler = logs.SizeAndTimeRotatingFileHandler(str(path), max_bytes=0, interval=60)
+    logger = logging.Logger("test")
+    logger.addHandler(handler)
+    logger.info("yesterday")
+    handler.rollover_at = 0
+    logger.info("today")
+    handler.close()
+
+    assert path.read_text() == "today\n"
+    assert (tmp_path / "log.log.1").read_text() == "yesterday\n"
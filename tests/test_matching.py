@@ -0,0 +1,69 @@
+import Levenshtein
+import pytest
+
+from src import matching
+from src.game import factions
+from src.matching import Matcher
+from src.typing import Err, Ok
+
+
+@pytest.fixture(scope="module")
+def faction_names():
+    return [f.name for f in factions.read_factions().factions]
+
+
+def levenshtein_closest(s, ss, cutoff=0.1):
+    best = max(ss, key=lambda c: Levenshtein.ratio(s, c))
+    return None if Levenshtein.ratio(s, best) <= cutoff else best
+
+
+@pytest.mark.parametrize("query", ["arborec", "The Naalu Collective", "jol nar", "sardakk", "xxy", "Winnu"])
+def test_agrees_with_the_levenshtein_scan(faction_names, query):
+    lowered = [n.lower() for n in faction_names]
+    assert matching.closest(query.lower(), lowered) == levenshtein_closest(query.lower(), lowered)
+
+
+def test_matching_ignores_case_and_whitespace():
+    matcher = Matcher(["The Arborec", "The Barony of Letnev"])
+    assert matcher.match("  the   ARBOREC ") == "The Arborec"
+
+
+def test_cutoff():
+    matcher = Matcher(["draft", "ban"])
+    assert matcher.match("zzzzzzzz") is None
+    assert matcher.match("drafty", cutoff=0.95) is None
+    assert matcher.match("drafty", cutoff=0.5) == "draft"
+    assert Matcher([]).match("draft") is None
+
+
+def test_key_returns_candidate_objects():
+    fs = factions.read_factions().factions
+    best = Matcher(fs, key=lambda f: f.name).match("letnev")
+    assert best in fs
+    assert "Letnev" in best.name
+
+
+def test_score():
+    candidate, score = Matcher(["draft"]).score("draft")
+    assert (candidate, score) == ("draft", 1.0)
+
+
+def test_recent_queries_are_cached():
+    matcher = Matcher(["draft", "ban"])
+    matcher.match("drft")
+    matcher.match("drft")
+    info = matcher._Matcher__match.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_closest_reuses_the_index_for_the_same_candidates():
+    matching.closest("a", ["draft", "ban"])
+    assert matching.matcher(("draft", "ban")) is matching.matcher(("draft", "ban"))
+
+
+def test_find_name_never_takes_a_near_miss_for_someone_else():
+    assert matching.find_name("bob", ["Bob", "Rob"]) == Ok("Bob")
+    assert matching.find_name("Bob", ["Rob", "Alice"]) == Err("Can't find anyone with that name. Did you mean Rob?")
+    assert matching.find_name("Erik", ["Eric"]) == Err("Can't find anyone with that name. Did you mean Eric?")
+    assert matching.find_name("Zed", ["Alice"]) == Err("Can't find anyone with that name")
+    assert isinstance(matching.find_name("eric", ["Eric", "ERIC"]), Err)
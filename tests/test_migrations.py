@@ -0,0 +1,205 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, inspect, select, text
+from sqlalchemy.orm import Session
+
+from src import migrations
+from src.database import Database
+from src.game import controller, model
+from src.migrations import Migration, Migrator, SchemaVersion
+from src.models import Base
+
+# A column the game table doesn't have, added by the migrations below.
+rank = Column("rank", Integer)
+Table("game", MetaData(), rank)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def old_database(engine):
+    """A database from before the migrations, with some games."""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for index in migrations.MIGRATIONS[0].indexes:
+            index.drop(connection)
+        connection.execute(SchemaVersion.__table__.delete())
+    with Session(engine) as session:
+        for game_id in range(1, 8):
+            session.add(model.Game(game_id=game_id, game_state=model.GameState.FINISHED, name=f"Game{game_id}"))
+        session.commit()
+    return engine
+
+
+@pytest.fixture
+def unfinished_results(engine):
+    """A database at version 1, from before game results were stored, with a few games."""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for index in migrations.MIGRATIONS[1].indexes:
+            index.drop(connection)
+        for table, column in RESULT_COLUMNS:
+            connection.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {column}")
+        connection.execute(SchemaVersion.__table__.insert(), {"version": 1, "name": migrations.MIGRATIONS[0].name})
+        players = [{"player_id": p, "name": f"Player{p}"} for p in range(1, 5)]
+        connection.execute(model.Player.__table__.insert(), players)
+        games = [(1, "FINISHED", [3, 10, 7]), (2, "FINISHED", [8, 8, 2, 2]), (3, "FINISHED", []), (4, "STARTED", [5, 1])]
+        for game_id, state, points in games:
+            connection.execute(model.Game.__table__.insert(), {"game_id": game_id, "name": f"G{game_id}", "game_state": state})
+            for turn, p in enumerate(points):
+                connection.execute(
+                    model.GamePlayer.__table__.insert(),
+                    {"game_id": game_id, "player_id": turn + 1, "points": p, "turn_order": turn},
+                )
+    return engine
+
+
+RESULT_COLUMNS = [
+    ("game_player", "finish_rank"),
+    ("game_player", "is_winner"),
+    ("game_player", "is_last"),
+    ("game", "winner_player_id"),
+    ("game", "player_count"),
+]
+
+
+def ranks(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT rank FROM game ORDER BY game_id")).scalars().all()
+
+
+def backfill_rank(batches):
+    def backfill(connection, batch_size: int) -> int:
+        batches.append(batch_size)
+        ids = connection.execute(
+            text("SELECT game_id FROM game WHERE rank IS NULL LIMIT :n"), {"n": batch_size}
+        ).scalars().all()
+        for game_id in ids:
+            connection.execute(text("UPDATE game SET rank = :id * 10 WHERE game_id = :id"), {"id": game_id})
+        return len(ids)
+
+    return backfill
+
+
+def test_new_database_is_created_at_the_latest_version(engine):
+    migrator = Migrator(engine)
+    assert migrator.prepare() == []
+    assert migrator.version() == migrator.latest
+    names = {i["name"] for i in inspect(engine).get_indexes("game_player")}
+    assert "ix_game_player_player_faction" in names
+
+
+def test_old_database_gets_the_hot_query_indexes(old_database):
+    migrator = Migrator(old_database)
+    assert migrator.version() == 0
+    migrator.migrate()
+    assert migrator.version() == migrator.latest
+    for index in migrations.MIGRATIONS[0].indexes:
+        assert index.name in {i["name"] for i in inspect(old_database).get_indexes(index.table.name)}
+    assert migrator.prepare() == []
+
+
+def test_backfill_runs_in_batches_before_the_version_is_recorded(old_database):
+    batches = []
+    steps = [
+        Migration(1, "Game rank", schema=lambda c: migrations.add_column(c, rank), backfill=backfill_rank(batches)),
+    ]
+    migrator = Migrator(old_database, steps, batch_size=3)
+
+    pending = migrator.prepare()
+    assert [m.version for m in pending] == [1]
+    # The column is there right away, the data and version after run.
+    assert ranks(old_database) == [None] * 7
+    assert migrator.version() == 0
+
+    migrator.migrate()
+    assert ranks(old_database) == [10, 20, 30, 40, 50, 60, 70]
+    # Three batches with rows, then an empty one.
+    assert batches == [3, 3, 3, 3]
+    assert migrator.version() == 1
+
+
+def test_interrupted_migration_resumes(old_database):
+    batches = []
+    steps = [Migration(1, "Game rank", schema=lambda c: migrations.add_column(c, rank), backfill=backfill_rank(batches))]
+    migrator = Migrator(old_database, steps, batch_size=3)
+    migrator.prepare()
+    with old_database.begin() as connection:
+        connection.execute(text("UPDATE game SET rank = 0 WHERE game_id <= 3"))
+
+    # Starting over repeats the schema step and skips the rows already done.
+    migrator.migrate()
+    assert ranks(old_database) == [0, 0, 0, 40, 50, 60, 70]
+    assert batches == [3, 3, 3]
+
+
+@pytest.mark.asyncio
+async def test_run_writes_through_the_writer_between_commands(old_database):
+    batches = []
+    steps = [Migration(1, "Game rank", schema=lambda c: migrations.add_column(c, rank), backfill=backfill_rank(batches))]
+    migrator = Migrator(old_database, steps, batch_size=2)
+    pending = migrator.prepare()
+
+    database = Database(old_database)
+    writes = []
+
+    async def write(fn, *args):
+        writes.append(fn)
+        return await database.write(fn, *args)
+
+    try:
+        await migrator.run(pending, write)
+    finally:
+        database.close()
+    # A write per batch, one for the empty batch, and one recording the version.
+    assert len(writes) == 6
+    assert ranks(old_database) == [10, 20, 30, 40, 50, 60, 70]
+    with Session(old_database) as session:
+        assert session.scalars(select(SchemaVersion.name)).all() == ["Game rank"]
+
+
+def test_results_of_finished_games_are_backfilled(unfinished_results):
+    migrator = Migrator(unfinished_results, batch_size=2)
+    assert [m.version for m in migrator.prepare()] == [2]
+    migrator.migrate()
+    assert migrator.version() == 2
+
+    with Session(unfinished_results) as session:
+        results = {
+            (gp.game_id, gp.player_id): (gp.finish_rank, gp.is_winner, gp.is_last)
+            for gp in session.scalars(select(model.GamePlayer))
+        }
+        games = {g.game_id: (g.winner_player_id, g.player_count) for g in session.scalars(select(model.Game))}
+    assert results == {
+        (1, 1): (3, False, True), (1, 2): (1, True, False), (1, 3): (2, False, False),
+        # Tied winners and tied last places.
+        (2, 1): (1, True, False), (2, 2): (1, True, False), (2, 3): (3, False, True), (2, 4): (3, False, True),
+        # Not finished, no result.
+        (4, 1): (None, None, None), (4, 2): (None, None, None),
+    }
+    # On a tie the winner is the first in turn order.
+    assert games == {1: (2, 3), 2: (1, 4), 3: (None, 0), 4: (None, None)}
+
+
+def test_backfilled_results_match_the_ones_stored_at_finish(unfinished_results):
+    def result(game):
+        return game.winner_player_id, game.player_count, [
+            (gp.finish_rank, gp.is_winner, gp.is_last) for gp in game.game_players
+        ]
+
+    Migrator(unfinished_results).migrate()
+    with Session(unfinished_results) as session:
+        for game_id in (1, 2, 3):
+            game = session.get(model.Game, game_id)
+            backfilled = result(game)
+            controller.GameController().record_result(session, game)
+            assert result(game) == backfilled
+
+
+def test_versions_must_increase(engine):
+    with pytest.raises(ValueError):
+        Migrator(engine, [Migration(2, "b"), Migration(1, "a")])
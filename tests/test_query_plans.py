@@ -0,0 +1,156 @@
+"""Query plans of the hot paths on a generated database.
+
+Every statement a hot path executes is run through EXPLAIN QUERY PLAN and
+must not scan a table in full.
+"""
+import sqlite3
+
+from contextlib import closing
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from src.achievements import model as achievements_model
+from src.achievements.achievementslogic import AchievementsLogic
+from src.achievements.checker import AchievementChecker
+from src.betting import model as betting_model
+from src.betting.bettinglogic import BettingLogic
+from src.game import controller, gamelogic, model
+from src.game.util import generate_db
+from src.perf import queries
+from src.rating import ratinglogic
+from src.typing import Ok
+
+@pytest.fixture(scope="module")
+def path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "generated.db"
+    generate_db.generate(str(path), players=40, games=2000, seed=1)
+    return path
+
+
+@pytest.fixture(scope="module")
+def engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def player(engine):
+    # The most active player, so every rule has rows to look through.
+    with Session(engine) as session:
+        return session.execute(
+            select(model.Player.player_id, model.Player.name)
+            .join(model.GamePlayer)
+            .group_by(model.Player.player_id)
+            .order_by(func.count().desc())
+        ).first()
+
+
+@pytest.fixture
+def assert_no_scans(path):
+    def check(log: queries.QueryLog, allowed=()) -> None:
+        assert log.count > 0
+        with closing(sqlite3.connect(path)) as connection:
+            found = [
+                (statement, scans)
+                for statement in log.statements
+                if not any(a in statement for a in allowed)
+                if (scans := queries.scans(connection, statement))
+            ]
+        listing = "\n".join(f"  {scans}: {queries.shape(s)}" for s, scans in found)
+        assert not found, f"Full table scans:\n{listing}"
+
+    return check
+
+
+def test_controller_lookups(engine, player, assert_no_scans):
+    games = controller.GameController()
+    with Session(engine) as session:
+        game = session.scalars(select(model.Game).order_by(model.Game.game_id.desc())).first()
+        with queries.track() as log:
+            games.player_from_game(session, game, player.player_id)
+            games.players_ordered_by_turn(session, game)
+            games.players_ordered_by_points(session, game)
+            games.winner(session, game)
+            game.turn = 0
+            games.current_drafter(session, game)
+    assert_no_scans(log)
+
+
+def test_game_listings(engine, assert_no_scans):
+    logic = gamelogic.GameLogic(None, engine)
+    with Session(engine) as session:
+        name = session.scalar(select(model.Game.name).order_by(model.Game.game_id.desc()))
+    with queries.track() as log:
+        assert logic.game_from_name(name)
+        logic.lobbies()
+        assert logic.games()
+    assert_no_scans(log)
+
+
+def test_game_history_pages(engine, path, player, assert_no_scans):
+    logic = gamelogic.GameLogic(None, engine)
+    filters = gamelogic.GameFilter(player=player.name, after=datetime(2000, 1, 1), players=6)
+    with queries.track() as log:
+        page = logic.games(gamelogic.GameFilter(), page_size=10).value
+        for _ in range(100):
+            page = logic.games(gamelogic.GameFilter(), page.next, 10).value
+        page = logic.games(filters).value
+        logic.games(filters, page.next)
+    assert_no_scans(log)
+    # Deep pages read off the index in order, nothing is sorted up front.
+    with closing(sqlite3.connect(path)) as connection:
+        statement = next(s for s in log.statements if "game.game_id) < (" in s)
+        plan = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {statement}", [None] * statement.count("?"))]
+    assert "SEARCH game USING INDEX ix_game_state_finish_time (game_state=? AND game_finish_time<?)" in plan
+
+
+def test_stats(engine, player, assert_no_scans):
+    logic = ratinglogic.RatingLogic(engine)
+    with queries.track() as log:
+        assert logic.player_id_from_name(player.name) == Ok(player.player_id)
+        result = logic.stats(player.player_id)
+        assert isinstance(result, Ok)
+        profile = result.value
+        assert profile.games > 0 and profile.wins > 0 and profile.nemesis and profile.pinata
+        assert "Player" in logic.wins()
+    assert_no_scans(log)
+
+
+def test_unrated_games(engine, assert_no_scans):
+    logic = ratinglogic.RatingLogic(engine)
+    with queries.track() as log:
+        assert logic.unrated_games() == []
+    assert_no_scans(log)
+
+
+def test_balance(engine, assert_no_scans):
+    with Session(engine) as session:
+        player_id = session.scalar(select(betting_model.GameBet.player_id))
+        bettor = session.get(betting_model.Bettor, player_id)
+        with queries.track() as log:
+            BettingLogic._balance(session, bettor)
+    assert_no_scans(log)
+
+
+def test_achievement_rules(engine, player, assert_no_scans):
+    checker = AchievementChecker(engine)
+    with Session(engine) as session:
+        achievements = session.scalars(select(achievements_model.Achievement)).all()
+    types = {a.rule_json.get("type") for a in achievements}
+    assert {"counter", "finish", "head_to_head"} <= types
+    with queries.track() as log:
+        for achievement in achievements:
+            checker.check(achievement, player.player_id)
+    assert_no_scans(log)
+
+
+def test_achievements_listing(engine, player, assert_no_scans):
+    logic = AchievementsLogic(engine)
+    with queries.track() as log:
+        assert logic.achievements(player.player_id, player.name)
+    # Lists every active achievement, a small table.
+    assert_no_scans(log, allowed=("FROM achievement LEFT OUTER JOIN",))
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.game import model
+from src.models import Base
+from src.rating import ratinglogic
+from src.typing import Err, Ok
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def finished(session, game_id, points):
+    session.add(model.Game(
+        game_id=game_id, name=f"G{game_id}", game_state=model.GameState.FINISHED,
+        game_finish_time=datetime(2025, 1, game_id),
+    ))
+    for player_id, p in enumerate(points, start=1):
+        session.merge(model.Player(player_id=player_id, name=f"P{player_id}"))
+        session.add(model.GamePlayer(game_id=game_id, player_id=player_id, points=p, turn_order=player_id))
+
+
+def test_games_without_opponents_are_not_replayed(engine):
+    with Session(engine) as session:
+        finished(session, 1, [10, 7])
+        finished(session, 2, [10])
+        finished(session, 3, [])
+        session.commit()
+
+    logic = ratinglogic.RatingLogic(engine)
+    assert logic.unrated_games() == [1]
+    logic.update_rating(None, 1)
+    assert logic.unrated_games() == []
+
+
+def test_a_near_miss_name_is_not_someone_elses_stats(engine):
+    with Session(engine) as session:
+        session.add_all([model.Player(player_id=1, name="Eric"), model.Player(player_id=2, name="Rob")])
+        session.commit()
+    logic = ratinglogic.RatingLogic(engine)
+    assert logic.player_id_from_name("eric") == Ok(1)
+    assert logic.player_id_from_name("Erik") == Err("Can't find anyone with that name. Did you mean Eric?")
+    assert isinstance(logic.player_id_from_name("Bob"), Err)
@@ -0,0 +1,56 @@
+import asyncio
+
+import discord
+import discord.ext.test as dpytest
+import pytest
+
+from benchmarks import replay
+from src.bot import Bot
+from src.perf import recorder
+
+
+async def record(path: str) -> None:
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+    bot = Bot(intents, record_to=path)
+    await bot.setup_hook()
+    await bot._async_setup_hook()
+    dpytest.configure(bot, members=2)
+    await bot.startup.wait()
+
+    config = dpytest.get_config()
+    host, guest = config.members
+    await dpytest.message("!hello", member=host)
+    await dpytest.message("!lobby Friday", member=host)
+    lobby = discord.utils.get(config.guilds[0].text_channels, name="Friday")
+    await dpytest.message("!join", lobby, guest)
+    await dpytest.message("!config factions_per_player 3", lobby, host)
+    await dpytest.message("!lobbies", member=guest)
+    await dpytest.empty_queue()
+
+    bot.watchdog.stop()
+    await asyncio.to_thread(bot.database.close)
+    bot.recorder.close()
+
+
+@pytest.mark.asyncio
+async def test_recorded_commands_replay_with_the_same_replies(tmp_path, monkeypatch):
+    (tmp_path / "live").mkdir()
+    (tmp_path / "replay").mkdir()
+    recording = str(tmp_path / "recording.jsonl.gz")
+
+    monkeypatch.chdir(tmp_path / "live")
+    await record(recording)
+    records = list(recorder.read(recording))
+    commands = [r for r in records if r.kind == "command"]
+    assert [r.command for r in commands] == ["hello", "lobby", "join", "config", "lobbies"]
+    assert commands[0].replies == ["Hello!"]
+    assert [r.name for r in records if r.kind == "channel"] == ["Friday"]
+
+    monkeypatch.chdir(tmp_path / "replay")
+    report = await replay.replay(records, str(tmp_path / "replayed.jsonl"))
+
+    assert report.commands == 5
+    assert report.differences == []
+    assert set(report.timings) == {"hello", "lobby", "join", "config", "lobbies"}
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from src.startup import Startup, WarmingUp
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_after_their_dependencies_and_in_parallel_otherwise():
+    startup = Startup()
+    order = []
+
+    def job(name: str, seconds: float):
+        async def run() -> None:
+            order.append(f"{name} start")
+            await asyncio.sleep(seconds)
+            order.append(f"{name} end")
+        return run
+
+    startup.add("definitions", job("definitions", 0.05))
+    startup.add("counters", job("counters", 0.01), after=("definitions",))
+    startup.add("ratings", job("ratings", 0.05))
+
+    started = time.perf_counter()
+    startup.start()
+    await startup.wait()
+
+    # Independent jobs overlap, dependents wait.
+    assert time.perf_counter() - started < 0.09
+    assert order.index("counters start") > order.index("definitions end")
+    assert order.index("ratings start") < order.index("definitions end")
+    assert set(startup.timings) == {"definitions", "counters", "ratings"}
+
+
+@pytest.mark.asyncio
+async def test_require_raises_until_the_job_is_done():
+    startup = Startup()
+    release = asyncio.Event()
+    startup.add("ratings", release.wait)
+    startup.start()
+
+    with pytest.raises(WarmingUp):
+        startup.require("ratings")
+    release.set()
+    await startup.wait()
+    assert startup.require("ratings")
+
+
+@pytest.mark.asyncio
+async def test_failed_job_skips_dependents_but_does_not_block_commands():
+    startup = Startup()
+    ran = []
+
+    async def broken() -> None:
+        raise RuntimeError("boom")
+
+    async def dependent() -> None:
+        ran.append("dependent")
+
+    startup.add("broken", broken)
+    startup.add("dependent", dependent, after=("broken",))
+    startup.start()
+    await startup.wait()
+
+    assert ran == []
+    assert startup.require("broken", "dependent")
+
+
+def test_bad_graphs_are_rejected():
+    async def noop() -> None:
+        pass
+
+    startup = Startup()
+    startup.add("a", noop, after=("b",))
+    startup.add("b", noop, after=("a",))
+    with pytest.raises(ValueError, match="cycle"):
+        startup.start()
+
+    startup = Startup()
+    startup.add("a", noop, after=("missing",))
+    with pytest.raises(ValueError, match="Unknown"):
+        startup.start()
+
+    with pytest.raises(ValueError, match="already exists"):
+        startup.add("a", noop)
@@ -0,0 +1,52 @@
+from benchmarks import suite
+
+
+def test_suite_runs_every_case(tmp_path, monkeypatch):
+    monkeypatch.setitem(suite.SIZES, "tiny", (12, 40))
+    results = suite.run("tiny", games=1, reads=1, maintenance=1, datasets=tmp_path)
+
+    modes = [m.name.lower() for m in suite.MODES]
+    expected = {"ban", "bet", "finish", "refresh_ratings", "payout", "stats", "ratings", "achievements",
+                "load_achievements", "reconcile"}
+    expected |= {f"start[{m}]" for m in modes} | {f"draft[{m}]" for m in modes}
+    assert set(results) == expected
+    assert results["draft[picks_only]"]["calls"] == 6
+    assert all(r["statements"] > 0 for r in results.values())
+
+    path = suite.save_baseline("tiny", results, tmp_path)
+    assert path.exists()
+    comparisons = suite.compare(suite.load_baseline("tiny", tmp_path), results)
+    assert not any(c.regressed for c in comparisons)
+
+
+def test_compare_flags_regressions():
+    def case(p50, statements=5.0):
+        return {"calls": 10, "mean": p50, "p50": p50, "p95": p50, "statements": statements}
+
+    baseline = {"finish": case(10), "stats": case(10), "ratings": case(10), "payout": case(0.1), "old": case(1)}
+    current = {"finish": case(13), "stats": case(14), "ratings": case(10, 6), "payout": case(0.4), "new": case(1)}
+    comparisons = {c.case: c for c in suite.compare(baseline, current, threshold=0.25, thresholds={"finish": 0.2})}
+
+    assert comparisons["finish"].status == "slower"
+    assert comparisons["stats"].status == "slower"
+    assert comparisons["ratings"].status == "more queries"
+    # Within the noise floor.
+    assert comparisons["payout"].status == "ok"
+    assert comparisons["old"].status == "missing"
+    assert comparisons["new"].status == "new"
+    assert "3 regressions" in suite.report("small", list(comparisons.values()))
+
+
+def test_baselines_saved_without_timings_gate_on_statements_only(tmp_path):
+    def case(p50, statements=5.0):
+        return {"calls": 10, "mean": p50, "p50": p50, "p95": p50, "statements": statements}
+
+    suite.save_baseline("small", {"finish": case(10), "ratings": case(10)}, tmp_path, timings=False)
+    assert not suite.timed_baseline("small", tmp_path)
+    assert suite.timed_baseline("medium", tmp_path)
+
+    current = {"finish": case(30), "ratings": case(10, 6)}
+    comparisons = {c.case: c for c in suite.compare(suite.load_baseline("small", tmp_path), current, timings=False)}
+    assert comparisons["finish"].status == "ok"
+    assert comparisons["ratings"].status == "more queries"
+    assert "statement counts only" in suite.report("small", list(comparisons.values()))